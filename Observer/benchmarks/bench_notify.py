@@ -0,0 +1,135 @@
+"""Бенчмарк рассылки обновления курсов наблюдателям (CurrencySubject.notify).
+
+К субъекту подключается --observers имитаций WebSocket-соединений
+(по умолчанию 1000 и 10000). Доля --slow-share из них отвечает с
+задержкой --slow-delay секунд - зависший или медленный клиент.
+Рассылка выполняется --rounds раз двумя способами: последовательный
+обход с json.dumps на каждого наблюдателя (как было раньше) и
+CurrencySubject.notify. Перед каждой рассылкой меняется курс одной
+валюты (notify рассылает только изменения). Для каждого режима - время
+вызова рассылки (notify только ставит сообщения в очереди
+наблюдателей), время до доставки последнего сообщения, p50/p99 времени
+доставки сообщения отдельному наблюдателю от начала рассылки и размер
+сообщения.
+
+Запуск:
+    python benchmarks/bench_notify.py
+    python benchmarks/bench_notify.py --observers 1000 10000 --slow-share 0.001
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'currency_observer'))
+
+from observer import CurrencySubject, WebSocketObserver
+
+RATES = {'USD': 92.51, 'EUR': 99.87, 'GBP': 116.42, 'CNY': 12.73, 'JPY': 0.61, 'RUB': 1.0}
+
+
+class FakeWebSocket:
+    """Соединение, которое запоминает время отправки сообщения"""
+
+    delivered = 0
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent_at = None
+        self.sent_bytes = 0
+
+    async def write_message(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            # Как у Tornado: запись в буфер и возврат в event loop
+            await asyncio.sleep(0)
+        self.sent_at = time.perf_counter()
+        self.sent_bytes = len(message.encode())
+        FakeWebSocket.delivered += 1
+
+    def close(self, code=None, reason=None):
+        pass
+
+
+async def wait_delivered(count, timeout):
+    """Дождаться доставки count сообщений (не дольше timeout секунд)"""
+    deadline = time.perf_counter() + timeout
+    while FakeWebSocket.delivered < count and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+
+
+async def sequential_notify(subject):
+    """Рассылка до изменения: по очереди, json.dumps на каждого наблюдателя"""
+    data = {
+        'currencies': subject._currency_data,
+        'timestamp': subject._get_current_timestamp()
+    }
+    for observer in subject._observers:
+        message = {
+            'type': 'currency_update',
+            'data': data,
+            'observer_id': observer.observer_id
+        }
+        await observer.websocket.write_message(json.dumps(message))
+
+
+def percentile(values, share):
+    return round(values[min(int(len(values) * share), len(values) - 1)] * 1000, 2)
+
+
+async def run(count, args):
+    subject = CurrencySubject(send_timeout=args.send_timeout)
+    slow_every = round(1 / args.slow_share) if args.slow_share else 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(count):
+            delay = args.slow_delay if slow_every and i % slow_every == slow_every // 2 else 0.0
+            subject.attach(WebSocketObserver(FakeWebSocket(delay), snapshot=subject.snapshot))
+
+    for mode, broadcast in (('sequential', sequential_notify), ('notify', CurrencySubject.notify)):
+        calls = []
+        totals = []
+        deliveries = []
+        for i in range(args.rounds):
+            subject.set_currency_data(dict(RATES, USD=RATES['USD'] + (i + 1) / 100))
+            for observer in subject._observers:
+                observer.websocket.sent_at = None
+            FakeWebSocket.delivered = 0
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await broadcast(subject)
+                calls.append(time.perf_counter() - started)
+                await wait_delivered(count, args.send_timeout + args.slow_delay)
+            totals.append(time.perf_counter() - started)
+            deliveries += [
+                observer.websocket.sent_at - started
+                for observer in subject._observers if observer.websocket.sent_at is not None
+            ]
+        deliveries.sort()
+        print(json.dumps({
+            'observers': count,
+            'mode': mode,
+            'call_ms': round(sum(calls) / len(calls) * 1000, 2),
+            'broadcast_ms': round(sum(totals) / len(totals) * 1000, 2),
+            'delivery_p50_ms': percentile(deliveries, 0.5),
+            'delivery_p99_ms': percentile(deliveries, 0.99),
+            'delivered_per_round': len(deliveries) // args.rounds,
+            'message_bytes': subject._observers[0].websocket.sent_bytes
+        }))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--observers', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--slow-share', type=float, default=0.001, help='доля медленных соединений')
+    parser.add_argument('--slow-delay', type=float, default=0.2, help='задержка медленного соединения, с')
+    parser.add_argument('--send-timeout', type=float, default=1.0)
+    args = parser.parse_args()
+
+    for count in args.observers:
+        asyncio.run(run(count, args))
@@ -1,36 +1,97 @@
 import asyncio
 import aiohttp
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 
 
+# Сколько держать открытым простаивающее соединение с API: дольше
+# обычного интервала опроса, чтобы не устанавливать TCP+TLS заново
+KEEPALIVE_TIMEOUT = 75
+
+# Дольше этого (секунд) не ждать между опросами, даже если следующая
+# публикация курсов ожидается позже
+DEFAULT_MAX_INTERVAL = 900
+
+
 class CurrencyService:
-    """Сервис для получения курсов валют с API ЦБ РФ"""
+    """Сервис для получения курсов валют с API ЦБ РФ.
+
+    Все опросы идут через одну сессию aiohttp с постоянным соединением.
+    Запросы условные (If-None-Match / If-Modified-Since): ответ 304
+    означает, что курсы не изменились, и файл не скачивается заново.
+    Интервал опроса подстраивается под расписание публикации: до
+    ожидаемой даты следующих курсов (NextDate, иначе сутки от Timestamp)
+    API опрашивается не чаще раза в max_interval секунд, после нее -
+    каждые update_interval секунд.
+    """
 
     API_URL = "https://www.cbr-xml-daily.ru/daily_json.js"
 
-    def __init__(self, update_interval: int = 300) -> None:
+    def __init__(self, update_interval: int = 300, max_interval: int = DEFAULT_MAX_INTERVAL,
+                 api_url: Optional[str] = None) -> None:
         self.update_interval = update_interval
+        self.max_interval = max(max_interval, update_interval)
+        self.api_url = api_url or self.API_URL
         self.last_update: Optional[datetime] = None
         self.currencies: Dict[str, float] = {}
+        # Когда ожидаются новые курсы и когда опрашивать API в следующий раз
+        self.expected_update: Optional[datetime] = None
+        self.next_poll: Optional[datetime] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        # Последний опрос получил 304: курсы не изменились
+        self.not_modified = False
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия для всех опросов API (создается при первом запросе)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=1, keepalive_timeout=KEEPALIVE_TIMEOUT),
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                },
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Закрыть сессию и соединение с API"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     async def fetch_currency_rates(self) -> Dict[str, float]:
-        """Получить курсы валют с API"""
-        try:
-            async with aiohttp.ClientSession() as session:
+        """Получить курсы валют с API.
+
+        Если курсы не изменились с прошлого запроса (ответ 304),
+        возвращаются уже известные курсы и выставляется not_modified.
+        """
+        self.not_modified = False
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
 
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                async with session.get(self.API_URL, headers=headers, timeout=10) as response:
-                    if response.status == 200:
-
-                        data = await response.json(content_type=None)
-                        return self._parse_currency_data(data)
-                    else:
-                        print(f"Ошибка API: {response.status}")
-                        return {}
+        try:
+            async with self._get_session().get(self.api_url, headers=headers) as response:
+                if response.status == 304:
+                    print("Курсы не изменились (304 Not Modified)")
+                    self.not_modified = True
+                    return self.currencies
+                elif response.status == 200:
+
+                    data = await response.json(content_type=None)
+                    currencies = self._parse_currency_data(data)
+                    self._etag = response.headers.get('ETag')
+                    self._last_modified = response.headers.get('Last-Modified')
+                    self.expected_update = self._parse_expected_update(data)
+                    return currencies
+                else:
+                    print(f"Ошибка API: {response.status}")
+                    return {}
         except Exception as e:
             print(f"Ошибка при получении данных: {e}")
             return {}
@@ -52,19 +113,52 @@ class CurrencyService:
 
         return currencies
 
+    @staticmethod
+    def _parse_expected_update(data: Dict[str, Any]) -> Optional[datetime]:
+        """Когда ожидаются следующие курсы: NextDate или сутки от Timestamp"""
+        try:
+            if data.get('NextDate'):
+                expected = datetime.fromisoformat(data['NextDate'])
+            elif data.get('Timestamp'):
+                expected = datetime.fromisoformat(data['Timestamp']) + timedelta(days=1)
+            else:
+                return None
+        except (TypeError, ValueError):
+            return None
+        # Без часового пояса - московское время, как в ответах ЦБ РФ
+        if expected.tzinfo is None:
+            expected = expected.replace(tzinfo=timezone(timedelta(hours=3)))
+        return expected
+
+    def _schedule_next_poll(self) -> None:
+        """Выбрать время следующего опроса по ожидаемой дате новых курсов"""
+        interval = self.update_interval
+        if self.expected_update is not None:
+            until_expected = (self.expected_update - datetime.now(timezone.utc)).total_seconds()
+            interval = min(max(until_expected, self.update_interval), self.max_interval)
+        self.next_poll = datetime.now() + timedelta(seconds=interval)
+
+    def poll_delay(self) -> float:
+        """Секунд до следующего опроса API"""
+        if not self.next_poll:
+            return 0.0
+        return max((self.next_poll - datetime.now()).total_seconds(), 0.0)
+
     def should_update(self) -> bool:
         """Проверка, нужно ли обновлять данные"""
-        if not self.last_update:
+        if not self.next_poll:
             return True
 
-        time_since_update = datetime.now() - self.last_update
-        return time_since_update.total_seconds() >= self.update_interval
+        return datetime.now() >= self.next_poll
 
     async def get_updated_rates(self) -> Dict[str, float]:
         """Получить обновленные курсы валют"""
         if self.should_update():
             new_rates = await self.fetch_currency_rates()
-            if new_rates:
+            if self.not_modified:
+                # 304: курсы прежние, проверка прошла успешно
+                self.last_update = datetime.now()
+            elif new_rates:
                 self.currencies = new_rates
                 self.last_update = datetime.now()
                 print(f"Курсы обновлены: {datetime.now().strftime('%H:%M:%S')}")
@@ -73,6 +167,7 @@ class CurrencyService:
                         print(f"  {currency}: {rate:.2f} RUB")
             else:
                 print("Не удалось получить новые курсы валют")
+            self._schedule_next_poll()
 
         return self.currencies
 
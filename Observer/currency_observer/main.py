@@ -6,6 +6,7 @@ from tornado.options import define, options
 from typing import Dict, Any, Optional
 import os
 import json
+from datetime import datetime
 
 
 from observer import CurrencySubject, WebSocketObserver
@@ -25,6 +26,43 @@ class MainHandler(RequestHandler):
         self.write(html_content)
 
 
+def parse_since(value: str) -> float:
+    """Время Unix из параметра since: число секунд или дата ISO 8601"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class HistoryHandler(RequestHandler):
+    """История курса валюты из памяти: /history?currency=USD&since=...
+
+    since - время Unix в секундах или дата ISO 8601 (2024-01-31,
+    2024-01-31T12:00); без since возвращается вся сохраненная история.
+    """
+
+    def initialize(self, currency_subject: CurrencySubject) -> None:
+        self.currency_subject = currency_subject
+
+    def get(self) -> None:
+        currency = self.get_argument('currency').upper()
+        since = self.get_argument('since', '')
+        try:
+            since_time = parse_since(since)
+        except ValueError:
+            raise tornado.web.HTTPError(400, f"Некорректное значение since: {since}")
+
+        self.write({
+            'currency': currency,
+            'history': [
+                {'time': timestamp, 'rate': rate}
+                for timestamp, rate in self.currency_subject.history(currency, since_time)
+            ]
+        })
+
+
 class CurrencyWebSocketHandler(WebSocketHandler):
     """WebSocket обработчик для отслеживания курсов валют"""
 
@@ -32,10 +70,10 @@ class CurrencyWebSocketHandler(WebSocketHandler):
         self.currency_subject = currency_subject
         self.observer: Optional[WebSocketObserver] = None
 
-    def open(self) -> None:
+    async def open(self) -> None:
         """Вызывается при открытии WebSocket соединения"""
         print("Новое WebSocket соединение")
-        self.observer = WebSocketObserver(self)
+        self.observer = WebSocketObserver(self, snapshot=self.currency_subject.snapshot)
         self.currency_subject.attach(self.observer)
 
 
@@ -46,25 +84,42 @@ class CurrencyWebSocketHandler(WebSocketHandler):
         }
         self.write_message(welcome_msg)
 
+        # Текущие курсы сразу, не дожидаясь следующего опроса API
+        await self.currency_subject.send_snapshot(self.observer)
+
     def on_close(self) -> None:
         """Вызывается при закрытии соединения"""
         if self.observer:
             self.currency_subject.detach(self.observer)
+            self.observer.close()
             print(f"WebSocket соединение закрыто: {self.observer.observer_id}")
 
-    def on_message(self, message: str) -> None:
+    async def on_message(self, message: str) -> None:
         """Обработка входящих сообщений"""
         try:
             data = json.loads(message)
             print(f"Получено сообщение от {self.observer.observer_id}: {data}")
         except:
             print(f"Получено сообщение: {message}")
+            return
+
+        if isinstance(data, dict) and data.get('type') == 'resync':
+            # Клиент пропустил обновления: отправить полный снимок курсов
+            await self.currency_subject.send_snapshot(self.observer)
 
 
 async def currency_updater(currency_subject: CurrencySubject, currency_service: CurrencyService) -> None:
     """Фоновая задача для обновления курсов валют"""
     print("Запуск фоновой задачи обновления курсов валют...")
 
+    try:
+        await poll_currency_rates(currency_subject, currency_service)
+    finally:
+        await currency_service.close()
+
+
+async def poll_currency_rates(currency_subject: CurrencySubject, currency_service: CurrencyService) -> None:
+    """Опрос API по расписанию сервиса и рассылка изменений наблюдателям"""
     while True:
         try:
 
@@ -80,7 +135,7 @@ async def currency_updater(currency_subject: CurrencySubject, currency_service:
                 print("Не удалось получить курсы валют")
 
 
-            await asyncio.sleep(currency_service.update_interval)
+            await asyncio.sleep(currency_service.poll_delay())
 
         except Exception as e:
             print(f"Ошибка в фоновой задаче: {e}")
@@ -101,8 +156,10 @@ def make_app() -> tornado.web.Application:
         [
             (r"/", MainHandler),
             (r"/ws", CurrencyWebSocketHandler, {"currency_subject": currency_subject}),
+            (r"/history", HistoryHandler, {"currency_subject": currency_subject}),
         ],
         debug=options.debug,
+        currency_service=currency_service,
     )
 
 
@@ -115,7 +172,9 @@ async def main() -> None:
 
     print(f"Сервер запущен на http://localhost:{options.port}")
     print("Подключитесь к странице для отслеживания курсов валют")
-    print(f"Интервал обновления: 30 секунд")
+    currency_service = app.settings["currency_service"]
+    print(f"Интервал опроса API: от {currency_service.update_interval} "
+          f"до {currency_service.max_interval} секунд")
 
     await asyncio.Event().wait()
 
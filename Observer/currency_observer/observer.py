@@ -1,24 +1,110 @@
-from typing import List, Dict, Any, Protocol, Optional
+from typing import List, Dict, Any, Protocol, Optional, Deque, Tuple, Callable
+import asyncio
 import json
+import time
 import uuid
+from array import array
+from collections import deque
 from datetime import datetime
 
 
+# Сколько секунд ждать отправки одному наблюдателю: зависший сокет
+# не должен задерживать рассылку остальным
+DEFAULT_SEND_TIMEOUT = 5.0
+
+# Сколько обновлений может ждать отправки одному клиенту и сколько
+# переполнений очереди подряд допускается до его отключения
+DEFAULT_MAX_QUEUE = 4
+DEFAULT_MAX_OVERFLOWS = 3
+
+# Код закрытия WebSocket для клиента, который не успевает принимать данные
+CLOSE_TOO_SLOW = 1008
+
+# Типы сообщений с курсами: полный снимок и только изменившиеся курсы
+MESSAGE_SNAPSHOT = 'currency_update'
+MESSAGE_DELTA = 'currency_delta'
+
+# Сколько последних изменений курса хранить по каждой валюте
+DEFAULT_HISTORY_SIZE = 4096
+
+
 class Observer(Protocol):
     """Протокол для наблюдателей"""
     observer_id: str
 
-    async def update(self, currency_data: Dict[str, Any]) -> None:
-        """Метод для обновления данных у наблюдателя"""
+    async def update(self, currency_data: Dict[str, Any], encoded: Optional[str] = None,
+                     message_type: str = MESSAGE_SNAPSHOT) -> None:
+        """Метод для обновления данных у наблюдателя.
+
+        encoded - currency_data, уже сериализованные в JSON субъектом
+        (один раз на рассылку); наблюдатель может использовать их
+        вместо повторного json.dumps. message_type - MESSAGE_SNAPSHOT
+        или MESSAGE_DELTA.
+        """
         pass
 
 
+class RateHistory:
+    """Кольцевой буфер изменений курса одной валюты.
+
+    Отметки времени (секунды Unix) и курсы лежат в двух массивах
+    array('d') фиксированного размера - 16 байт на запись без объекта
+    Python на каждую. Когда буфер заполнен, новая запись заменяет
+    самую старую.
+    """
+
+    def __init__(self, size: int = DEFAULT_HISTORY_SIZE) -> None:
+        self.size = size
+        self._times = array('d', bytes(8 * size))
+        self._rates = array('d', bytes(8 * size))
+        # Индекс самой старой записи и число записей
+        self._start = 0
+        self._count = 0
+
+    def append(self, timestamp: float, rate: float) -> None:
+        """Добавить курс на момент timestamp"""
+        if self._count < self.size:
+            index = (self._start + self._count) % self.size
+            self._count += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self.size
+        self._times[index] = timestamp
+        self._rates[index] = rate
+
+    def since(self, timestamp: float = 0.0) -> List[Tuple[float, float]]:
+        """Записи (время, курс) не раньше timestamp, от старых к новым"""
+        # Записи упорядочены по времени: двоичный поиск первой подходящей
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._times[(self._start + middle) % self.size] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return [
+            (self._times[i % self.size], self._rates[i % self.size])
+            for i in range(self._start + low, self._start + self._count)
+        ]
+
+    def __len__(self) -> int:
+        return self._count
+
+
 class CurrencySubject:
     """Субъект, который отслеживает изменения курсов валют"""
 
-    def __init__(self) -> None:
+    def __init__(self, send_timeout: float = DEFAULT_SEND_TIMEOUT,
+                 history_size: int = DEFAULT_HISTORY_SIZE) -> None:
         self._observers: List[Observer] = []
         self._currency_data: Dict[str, float] = {}
+        self.send_timeout = send_timeout
+        self.history_size = history_size
+        self._history: Dict[str, RateHistory] = {}
+        # Курсы, разосланные последним обновлением, его номер и время
+        self._sent_data: Dict[str, float] = {}
+        self._sequence = 0
+        self._timestamp: Optional[str] = None
 
     def attach(self, observer: Observer) -> None:
         """Добавить наблюдателя"""
@@ -33,17 +119,85 @@ class CurrencySubject:
             print(f"Наблюдатель {observer.observer_id} отключен")
 
     async def notify(self) -> None:
-        """Уведомить всех наблюдателей об изменениях"""
-        data = {
-            'currencies': self._currency_data,
-            'timestamp': self._get_current_timestamp()
+        """Уведомить всех наблюдателей об изменениях.
+
+        Курсы сравниваются с разосланными в прошлый раз: если ничего не
+        изменилось, рассылки нет, иначе наблюдателям уходят только
+        изменившиеся курсы с номером обновления (MESSAGE_DELTA). Клиент,
+        заметивший пропуск номера, запрашивает полный снимок
+        (send_snapshot).
+        """
+        changes = {
+            code: rate for code, rate in self._currency_data.items()
+            if self._sent_data.get(code) != rate
+        }
+        removed = [code for code in self._sent_data if code not in self._currency_data]
+        if not changes and not removed:
+            return
+
+        self._sequence += 1
+        self._sent_data = dict(self._currency_data)
+        self._timestamp = self._get_current_timestamp()
+        self._record_history(changes)
+        data: Dict[str, Any] = {
+            'sequence': self._sequence,
+            'timestamp': self._timestamp,
+            'changes': changes
         }
+        if removed:
+            data['removed'] = removed
+        await self._broadcast(data, MESSAGE_DELTA)
 
-        for observer in self._observers:
-            try:
-                await observer.update(data)
-            except Exception as e:
-                print(f"Ошибка при уведомлении наблюдателя {observer.observer_id}: {e}")
+    async def _broadcast(self, data: Dict[str, Any], message_type: str) -> None:
+        """Отправить data всем наблюдателям.
+
+        Данные сериализуются один раз, а отправка идет всем наблюдателям
+        одновременно: медленный клиент не задерживает остальных, а его
+        отправка прерывается через send_timeout секунд.
+        """
+        encoded = json.dumps(data)
+
+        # Все отправки стартуют одновременно, поэтому общий срок ожидания
+        # равен сроку каждой отправки; не успевшие к нему отменяются
+        sends = {
+            asyncio.ensure_future(observer.update(data, encoded, message_type)): observer
+            for observer in list(self._observers)
+        }
+        if not sends:
+            return
+        done, pending = await asyncio.wait(sends, timeout=self.send_timeout)
+        for send in pending:
+            send.cancel()
+            print(f"Наблюдатель {sends[send].observer_id} не принял обновление за {self.send_timeout} с")
+        for send in done:
+            if send.exception() is not None:
+                print(f"Ошибка при уведомлении наблюдателя {sends[send].observer_id}: {send.exception()}")
+
+    def _record_history(self, changes: Dict[str, float]) -> None:
+        """Записать изменившиеся курсы в историю валют"""
+        now = time.time()
+        for code, rate in changes.items():
+            history = self._history.get(code)
+            if history is None:
+                history = self._history[code] = RateHistory(self.history_size)
+            history.append(now, rate)
+
+    def history(self, currency: str, since: float = 0.0) -> List[Tuple[float, float]]:
+        """Изменения курса валюты (время Unix, курс) начиная с since"""
+        history = self._history.get(currency)
+        return history.since(since) if history is not None else []
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Полный снимок разосланных курсов с номером последнего обновления"""
+        return {
+            'currencies': self._sent_data,
+            'timestamp': self._timestamp,
+            'sequence': self._sequence
+        }
+
+    async def send_snapshot(self, observer: Observer) -> None:
+        """Отправить наблюдателю полный снимок курсов"""
+        await observer.update(self.snapshot(), message_type=MESSAGE_SNAPSHOT)
 
     def set_currency_data(self, new_data: Dict[str, float]) -> None:
         """Установить новые данные о курсах валют"""
@@ -60,20 +214,98 @@ class CurrencySubject:
 
 
 class WebSocketObserver:
-    """Наблюдатель, реализующий WebSocket соединение"""
+    """Наблюдатель, реализующий WebSocket соединение.
 
-    def __init__(self, websocket) -> None:
+    Обновления ставятся в ограниченную очередь, которую отправляет в
+    сокет отдельная задача наблюдателя: следующее сообщение пишется,
+    только когда предыдущее ушло в сокет, поэтому данные медленного
+    клиента не копятся в буфере Tornado. Если очередь заполнена,
+    ждущие сообщения заменяются одним полным снимком из snapshot
+    (CurrencySubject.snapshot): он уже содержит все пропущенные
+    изменения и номер последнего обновления, поэтому клиент продолжает
+    без пропуска номера и без запроса resync. Без snapshot остаются
+    последний ждущий снимок и новое сообщение. Клиент, очередь которого
+    переполняется больше max_overflows раз подряд, отключается.
+    """
+
+    def __init__(self, websocket, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_overflows: int = DEFAULT_MAX_OVERFLOWS,
+                 snapshot: Optional[Callable[[], Dict[str, Any]]] = None) -> None:
         self.websocket = websocket
         self.observer_id = str(uuid.uuid4())[:8]
+        self.max_queue = max_queue
+        self.max_overflows = max_overflows
+        self.snapshot = snapshot
+        self.overflows = 0
+        # Пары (тип сообщения, сообщение)
+        self._queue: Deque[Tuple[str, str]] = deque()
+        self._ready = asyncio.Event()
+        self._sender: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def update(self, currency_data: Dict[str, Any], encoded: Optional[str] = None,
+                     message_type: str = MESSAGE_SNAPSHOT) -> None:
+        """Поставить обновление в очередь отправки через WebSocket.
+
+        Сообщение собирается из готового JSON данных: на каждого
+        наблюдателя добавляется только его observer_id.
+        """
+        if self._closed:
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self.overflows += 1
+            if self.overflows > self.max_overflows:
+                print(f"Наблюдатель {self.observer_id} не успевает принимать обновления, отключение")
+                self.close()
+                self.websocket.close(CLOSE_TOO_SLOW, 'Клиент не успевает принимать обновления')
+                return
+            if self.snapshot is not None:
+                # Клиент не успевает: вместо ждущих сообщений - свежий
+                # снимок, который уже включает и это обновление
+                self._queue.clear()
+                currency_data, encoded, message_type = self.snapshot(), None, MESSAGE_SNAPSHOT
+            else:
+                # Снимок (ответ на resync) не отбрасывается: без него
+                # клиент так и ждал бы полных данных
+                snapshots = [queued for queued in self._queue if queued[0] == MESSAGE_SNAPSHOT]
+                self._queue.clear()
+                self._queue.extend(snapshots[-1:])
 
-    async def update(self, currency_data: Dict[str, Any]) -> None:
-        """Отправить обновление через WebSocket"""
+        if encoded is None:
+            encoded = json.dumps(currency_data)
+        message = (
+            '{"type": ' + json.dumps(message_type) + ', "data": ' + encoded
+            + ', "observer_id": ' + json.dumps(self.observer_id) + '}'
+        )
+        self._queue.append((message_type, message))
+        self._ready.set()
+        if self._sender is None:
+            self._sender = asyncio.ensure_future(self._drain())
+
+    async def _drain(self) -> None:
+        """Отправлять сообщения из очереди, дожидаясь записи каждого в сокет"""
         try:
-            message = {
-                'type': 'currency_update',
-                'data': currency_data,
-                'observer_id': self.observer_id
-            }
-            await self.websocket.write_message(json.dumps(message))
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    _, message = self._queue.popleft()
+                    await self.websocket.write_message(message)
+                self._ready.clear()
+                self.overflows = 0
         except Exception as e:
-            print(f"Ошибка отправки сообщения наблюдателю {self.observer_id}: {e}")
\ No newline at end of file
+            if not self._closed:
+                print(f"Ошибка отправки сообщения наблюдателю {self.observer_id}: {e}")
+            self.close()
+
+    def close(self) -> None:
+        """Остановить отправку: соединение закрыто"""
+        self._closed = True
+        self._queue.clear()
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+
+    @property
+    def queued(self) -> int:
+        """Сообщений в очереди отправки"""
+        return len(self._queue)
@@ -1,5 +1,12 @@
 let ws = null;
 let observerId = null;
+// Курсы на странице и номер последнего примененного обновления
+let currencies = {};
+let lastSequence = null;
+// Время запроса полного снимка, на который еще нет ответа, и через
+// сколько миллисекунд запрос повторить
+let resyncRequestedAt = null;
+const RESYNC_RETRY_MS = 5000;
 
 const currencyNames = {
     'USD': 'Доллар США',
@@ -35,6 +42,8 @@ function connectWebSocket() {
         document.getElementById('connect-btn').disabled = false;
         document.getElementById('disconnect-btn').disabled = true;
         observerId = null;
+        lastSequence = null;
+        resyncRequestedAt = null;
     };
 
     ws.onerror = function(error) {
@@ -52,7 +61,10 @@ function connectWebSocket() {
             console.log(`ID наблюдателя: ${observerId}`);
         }
         else if (data.type === 'currency_update') {
-            updateCurrencyTable(data.data);
+            applySnapshot(data.data);
+        }
+        else if (data.type === 'currency_delta') {
+            applyDelta(data.data);
         }
     };
 }
@@ -64,6 +76,42 @@ function disconnectWebSocket() {
     }
 }
 
+// Полный снимок курсов заменяет все данные на странице
+function applySnapshot(data) {
+    currencies = Object.assign({}, data.currencies || {});
+    lastSequence = data.sequence === undefined ? null : data.sequence;
+    resyncRequestedAt = null;
+    updateCurrencyTable({ currencies: currencies, timestamp: data.timestamp });
+}
+
+function requestResync() {
+    resyncRequestedAt = Date.now();
+    ws.send(JSON.stringify({ type: 'resync' }));
+}
+
+// Изменившиеся курсы применяются, только если не пропущено ни одного
+// обновления; иначе у сервера запрашивается полный снимок. Пока снимка
+// нет, изменения пропускаются, а запрос повторяется не чаще RESYNC_RETRY_MS
+function applyDelta(data) {
+    if (resyncRequestedAt !== null) {
+        if (Date.now() - resyncRequestedAt >= RESYNC_RETRY_MS) {
+            console.log('Полный снимок не получен, повторный запрос');
+            requestResync();
+        }
+        return;
+    }
+    if (lastSequence === null || data.sequence !== lastSequence + 1) {
+        console.log(`Пропущены обновления (${lastSequence} -> ${data.sequence}), запрос полного снимка`);
+        requestResync();
+        return;
+    }
+
+    Object.assign(currencies, data.changes || {});
+    (data.removed || []).forEach(code => delete currencies[code]);
+    lastSequence = data.sequence;
+    updateCurrencyTable({ currencies: currencies, timestamp: data.timestamp });
+}
+
 function updateConnectionStatus(connected) {
     const statusElement = document.getElementById('connection-status');
     const statusText = document.getElementById('connection-status');
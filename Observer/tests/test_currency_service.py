@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'currency_observer'))
+
+from currency_service import CurrencyService
+
+LAST_MODIFIED = 'Sat, 18 Oct 2026 17:00:00 GMT'
+
+
+class FakeCbrApi:
+    """Имитация daily_json.js: ETag, Last-Modified и ответ 304"""
+
+    def __init__(self, next_date=None):
+        self.etag = '"v1"'
+        self.usd = 90.0
+        self.next_date = next_date
+        self.statuses = []
+        self.conditional_headers = []
+        self.peers = set()
+
+    async def daily(self, request):
+        self.peers.add(request.transport.get_extra_info('peername'))
+        self.conditional_headers.append(
+            (request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'))
+        )
+        if request.headers.get('If-None-Match') == self.etag:
+            self.statuses.append(304)
+            return web.Response(status=304, headers={'ETag': self.etag})
+
+        self.statuses.append(200)
+        body = {
+            'Timestamp': '2026-10-18T20:00:00+03:00',
+            'Valute': {'USD': {'Value': self.usd}, 'EUR': {'Value': 99.0}, 'AMD': {'Value': 0.2}}
+        }
+        if self.next_date:
+            body['NextDate'] = self.next_date
+        return web.Response(
+            text=json.dumps(body),
+            headers={'ETag': self.etag, 'Last-Modified': LAST_MODIFIED}
+        )
+
+
+def run_polls(api, steps, **kwargs):
+    """Выполнить шаги steps по очереди на одном CurrencyService.
+
+    Шаг - корутина step(service); перед каждым шагом срок опроса
+    сбрасывается, чтобы get_updated_rates шел в API
+    """
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/daily_json.js', api.daily)
+        async with TestServer(app) as server:
+            service = CurrencyService(api_url=str(server.make_url('/daily_json.js')), **kwargs)
+            try:
+                results = []
+                for step in steps:
+                    service.next_poll = None
+                    results.append(await step(service))
+            finally:
+                await service.close()
+        return service, results
+
+    return asyncio.run(scenario())
+
+
+async def get_rates(service):
+    rates = await service.get_updated_rates()
+    return dict(rates), service.not_modified, service._session
+
+
+def test_conditional_requests_200_304_200():
+    api = FakeCbrApi()
+
+    async def change_rates(service):
+        api.etag = '"v2"'
+        api.usd = 91.5
+        return await get_rates(service)
+
+    service, results = run_polls(api, [get_rates, get_rates, change_rates])
+
+    assert api.statuses == [200, 304, 200]
+    assert api.conditional_headers == [(None, None), ('"v1"', LAST_MODIFIED), ('"v1"', LAST_MODIFIED)]
+    (first, first_not_modified, _), (second, second_not_modified, _), (third, third_not_modified, _) = results
+    assert first == {'USD': 90.0, 'EUR': 99.0, 'RUB': 1.0}
+    assert not first_not_modified
+    assert second == first and second_not_modified
+    assert third['USD'] == 91.5 and not third_not_modified
+    assert service.last_update is not None
+
+
+def test_polls_share_one_session_and_connection():
+    api = FakeCbrApi()
+    _, results = run_polls(api, [get_rates, get_rates, get_rates])
+
+    sessions = {id(session) for _, _, session in results}
+    assert len(sessions) == 1
+    assert len(api.peers) == 1
+
+
+@pytest.mark.parametrize('next_date_in, min_delay, max_delay', [
+    # До NextDate далеко - опрос не чаще max_interval
+    (timedelta(hours=10), 590, 600),
+    # Ждем ровно до NextDate
+    (timedelta(minutes=5), 290, 300),
+    # Новые курсы уже ожидаются - обычный интервал
+    (timedelta(hours=-1), 25, 30),
+])
+def test_poll_delay_follows_expected_update(next_date_in, min_delay, max_delay):
+    api = FakeCbrApi(next_date=(datetime.now(timezone.utc) + next_date_in).isoformat())
+
+    async def delay(service):
+        await service.get_updated_rates()
+        return service.poll_delay()
+
+    _, (poll_delay,) = run_polls(api, [delay], update_interval=30, max_interval=600)
+    assert min_delay <= poll_delay <= max_delay
+
+
+def test_expected_update_falls_back_to_timestamp():
+    expected = CurrencyService._parse_expected_update({'Timestamp': '2026-10-18T20:00:00+03:00'})
+    assert expected == datetime(2026, 10, 19, 20, 0, tzinfo=timezone(timedelta(hours=3)))
+    assert CurrencyService._parse_expected_update({'NextDate': 'not a date'}) is None
+    assert CurrencyService().poll_delay() == 0.0
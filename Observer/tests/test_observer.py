@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'currency_observer'))
+
+from observer import CurrencySubject, WebSocketObserver, MESSAGE_DELTA, MESSAGE_SNAPSHOT
+
+
+class StalledWebSocket:
+    """Соединение, запись в которое ждет release()"""
+
+    def __init__(self):
+        self.messages = []
+        self.released = asyncio.Event()
+
+    async def write_message(self, message):
+        await self.released.wait()
+        self.messages.append(json.loads(message))
+
+    def close(self, code=None, reason=None):
+        pass
+
+
+async def overflow(snapshot_source):
+    """Клиент не принимает сообщения, пока субъект рассылает обновления.
+
+    Первое сообщение уходит в сокет и ждет, остальные копятся в очереди
+    до переполнения.
+    """
+    subject = CurrencySubject()
+    websocket = StalledWebSocket()
+    observer = WebSocketObserver(
+        websocket, max_queue=2,
+        snapshot=subject.snapshot if snapshot_source else None
+    )
+    subject.attach(observer)
+
+    subject.set_currency_data({'USD': 90.0})
+    await subject.notify()
+    await asyncio.sleep(0)
+    # Ответ на resync ждет в очереди за первым сообщением
+    await subject.send_snapshot(observer)
+    for usd in (91.0, 92.0):
+        subject.set_currency_data({'USD': usd})
+        await subject.notify()
+
+    queued = [message_type for message_type, _ in observer._queue]
+    websocket.released.set()
+    while observer.queued:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    observer.close()
+    return queued, websocket.messages
+
+
+def test_overflow_replaces_queue_with_fresh_snapshot():
+    queued, messages = asyncio.run(overflow(snapshot_source=True))
+
+    assert queued == [MESSAGE_SNAPSHOT]
+    assert [message['type'] for message in messages] == [MESSAGE_DELTA, MESSAGE_SNAPSHOT]
+    snapshot = messages[-1]['data']
+    # Снимок уже содержит последнее обновление: пропуска номера нет
+    assert snapshot['sequence'] == 3
+    assert snapshot['currencies'] == {'USD': 92.0}
+
+
+def test_overflow_without_snapshot_source_keeps_queued_snapshot():
+    queued, messages = asyncio.run(overflow(snapshot_source=False))
+
+    assert queued == [MESSAGE_SNAPSHOT, MESSAGE_DELTA]
+    assert [message['data']['sequence'] for message in messages] == [1, 1, 3]
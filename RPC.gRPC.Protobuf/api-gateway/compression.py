@@ -0,0 +1,90 @@
+import os
+import zlib
+from typing import Iterable, Iterator, Optional, Union
+
+try:
+    import brotli
+except ImportError:
+    # brotli необязателен: без него ответы сжимаются только gzip
+    brotli = None
+
+from serialization import JSON_MIME, PROTOBUF_MIME
+
+# Ответы короче порога не сжимаются: выигрыш меньше затрат CPU
+COMPRESS_MIN_SIZE = int(os.getenv('GATEWAY_COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GATEWAY_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('GATEWAY_BROTLI_QUALITY', 5))
+
+# Кодировки в порядке предпочтения при равном q в Accept-Encoding
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+COMPRESSIBLE_MIMETYPES = {JSON_MIME, PROTOBUF_MIME}
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Кодировка ответа по заголовку Accept-Encoding (None - без сжатия)"""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def is_compressible(mimetype: str, size: Optional[int] = None) -> bool:
+    """Стоит ли сжимать ответ: текст глоссария (JSON или protobuf) не меньше порога"""
+    if mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    return size is None or size >= COMPRESS_MIN_SIZE
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Сжать тело ответа целиком"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """Сжатие потокового ответа по фрагментам.
+
+    Фрагменты не сбрасываются по отдельности: потоковый JSON-список
+    нужен клиенту целиком, поэтому компрессор сам решает, когда
+    отдавать сжатые данные.
+    """
+
+    def __init__(self, encoding: str) -> None:
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress = self._compressor.compress
+            self._flush = self._compressor.flush
+
+    def compress(self, chunk: Union[str, bytes]) -> bytes:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+def iter_compressed(chunks: Iterable[Union[str, bytes]], encoding: str) -> Iterator[bytes]:
+    """Сжатые фрагменты потокового ответа"""
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def encoded_body(cached, encoding: str) -> bytes:
+    """Сжатое тело закэшированного ответа.
+
+    Сжимается один раз на кодировку при первом запросе, дальше
+    из ResponseCache отдаются готовые байты.
+    """
+    data = cached.encoded.get(encoding)
+    if data is None:
+        data = cached.encoded[encoding] = compress(cached.body, encoding)
+    return data
@@ -0,0 +1,104 @@
+import os
+import time
+from typing import Dict, Mapping, Optional
+
+import grpc
+
+
+# Срок маршрута без своей записи в ROUTE_DEADLINES_MS (GATEWAY_DEADLINE_MS)
+DEFAULT_DEADLINE_MS = 5000
+
+# Сроки по имени обработчика: точечные чтения должны отвечать быстро,
+# полный список и пакетная запись - дольше. 0 - без срока (SSE-поток
+# живет, пока клиент читает)
+ROUTE_DEADLINES_MS = {
+    'get_term': 1000,
+    'list_categories': 1000,
+    'search_terms': 2000,
+    'add_term': 2000,
+    'delete_term': 2000,
+    'get_category_terms': 3000,
+    'get_all_terms': 10000,
+    'add_terms_bulk': 30000,
+    'stream_terms': 0,
+}
+
+# Заголовок, которым клиент сообщает, сколько он готов ждать ответ;
+# срок маршрута он может только сократить
+TIMEOUT_HEADER = 'X-Request-Timeout-Ms'
+
+# HTTP-статусы для кодов gRPC; остальные ошибки сервиса - 500
+GRPC_HTTP_STATUS = {
+    grpc.StatusCode.INVALID_ARGUMENT: 400,
+    grpc.StatusCode.NOT_FOUND: 404,
+    grpc.StatusCode.DEADLINE_EXCEEDED: 504,
+    grpc.StatusCode.UNAVAILABLE: 503,
+}
+
+
+def route_deadlines_from_env() -> Dict[Optional[str], int]:
+    """Сроки маршрутов (мс); ключ None - срок по умолчанию.
+
+    Учитывает GATEWAY_DEADLINE_MS и
+    GATEWAY_ROUTE_DEADLINES_MS="get_term=500,search_terms=1500"
+    """
+    deadlines = dict(ROUTE_DEADLINES_MS)
+    deadlines[None] = int(os.getenv('GATEWAY_DEADLINE_MS', DEFAULT_DEADLINE_MS))
+    for item in os.getenv('GATEWAY_ROUTE_DEADLINES_MS', '').split(','):
+        if not item.strip():
+            continue
+        endpoint, _, value = item.partition('=')
+        deadlines[endpoint.strip()] = int(value)
+    return deadlines
+
+
+def client_timeout_ms(headers: Mapping) -> int:
+    """Срок из заголовка клиента (мс); 0 - заголовка нет или он некорректен"""
+    try:
+        return max(int(headers.get(TIMEOUT_HEADER, 0)), 0)
+    except ValueError:
+        return 0
+
+
+def client_shortens(endpoint: Optional[str], headers: Mapping,
+                     deadlines: Mapping[Optional[str], int]) -> bool:
+    """Срок клиента короче срока маршрута"""
+    budget_ms = deadlines.get(endpoint, deadlines[None])
+    client_ms = client_timeout_ms(headers)
+    return client_ms > 0 and (not budget_ms or client_ms < budget_ms)
+
+
+def request_deadline(endpoint: Optional[str], headers: Mapping,
+                     deadlines: Mapping[Optional[str], int]) -> Optional[float]:
+    """Срок HTTP-запроса (time.monotonic()) или None без срока"""
+    budget_ms = deadlines.get(endpoint, deadlines[None])
+    client_ms = client_timeout_ms(headers)
+    if client_ms > 0:
+        budget_ms = min(budget_ms, client_ms) if budget_ms else client_ms
+    if not budget_ms:
+        return None
+    return time.monotonic() + budget_ms / 1000
+
+
+def time_remaining(deadline: Optional[float]) -> Optional[float]:
+    """Оставшееся до срока время для timeout= вызова gRPC (секунды).
+
+    Сервис получает его в grpc-timeout и сам прекращает чтение из
+    Redis, когда ответ уже никому не нужен.
+    """
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def http_status(error: Exception) -> int:
+    """HTTP-статус ответа шлюза на ошибку вызова сервиса.
+
+    TimeoutError - срок запроса истек, пока он ждал общий вызов
+    (single_flight): 504, как и DEADLINE_EXCEEDED
+    """
+    if isinstance(error, grpc.RpcError):
+        return GRPC_HTTP_STATUS.get(error.code(), 500)
+    if isinstance(error, TimeoutError):
+        return 504
+    return 500
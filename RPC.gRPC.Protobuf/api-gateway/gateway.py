@@ -1,272 +1,438 @@
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
-import grpc
-import json
+import logging
 import os
 import sys
 
 # Добавляем текущую директорию в путь Python
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from logging_config import configure_logging
+
+# Уровень LOG_LEVEL; запросы пишутся в журнал на уровне DEBUG
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Импортируем protobuf модули
 try:
     import glossary_pb2
-    import glossary_pb2_grpc
 
-    print("Successfully imported protobuf modules")
+    logger.info("Successfully imported protobuf modules")
 except ImportError as e:
-    print(f"Import error: {e}")
-    print("Current directory:", os.getcwd())
-    print("Files:", os.listdir('.'))
+    logger.error("Import error: %s", e)
+    logger.error("Current directory: %s", os.getcwd())
+    logger.error("Files: %s", os.listdir('.'))
     raise
 
+from functools import wraps
+
+from compression import (
+    choose_encoding, compress, encoded_body, is_compressible, iter_compressed
+)
+from deadlines import (
+    client_shortens, request_deadline, route_deadlines_from_env, time_remaining
+)
+from grpc_pool import RawGlossaryStub, pool_from_env
+from handlers import (
+    SERVICE_UNAVAILABLE, InvalidArgument, add_result, add_term_request,
+    bad_request, batch_fields, batch_ids, bulk_add_result, bulk_items, categories_body,
+    category_request, conditional_check, delete_result, error_response, health_body,
+    index_body, page_fields, page_request, search_request, stream_request, term_body
+)
+from hedging import hedger_from_env
+from http_metrics import (
+    METRICS_CONTENT_TYPE, finish_request, register_stats, render, start_request, timed_call
+)
+from http_cache import CachedResponse, ResponseCache
+from serialization import (
+    JSON_MIME, PROTOBUF_MIME, iter_terms_json, response_mimetype,
+    should_stream, sse_batch_event, sse_error_event, term_to_dict
+)
+from single_flight import SingleFlight
+
 app = Flask(__name__)
 CORS(app)
+# Кириллица в ответах как есть, а не \uXXXX: тело меньше в 2-3 раза
+app.json.ensure_ascii = False
 
-# Конфигурация gRPC канала
-GRPC_SERVER = os.getenv('GRPC_SERVER', 'glossary-service:50051')
-print(f"API Gateway starting, connecting to gRPC at: {GRPC_SERVER}")
+# Конфигурация gRPC каналов: GRPC_SERVERS (или GRPC_SERVER), см. grpc_pool
+grpc_pool = pool_from_env()
+GRPC_SERVER = ','.join(grpc_pool.targets)
+logger.info("API Gateway starting, connecting to gRPC at: %s", GRPC_SERVER)
 
 
-def get_grpc_stub():
-    """Создание gRPC подключения"""
+def get_grpc_stub(raw=False):
+    """gRPC заглушка из пула долгоживущих каналов.
+
+    raw=True - заглушка, возвращающая ответы сервиса без разбора (bytes)
+    """
     try:
-        channel = grpc.insecure_channel(GRPC_SERVER)
-        return glossary_pb2_grpc.GlossaryServiceStub(channel)
+        return grpc_pool.stub(raw)
     except Exception as e:
-        print(f"Error creating gRPC channel: {e}")
+        logger.error("Error creating gRPC channel: %s", e)
         return None
 
 
+# Готовые тела GET-ответов по URL и поколению данных
+response_cache = ResponseCache(int(os.getenv('GATEWAY_RESPONSE_CACHE_SIZE', 256)))
+
+# Одинаковые одновременные чтения (GATEWAY_SINGLE_FLIGHT=1) - один вызов сервиса
+single_flight = SingleFlight(os.getenv('GATEWAY_SINGLE_FLIGHT', '1') != '0')
+
+# Сроки маршрутов (GATEWAY_DEADLINE_MS, GATEWAY_ROUTE_DEADLINES_MS) и
+# хеджирование медленных чтений на вторую реплику из GRPC_SERVERS
+route_deadlines = route_deadlines_from_env()
+hedger = hedger_from_env()
+
+COMPONENT_STATS = {
+    'grpc_pool': grpc_pool.stats,
+    'response_cache': response_cache.stats,
+    'single_flight': single_flight.stats,
+    'hedging': hedger.stats,
+}
+for component, stats in COMPONENT_STATS.items():
+    register_stats(component, stats)
+
+
+def coalesced(stub, method, request_msg):
+    """stub.<method>(request_msg); одинаковые одновременные вызовы объединяются.
+
+    Пока вызов с тем же методом, запросом и видом заглушки (разобранный
+    ответ или байты) выполняется, новые запросы ждут его результат, а не
+    идут в сервис: всплеск одинаковых GET /api/terms или поиска дает
+    один GetAllTerms/SearchTerms вместо сотни. Медленные GetTerm и
+    SearchTerms хеджируются на другую реплику (GATEWAY_HEDGE_DELAY_MS).
+
+    Общий вызов получает срок маршрута, а каждый ожидающий ждет не
+    дольше своего срока (иначе 504). Запрос с более коротким сроком
+    клиента (X-Request-Timeout-Ms) выполняется отдельно: его срок не
+    должен обрывать вызов для остальных.
+    """
+    key = (isinstance(stub, RawGlossaryStub), request_msg.SerializeToString(deterministic=True))
+    timeout = request_timeout()
+    alternate = grpc_pool.alternate(stub) if hedger.hedges(method) else None
+    return single_flight.do(method, key, lambda: timed_call(
+        method, lambda: hedger.call(stub, alternate, method, request_msg, timeout)
+    ), timeout=timeout, shared=not g.get('client_deadline', False))
+
+
+@app.before_request
+def start_timer():
+    g.started = start_request()
+
+
+@app.after_request
+def record_request(response):
+    """Время запроса по маршруту в gateway_http_request_duration_seconds"""
+    finish_request(g.pop('started', None), request.endpoint, request.method, response.status_code)
+    return response
+
+
+@app.before_request
+def start_deadline():
+    """Срок запроса: по маршруту (GATEWAY_ROUTE_DEADLINES_MS) и заголовку клиента"""
+    g.deadline = request_deadline(request.endpoint, request.headers, route_deadlines)
+    # Запрос со сроком короче маршрута не объединяется с другими, см. coalesced
+    g.client_deadline = client_shortens(request.endpoint, request.headers, route_deadlines)
+
+
+# Некорректные параметры запроса (handlers.InvalidArgument) - 400
+app.register_error_handler(InvalidArgument, bad_request)
+
+
+def request_timeout():
+    """Оставшееся время запроса для timeout= вызова gRPC; None - без срока"""
+    return time_remaining(g.get('deadline'))
+
+
+def conditional(view):
+    """Условные GET-запросы по поколению данных сервиса.
+
+    ETag и Last-Modified строятся по GetVersion. На совпавший
+    If-None-Match или If-Modified-Since отвечаем 304 без чтения данных,
+    иначе тело берется из response_cache или строится обработчиком.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            version = coalesced(get_grpc_stub(), 'GetVersion', glossary_pb2.Empty())
+        except Exception as e:
+            logger.error("Error in GetVersion: %s", e)
+            return view(*args, **kwargs)
+
+        etag, headers, not_modified = conditional_check(
+            version, request.headers, request.accept_mimetypes
+        )
+        if not_modified:
+            return app.response_class(status=304, headers=headers)
+
+        url = request.full_path
+        cached = response_cache.get(url, etag)
+        if cached is None:
+            # Поколение прочитано раньше данных: тело может оказаться
+            # новее ETag, но не старее, поэтому устаревшее не закэшируется
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if response.is_streamed:
+                # Большой список отдается потоком и в кэш не копируется
+                response.headers.update(headers)
+                return response
+            cached = CachedResponse(response.get_data(), response.content_type, {})
+            response_cache.put(url, etag, cached)
+        return cached_response(cached, headers)
+
+    return wrapper
+
+
+def cached_response(cached, headers):
+    """Ответ из кэша; сжатое тело тоже берется из записи кэша"""
+    response = app.response_class(cached.body, content_type=cached.content_type, headers=headers)
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding and is_compressible(response.mimetype, len(cached.body)):
+        response.set_data(encoded_body(cached, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Сжатие gzip/brotli ответов, не прошедших через кэш"""
+    if (not 200 <= response.status_code < 300 or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = iter_compressed(response.response, encoding)
+    elif is_compressible(response.mimetype, response.content_length or 0):
+        response.set_data(compress(response.get_data(), encoding))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def wants_protobuf():
+    """Клиент просит ответ в формате application/x-protobuf"""
+    return response_mimetype(request.accept_mimetypes) == PROTOBUF_MIME
+
+
+def protobuf_response(data):
+    """Сериализованное сообщение сервиса без изменений"""
+    return app.response_class(data, content_type=PROTOBUF_MIME)
+
+
+def terms_response(terms, with_dates=True, **fields):
+    """JSON-ответ {"terms": [...], **fields}; большие списки пишутся потоком"""
+    if should_stream(terms):
+        return app.response_class(iter_terms_json(terms, with_dates, fields), mimetype=JSON_MIME)
+    return jsonify({'terms': [term_to_dict(term, with_dates) for term in terms], **fields})
+
+
+def read_terms(where, method, request_msg, fields, with_dates=True):
+    """Список терминов из stub.<method>: protobuf без разбора или JSON.
+
+    fields(response) - дополнительные поля JSON-ответа
+    """
+    try:
+        as_protobuf = wants_protobuf()
+        stub = get_grpc_stub(raw=as_protobuf)
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        response = coalesced(stub, method, request_msg)
+        if as_protobuf:
+            return protobuf_response(response)
+        return terms_response(response.terms, with_dates, **fields(response))
+    except Exception as e:
+        return error_response(where, e)
+
+
 @app.route('/')
 def index():
     """Главная страница"""
-    return jsonify({
-        "service": "Python Glossary API Gateway",
-        "version": "1.0",
-        "endpoints": {
-            "/api/health": "GET - Health check",
-            "/api/terms": "GET - Get all terms",
-            "/api/terms/<id>": "GET - Get term by ID",
-            "/api/terms/search?q=<query>": "GET - Search terms",
-            "/api/terms": "POST - Add new term",
-            "/api/terms/<id>": "DELETE - Delete term",
-            "/api/terms/stream": "GET - Stream terms (SSE)"
-        }
-    })
+    return index_body("Python Glossary API Gateway")
 
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Проверка здоровья сервиса"""
-    return jsonify({
-        "status": "healthy",
-        "service": "Python Glossary API Gateway",
-        "grpc_server": GRPC_SERVER,
-        "timestamp": "2024-01-01T00:00:00Z"  # В реальном приложении используйте datetime
-    })
+    return health_body("Python Glossary API Gateway", GRPC_SERVER, COMPONENT_STATS)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Метрики в формате Prometheus"""
+    return app.response_class(render(), content_type=METRICS_CONTENT_TYPE)
 
 
 @app.route('/api/terms', methods=['GET'])
+@conditional
 def get_all_terms():
-    """Получить все термины"""
-    print("GET /api/terms called")
-    try:
-        stub = get_grpc_stub()
-        if not stub:
-            return jsonify({'error': 'gRPC service unavailable'}), 503
-
-        response = stub.GetAllTerms(glossary_pb2.Empty())
-
-        terms_list = []
-        for term in response.terms:
-            terms_list.append({
-                'id': term.id,
-                'name': term.name,
-                'definition': term.definition,
-                'category': term.category,
-                'examples': list(term.examples),
-                'synonyms': list(term.synonyms),
-                'created_at': term.created_at,
-                'updated_at': term.updated_at
-            })
-
-        return jsonify({
-            'terms': terms_list,
-            'total': response.total_count
-        })
-    except Exception as e:
-        print(f"Error in get_all_terms: {e}")
-        return jsonify({'error': str(e)}), 500
+    """Получить все термины, одну страницу или термины по списку ID"""
+    if 'ids' in request.args:
+        return get_terms_batch(request.args['ids'])
+
+    request_msg = page_request(request.args)
+    logger.debug("GET /api/terms called: page_size=%s, page_token=%s",
+                 request_msg.page_size, request_msg.page_token)
+    return read_terms('get_all_terms', 'GetAllTerms', request_msg, page_fields)
+
+
+def get_terms_batch(ids_param):
+    """Получить термины по списку ID одним вызовом BatchGetTerms"""
+    term_ids = batch_ids(ids_param)
+    logger.debug("GET /api/terms called: ids=%s", term_ids)
+    return read_terms(
+        'get_terms_batch', 'BatchGetTerms', glossary_pb2.BatchGetRequest(ids=term_ids),
+        lambda response: batch_fields(term_ids, response)
+    )
 
 
 @app.route('/api/terms/<term_id>', methods=['GET'])
+@conditional
 def get_term(term_id):
     """Получить термин по ID"""
-    print(f"GET /api/terms/{term_id} called")
+    logger.debug("GET /api/terms/%s called", term_id)
     try:
-        stub = get_grpc_stub()
+        as_protobuf = wants_protobuf()
+        stub = get_grpc_stub(raw=as_protobuf)
         if not stub:
-            return jsonify({'error': 'gRPC service unavailable'}), 503
-
-        request_msg = glossary_pb2.TermRequest(id=term_id)
-        term = stub.GetTerm(request_msg)
-
-        if not term.id:
-            return jsonify({'error': 'Term not found'}), 404
-
-        return jsonify({
-            'id': term.id,
-            'name': term.name,
-            'definition': term.definition,
-            'category': term.category,
-            'examples': list(term.examples),
-            'synonyms': list(term.synonyms),
-            'created_at': term.created_at,
-            'updated_at': term.updated_at
-        })
+            return SERVICE_UNAVAILABLE
+
+        term = coalesced(stub, 'GetTerm', glossary_pb2.TermRequest(id=term_id))
+        if as_protobuf:
+            return protobuf_response(term)
+        return term_body(term)
     except Exception as e:
-        print(f"Error in get_term: {e}")
-        return jsonify({'error': str(e)}), 500
+        return error_response('get_term', e)
 
 
 @app.route('/api/terms/search', methods=['GET'])
+@conditional
 def search_terms():
     """Поиск терминов"""
-    query = request.args.get('q', '')
-    category = request.args.get('category', '')
-    limit = int(request.args.get('limit', 10))
-    print(f"GET /api/terms/search called: q={query}, category={category}")
+    request_msg = search_request(request.args)
+    logger.debug("GET /api/terms/search called: q=%s, category=%s",
+                 request_msg.query, request_msg.category)
+    return read_terms(
+        'search_terms', 'SearchTerms', request_msg,
+        lambda response: {'total': response.total_count, 'query': request_msg.query},
+        with_dates=False
+    )
+
 
+@app.route('/api/terms', methods=['POST'])
+def add_term():
+    """Добавить новый термин"""
+    logger.debug("POST /api/terms called")
     try:
+        data = request.json
+        if not data:
+            return {'error': 'No data provided'}, 400
+
         stub = get_grpc_stub()
         if not stub:
-            return jsonify({'error': 'gRPC service unavailable'}), 503
+            return SERVICE_UNAVAILABLE
 
-        request_msg = glossary_pb2.SearchRequest(
-            query=query,
-            category=category,
-            limit=limit
-        )
-
-        response = stub.SearchTerms(request_msg)
-
-        terms_list = []
-        for term in response.terms:
-            terms_list.append({
-                'id': term.id,
-                'name': term.name,
-                'definition': term.definition,
-                'category': term.category,
-                'examples': list(term.examples),
-                'synonyms': list(term.synonyms)
-            })
-
-        return jsonify({
-            'terms': terms_list,
-            'total': response.total_count,
-            'query': query
-        })
+        return add_result(stub.AddTerm(add_term_request(data), timeout=request_timeout()))
     except Exception as e:
-        print(f"Error in search_terms: {e}")
-        return jsonify({'error': str(e)}), 500
+        return error_response('add_term', e)
 
 
-@app.route('/api/terms', methods=['POST'])
-def add_term():
-    """Добавить новый термин"""
-    print("POST /api/terms called")
+@app.route('/api/terms/bulk', methods=['POST'])
+def add_terms_bulk():
+    """Добавить много терминов одним потоковым вызовом AddTerms"""
+    logger.debug("POST /api/terms/bulk called")
     try:
-        data = request.json
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
+        items = bulk_items(request.json)
+        if items is None:
+            return {'error': 'Expected a list of terms'}, 400
 
         stub = get_grpc_stub()
         if not stub:
-            return jsonify({'error': 'gRPC service unavailable'}), 503
-
-        request_msg = glossary_pb2.AddTermRequest(
-            name=data.get('name', ''),
-            definition=data.get('definition', ''),
-            category=data.get('category', 'General'),
-            examples=data.get('examples', []),
-            synonyms=data.get('synonyms', [])
-        )
+            return SERVICE_UNAVAILABLE
 
-        response = stub.AddTerm(request_msg)
-
-        if response.success:
-            return jsonify({
-                'success': True,
-                'message': response.message,
-                'term_id': response.term_id
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': response.message
-            }), 400
+        response = stub.AddTerms(
+            (add_term_request(item) for item in items), timeout=request_timeout()
+        )
+        return bulk_add_result(response, len(items))
     except Exception as e:
-        print(f"Error in add_term: {e}")
-        return jsonify({'error': str(e)}), 500
+        return error_response('add_terms_bulk', e)
 
 
 @app.route('/api/terms/<term_id>', methods=['DELETE'])
 def delete_term(term_id):
     """Удалить термин"""
-    print(f"DELETE /api/terms/{term_id} called")
+    logger.debug("DELETE /api/terms/%s called", term_id)
     try:
         stub = get_grpc_stub()
         if not stub:
-            return jsonify({'error': 'gRPC service unavailable'}), 503
-
-        request_msg = glossary_pb2.TermRequest(id=term_id)
-        response = stub.DeleteTerm(request_msg)
-
-        if response.success:
-            return jsonify({
-                'success': True,
-                'message': response.message
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': response.message
-            }), 404
+            return SERVICE_UNAVAILABLE
+
+        response = stub.DeleteTerm(glossary_pb2.TermRequest(id=term_id), timeout=request_timeout())
+        return delete_result(response)
     except Exception as e:
-        print(f"Error in delete_term: {e}")
-        return jsonify({'error': str(e)}), 500
+        return error_response('delete_term', e)
+
+
+@app.route('/api/categories', methods=['GET'])
+@conditional
+def list_categories():
+    """Список категорий с количеством терминов"""
+    logger.debug("GET /api/categories called")
+    try:
+        stub = get_grpc_stub()
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        return categories_body(coalesced(stub, 'ListCategories', glossary_pb2.Empty()))
+    except Exception as e:
+        return error_response('list_categories', e)
+
+
+@app.route('/api/categories/<category>', methods=['GET'])
+@conditional
+def get_category_terms(category):
+    """Получить термины категории"""
+    logger.debug("GET /api/categories/%s called", category)
+    return read_terms(
+        'get_category_terms', 'SearchTerms', category_request(category),
+        lambda response: {'total': response.total_count, 'category': category},
+        with_dates=False
+    )
 
 
 @app.route('/api/terms/stream', methods=['GET'])
 def stream_terms():
-    """Потоковая передача терминов (SSE)"""
-    category = request.args.get('category', '')
-    batch_size = int(request.args.get('batch_size', 1))
-    print(f"GET /api/terms/stream called: category={category}")
+    """Потоковая передача терминов (SSE): одно событие на пакет batch_size"""
+    request_msg = stream_request(request.args)
+    logger.debug("GET /api/terms/stream called: category=%s, batch_size=%s",
+                 request_msg.category, request_msg.batch_size)
 
     def generate():
+        call = None
         try:
             stub = get_grpc_stub()
             if not stub:
-                yield f"data: {json.dumps({'error': 'gRPC service unavailable'})}\n\n"
+                yield sse_error_event('gRPC service unavailable')
                 return
 
-            request_msg = glossary_pb2.StreamRequest(
-                category=category,
-                batch_size=batch_size
-            )
-
-            for term in stub.StreamTerms(request_msg):
-                data_dict = {
-                    'id': term.id,
-                    'name': term.name,
-                    'definition': term.definition[:100] + "..." if len(term.definition) > 100 else term.definition,
-                    'category': term.category
-                }
-                yield f"data: {json.dumps(data_dict)}\n\n"
+            # Следующий пакет читается из потока gRPC, только когда WSGI-сервер
+            # отправил предыдущее событие клиенту
+            call = stub.StreamTermBatches(request_msg)
+            for batch in call:
+                yield sse_batch_event(batch.terms)
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield sse_error_event(str(e))
+        finally:
+            # Клиент отключился - отменяем поток на стороне сервиса
+            if call is not None:
+                call.cancel()
 
     return app.response_class(
         generate(),
@@ -279,5 +445,10 @@ def stream_terms():
 
 
 if __name__ == '__main__':
-    print(f"Starting Flask app on 0.0.0.0:5000")
-    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
+    # GATEWAY_MODE=aio - те же маршруты на ASGI (Quart + grpc.aio), см. gateway_aio.py
+    if os.getenv('GATEWAY_MODE', 'flask') == 'aio':
+        import gateway_aio
+        gateway_aio.main(int(os.getenv('GATEWAY_PORT', 5000)))
+    else:
+        logger.info("Starting Flask app on 0.0.0.0:5000")
+        app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,442 @@
+from quart import Quart, g, request, jsonify
+from quart_cors import cors
+from quart.wrappers.response import IterableBody
+import asyncio
+import logging
+import os
+import sys
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logging_config import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+import glossary_pb2
+from functools import wraps
+
+from compression import (
+    StreamCompressor, choose_encoding, compress, encoded_body, is_compressible
+)
+from deadlines import (
+    client_shortens, request_deadline, route_deadlines_from_env, time_remaining
+)
+from grpc_pool import AioChannelPool, RawGlossaryStub, pool_from_env
+from handlers import (
+    SERVICE_UNAVAILABLE, InvalidArgument, add_result, add_term_request,
+    bad_request, batch_fields, batch_ids, bulk_add_result, bulk_items, categories_body,
+    category_request, conditional_check, delete_result, error_response, health_body,
+    index_body, page_fields, page_request, search_request, stream_request, term_body
+)
+from hedging import hedger_from_env
+from http_metrics import (
+    METRICS_CONTENT_TYPE, finish_request, register_stats, render, start_request, timed_call_async
+)
+from http_cache import CachedResponse, ResponseCache
+from serialization import (
+    JSON_MIME, PROTOBUF_MIME, iter_terms_json, response_mimetype,
+    should_stream, sse_batch_event, sse_error_event, term_to_dict
+)
+from single_flight import AsyncSingleFlight
+
+app = cors(Quart(__name__))
+app.json.ensure_ascii = False
+
+# Каналы grpc.aio: ожидание ответа сервиса не занимает поток,
+# один процесс держит тысячи одновременных запросов и SSE-потоков
+grpc_pool = pool_from_env(AioChannelPool)
+GRPC_SERVER = ','.join(grpc_pool.targets)
+logger.info("Async API Gateway starting, connecting to gRPC at: %s", GRPC_SERVER)
+
+
+def get_grpc_stub(raw=False):
+    """gRPC заглушка (grpc.aio) из пула долгоживущих каналов.
+
+    raw=True - заглушка, возвращающая ответы сервиса без разбора (bytes)
+    """
+    try:
+        return grpc_pool.stub(raw)
+    except Exception as e:
+        logger.error("Error creating gRPC channel: %s", e)
+        return None
+
+
+# Готовые тела GET-ответов по URL и поколению данных
+response_cache = ResponseCache(int(os.getenv('GATEWAY_RESPONSE_CACHE_SIZE', 256)))
+
+# Одинаковые одновременные чтения - один вызов сервиса, см. gateway.coalesced
+single_flight = AsyncSingleFlight(os.getenv('GATEWAY_SINGLE_FLIGHT', '1') != '0')
+
+# Сроки маршрутов и хеджирование чтений, см. gateway.coalesced
+route_deadlines = route_deadlines_from_env()
+hedger = hedger_from_env()
+
+COMPONENT_STATS = {
+    'grpc_pool': grpc_pool.stats,
+    'response_cache': response_cache.stats,
+    'single_flight': single_flight.stats,
+    'hedging': hedger.stats,
+}
+for component, stats in COMPONENT_STATS.items():
+    register_stats(component, stats)
+
+
+async def coalesced(stub, method, request_msg):
+    """await stub.<method>(request_msg); одинаковые одновременные вызовы
+    объединяются, сроки - как в gateway.coalesced"""
+    key = (isinstance(stub, RawGlossaryStub), request_msg.SerializeToString(deterministic=True))
+    timeout = request_timeout()
+    alternate = grpc_pool.alternate(stub) if hedger.hedges(method) else None
+    return await single_flight.do(method, key, lambda: timed_call_async(
+        method, lambda: hedger.call_async(stub, alternate, method, request_msg, timeout)
+    ), timeout=timeout, shared=not g.get('client_deadline', False))
+
+
+@app.before_request
+async def start_timer():
+    g.started = start_request()
+
+
+@app.after_request
+async def record_request(response):
+    """Время запроса по маршруту в gateway_http_request_duration_seconds"""
+    finish_request(g.pop('started', None), request.endpoint, request.method, response.status_code)
+    return response
+
+
+@app.before_request
+async def start_deadline():
+    """Срок запроса: по маршруту (GATEWAY_ROUTE_DEADLINES_MS) и заголовку клиента"""
+    g.deadline = request_deadline(request.endpoint, request.headers, route_deadlines)
+    # Запрос со сроком короче маршрута не объединяется с другими, см. coalesced
+    g.client_deadline = client_shortens(request.endpoint, request.headers, route_deadlines)
+
+
+# Некорректные параметры запроса (handlers.InvalidArgument) - 400
+app.register_error_handler(InvalidArgument, bad_request)
+
+
+def request_timeout():
+    """Оставшееся время запроса для timeout= вызова gRPC; None - без срока"""
+    return time_remaining(g.get('deadline'))
+
+
+def conditional(view):
+    """Условные GET-запросы по поколению данных, см. gateway.conditional"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        try:
+            version = await coalesced(get_grpc_stub(), 'GetVersion', glossary_pb2.Empty())
+        except Exception as e:
+            logger.error("Error in GetVersion: %s", e)
+            return await view(*args, **kwargs)
+
+        etag, headers, not_modified = conditional_check(
+            version, request.headers, request.accept_mimetypes
+        )
+        if not_modified:
+            return app.response_class('', status=304, headers=headers)
+
+        url = request.full_path
+        cached = response_cache.get(url, etag)
+        if cached is None:
+            response = await app.make_response(await view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if isinstance(response.response, IterableBody):
+                response.headers.update(headers)
+                return response
+            cached = CachedResponse(await response.get_data(), response.content_type, {})
+            response_cache.put(url, etag, cached)
+        return cached_response(cached, headers)
+
+    return wrapper
+
+
+def cached_response(cached, headers):
+    """Ответ из кэша; сжатое тело тоже берется из записи кэша"""
+    response = app.response_class(cached.body, content_type=cached.content_type, headers=headers)
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding and is_compressible(response.mimetype, len(cached.body)):
+        response.set_data(encoded_body(cached, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+async def aiter_compressed(body, encoding):
+    """Сжатые фрагменты потокового ответа"""
+    compressor = StreamCompressor(encoding)
+    async with body as chunks:
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    yield compressor.finish()
+
+
+@app.after_request
+async def compress_response(response):
+    """Сжатие gzip/brotli ответов, не прошедших через кэш"""
+    if (not 200 <= response.status_code < 300 or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    if isinstance(response.response, IterableBody):
+        response.response = IterableBody(aiter_compressed(response.response, encoding))
+    elif is_compressible(response.mimetype, response.content_length or 0):
+        response.set_data(compress(await response.get_data(), encoding))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def wants_protobuf():
+    """Клиент просит ответ в формате application/x-protobuf"""
+    return response_mimetype(request.accept_mimetypes) == PROTOBUF_MIME
+
+
+def protobuf_response(data):
+    """Сериализованное сообщение сервиса без изменений"""
+    return app.response_class(data, content_type=PROTOBUF_MIME)
+
+
+def terms_response(terms, with_dates=True, **fields):
+    """JSON-ответ {"terms": [...], **fields}; большие списки пишутся потоком"""
+    if should_stream(terms):
+        return app.response_class(iter_terms_json(terms, with_dates, fields), mimetype=JSON_MIME)
+    return jsonify({'terms': [term_to_dict(term, with_dates) for term in terms], **fields})
+
+
+async def read_terms(where, method, request_msg, fields, with_dates=True):
+    """Список терминов из stub.<method>, см. gateway.read_terms"""
+    try:
+        as_protobuf = wants_protobuf()
+        stub = get_grpc_stub(raw=as_protobuf)
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        response = await coalesced(stub, method, request_msg)
+        if as_protobuf:
+            return protobuf_response(response)
+        return terms_response(response.terms, with_dates, **fields(response))
+    except Exception as e:
+        return error_response(where, e)
+
+
+@app.after_serving
+async def close_channels():
+    await grpc_pool.close()
+
+
+@app.route('/')
+async def index():
+    """Главная страница"""
+    return index_body("Python Glossary API Gateway (async)")
+
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    """Проверка здоровья сервиса"""
+    return health_body("Python Glossary API Gateway (async)", GRPC_SERVER, COMPONENT_STATS)
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return app.response_class(render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/api/terms', methods=['GET'])
+@conditional
+async def get_all_terms():
+    """Получить все термины, одну страницу или термины по списку ID"""
+    if 'ids' in request.args:
+        return await get_terms_batch(request.args['ids'])
+
+    request_msg = page_request(request.args)
+    logger.debug("GET /api/terms called: page_size=%s, page_token=%s",
+                 request_msg.page_size, request_msg.page_token)
+    return await read_terms('get_all_terms', 'GetAllTerms', request_msg, page_fields)
+
+
+async def get_terms_batch(ids_param):
+    """Получить термины по списку ID одним вызовом BatchGetTerms"""
+    term_ids = batch_ids(ids_param)
+    logger.debug("GET /api/terms called: ids=%s", term_ids)
+    return await read_terms(
+        'get_terms_batch', 'BatchGetTerms', glossary_pb2.BatchGetRequest(ids=term_ids),
+        lambda response: batch_fields(term_ids, response)
+    )
+
+
+@app.route('/api/terms/<term_id>', methods=['GET'])
+@conditional
+async def get_term(term_id):
+    """Получить термин по ID"""
+    logger.debug("GET /api/terms/%s called", term_id)
+    try:
+        as_protobuf = wants_protobuf()
+        stub = get_grpc_stub(raw=as_protobuf)
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        term = await coalesced(stub, 'GetTerm', glossary_pb2.TermRequest(id=term_id))
+        if as_protobuf:
+            return protobuf_response(term)
+        return term_body(term)
+    except Exception as e:
+        return error_response('get_term', e)
+
+
+@app.route('/api/terms/search', methods=['GET'])
+@conditional
+async def search_terms():
+    """Поиск терминов"""
+    request_msg = search_request(request.args)
+    logger.debug("GET /api/terms/search called: q=%s, category=%s",
+                 request_msg.query, request_msg.category)
+    return await read_terms(
+        'search_terms', 'SearchTerms', request_msg,
+        lambda response: {'total': response.total_count, 'query': request_msg.query},
+        with_dates=False
+    )
+
+
+@app.route('/api/terms', methods=['POST'])
+async def add_term():
+    """Добавить новый термин"""
+    logger.debug("POST /api/terms called")
+    try:
+        data = await request.get_json()
+        if not data:
+            return {'error': 'No data provided'}, 400
+
+        stub = get_grpc_stub()
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        return add_result(await stub.AddTerm(add_term_request(data), timeout=request_timeout()))
+    except Exception as e:
+        return error_response('add_term', e)
+
+
+@app.route('/api/terms/bulk', methods=['POST'])
+async def add_terms_bulk():
+    """Добавить много терминов одним потоковым вызовом AddTerms"""
+    logger.debug("POST /api/terms/bulk called")
+    try:
+        items = bulk_items(await request.get_json())
+        if items is None:
+            return {'error': 'Expected a list of terms'}, 400
+
+        stub = get_grpc_stub()
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        response = await stub.AddTerms(
+            (add_term_request(item) for item in items), timeout=request_timeout()
+        )
+        return bulk_add_result(response, len(items))
+    except Exception as e:
+        return error_response('add_terms_bulk', e)
+
+
+@app.route('/api/terms/<term_id>', methods=['DELETE'])
+async def delete_term(term_id):
+    """Удалить термин"""
+    logger.debug("DELETE /api/terms/%s called", term_id)
+    try:
+        stub = get_grpc_stub()
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        response = await stub.DeleteTerm(glossary_pb2.TermRequest(id=term_id), timeout=request_timeout())
+        return delete_result(response)
+    except Exception as e:
+        return error_response('delete_term', e)
+
+
+@app.route('/api/categories', methods=['GET'])
+@conditional
+async def list_categories():
+    """Список категорий с количеством терминов"""
+    logger.debug("GET /api/categories called")
+    try:
+        stub = get_grpc_stub()
+        if not stub:
+            return SERVICE_UNAVAILABLE
+
+        return categories_body(await coalesced(stub, 'ListCategories', glossary_pb2.Empty()))
+    except Exception as e:
+        return error_response('list_categories', e)
+
+
+@app.route('/api/categories/<category>', methods=['GET'])
+@conditional
+async def get_category_terms(category):
+    """Получить термины категории"""
+    logger.debug("GET /api/categories/%s called", category)
+    return await read_terms(
+        'get_category_terms', 'SearchTerms', category_request(category),
+        lambda response: {'total': response.total_count, 'category': category},
+        with_dates=False
+    )
+
+
+@app.route('/api/terms/stream', methods=['GET'])
+async def stream_terms():
+    """Потоковая передача терминов (SSE): одно событие на пакет batch_size"""
+    request_msg = stream_request(request.args)
+    logger.debug("GET /api/terms/stream called: category=%s, batch_size=%s",
+                 request_msg.category, request_msg.batch_size)
+
+    async def generate():
+        call = None
+        try:
+            stub = get_grpc_stub()
+            if not stub:
+                yield sse_error_event('gRPC service unavailable')
+                return
+
+            call = stub.StreamTermBatches(request_msg)
+            async for batch in call:
+                yield sse_batch_event(batch.terms)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield sse_error_event(str(e))
+        finally:
+            # Клиент отключился - отменяем поток на стороне сервиса
+            if call is not None:
+                call.cancel()
+
+    response = await app.make_response((generate(), {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }))
+    # SSE-поток живет дольше стандартного таймаута ответа Quart
+    response.timeout = None
+    return response
+
+
+def main(port=5000):
+    """Запуск ASGI-сервера Hypercorn"""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f'0.0.0.0:{port}']
+    logger.info("Starting async gateway (Hypercorn) on 0.0.0.0:%s", port)
+    asyncio.run(serve(app, config))
+
+
+if __name__ == '__main__':
+    main(int(os.getenv('GATEWAY_PORT', 5000)))
@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import grpc
+
+import glossary_pb2
+import glossary_pb2_grpc
+from grpc_compression import compression_from_env
+
+
+# Значения по умолчанию для keepalive: пинг простаивающего соединения
+# раз в 30 секунд, ответ ждем 10 секунд
+DEFAULT_KEEPALIVE_TIME_MS = 30000
+DEFAULT_KEEPALIVE_TIMEOUT_MS = 10000
+
+# Максимальный размер ответа: GetAllTerms без страниц для большого
+# глоссария не помещается в стандартные 4 МБ
+DEFAULT_MAX_RECEIVE_MESSAGE_MB = 64
+
+
+def channel_options(keepalive_time_ms: int = DEFAULT_KEEPALIVE_TIME_MS,
+                    keepalive_timeout_ms: int = DEFAULT_KEEPALIVE_TIMEOUT_MS,
+                    max_receive_message_mb: int = DEFAULT_MAX_RECEIVE_MESSAGE_MB,
+                    bdp_probe: bool = True) -> List[Tuple[str, int]]:
+    """Опции долгоживущего канала.
+
+    grpc.use_local_subchannel_pool нужен, чтобы несколько каналов к одному
+    адресу открывали отдельные HTTP/2-соединения, а не делили одно: сервер
+    ограничивает число одновременных потоков на соединение
+    (grpc.max_concurrent_streams).
+
+    bdp_probe=False оставляет окно управления потоком HTTP/2 стандартным
+    (64 КБ): потоковые RPC опережают медленного клиента на единицы
+    пакетов, а не на мегабайты, ценой пропускной способности на
+    каналах с большой задержкой.
+    """
+    return [
+        ('grpc.keepalive_time_ms', keepalive_time_ms),
+        ('grpc.keepalive_timeout_ms', keepalive_timeout_ms),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.max_pings_without_data', 0),
+        ('grpc.use_local_subchannel_pool', 1),
+        ('grpc.max_receive_message_length', max_receive_message_mb * 1024 * 1024),
+        ('grpc.http2.bdp_probe', int(bdp_probe)),
+    ]
+
+
+class RawGlossaryStub:
+    """Заглушка унарных методов, возвращающая ответ сервиса как есть (bytes).
+
+    Ответ не разбирается в сообщение, поэтому шлюз может отдать его
+    клиенту в формате application/x-protobuf без повторной сериализации.
+    """
+
+    def __init__(self, channel) -> None:
+        service = glossary_pb2.DESCRIPTOR.services_by_name['GlossaryService']
+        for method in service.methods:
+            if method.client_streaming or method.server_streaming:
+                continue
+            request_class = getattr(glossary_pb2, method.input_type.name)
+            setattr(self, method.name, channel.unary_unary(
+                f'/{service.full_name}/{method.name}',
+                request_serializer=request_class.SerializeToString,
+                response_deserializer=None
+            ))
+
+
+class ChannelPool:
+    """Пул gRPC-каналов к сервисам глоссария.
+
+    Каналы создаются один раз на процесс при первом обращении и живут до
+    close(): соединение и HTTP/2-рукопожатие не повторяются на каждый
+    HTTP-запрос. stub() раздает заглушки по кругу между всеми адресами
+    и channels_per_target каналами на адрес. После fork (несколько
+    воркеров) дочерний процесс создает свои каналы: каналы gRPC нельзя
+    использовать из другого процесса.
+    """
+
+    def __init__(self, targets: Sequence[str], channels_per_target: int = 1,
+                 options: Optional[List[Tuple[str, int]]] = None,
+                 compression: grpc.Compression = grpc.Compression.NoCompression) -> None:
+        if not targets:
+            raise ValueError("At least one gRPC target is required")
+        self.targets = list(targets)
+        self.channels_per_target = max(channels_per_target, 1)
+        self.options = channel_options() if options is None else options
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._owner_key = None
+        self._channels: List[grpc.Channel] = []
+        self._stubs: List[glossary_pb2_grpc.GlossaryServiceStub] = []
+        self._raw_stubs: List[RawGlossaryStub] = []
+        self._next = None
+
+    def _owner(self):
+        """Владелец каналов: каналы создаются заново, когда он меняется"""
+        return os.getpid()
+
+    def _create_channel(self, target: str):
+        return grpc.insecure_channel(target, options=self.options, compression=self.compression)
+
+    def _connect(self) -> None:
+        """Создать каналы текущего владельца"""
+        # Каналы, унаследованные от родителя после fork, не закрываем:
+        # они принадлежат другому процессу
+        self._channels = [
+            self._create_channel(target)
+            for _ in range(self.channels_per_target)
+            for target in self.targets
+        ]
+        self._stubs = [glossary_pb2_grpc.GlossaryServiceStub(channel) for channel in self._channels]
+        self._raw_stubs = [RawGlossaryStub(channel) for channel in self._channels]
+        self._next = itertools.cycle(range(len(self._stubs)))
+        self._owner_key = self._owner()
+
+    def stub(self, raw: bool = False):
+        """Следующая заглушка по кругу; raw=True - RawGlossaryStub"""
+        with self._lock:
+            if self._owner_key != self._owner():
+                self._connect()
+            index = next(self._next)
+            return self._raw_stubs[index] if raw else self._stubs[index]
+
+    def alternate(self, stub):
+        """Заглушка того же вида на канале к другому адресу (для хеджирования).
+
+        Каналы идут по кругу адресов, поэтому соседний канал ведет на
+        следующую реплику. None - адрес один или stub не из пула.
+        """
+        with self._lock:
+            if len(self.targets) < 2:
+                return None
+            for stubs in (self._stubs, self._raw_stubs):
+                for index, candidate in enumerate(stubs):
+                    if candidate is stub:
+                        return stubs[(index + 1) % len(stubs)]
+        return None
+
+    def _release(self) -> List:
+        """Забрать каналы текущего владельца для закрытия"""
+        with self._lock:
+            channels = self._channels if self._owner_key == self._owner() else []
+            self._channels = []
+            self._stubs = []
+            self._raw_stubs = []
+            self._owner_key = None
+        return channels
+
+    def close(self) -> None:
+        """Закрыть каналы"""
+        for channel in self._release():
+            channel.close()
+
+    def stats(self) -> Dict:
+        return {
+            'targets': self.targets,
+            'channels_per_target': self.channels_per_target,
+            'compression': self.compression.name,
+            'open_channels': len(self._channels) if self._owner_key == self._owner() else 0
+        }
+
+
+class AioChannelPool(ChannelPool):
+    """Пул каналов grpc.aio для асинхронного шлюза.
+
+    Каналы grpc.aio привязаны к event loop, поэтому создаются при первом
+    обращении из запущенного цикла и заново для каждого нового цикла.
+    """
+
+    def _owner(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        return os.getpid(), id(loop)
+
+    def _create_channel(self, target: str):
+        return grpc.aio.insecure_channel(target, options=self.options, compression=self.compression)
+
+    async def close(self) -> None:
+        """Закрыть каналы"""
+        for channel in self._release():
+            await channel.close()
+
+
+def pool_from_env(pool_class=ChannelPool) -> ChannelPool:
+    """Пул по переменным окружения.
+
+    GRPC_SERVERS - адреса через запятую (по умолчанию GRPC_SERVER),
+    GRPC_CHANNELS_PER_SERVER, GRPC_KEEPALIVE_TIME_MS, GRPC_KEEPALIVE_TIMEOUT_MS,
+    GRPC_MAX_RECEIVE_MESSAGE_MB, GRPC_HTTP2_BDP_PROBE (1|0),
+    GRPC_COMPRESSION (none|gzip|deflate).
+    """
+    servers = os.getenv('GRPC_SERVERS') or os.getenv('GRPC_SERVER', 'glossary-service:50051')
+    return pool_class(
+        targets=[target.strip() for target in servers.split(',') if target.strip()],
+        channels_per_target=int(os.getenv('GRPC_CHANNELS_PER_SERVER', 1)),
+        options=channel_options(
+            keepalive_time_ms=int(os.getenv('GRPC_KEEPALIVE_TIME_MS', DEFAULT_KEEPALIVE_TIME_MS)),
+            keepalive_timeout_ms=int(os.getenv('GRPC_KEEPALIVE_TIMEOUT_MS', DEFAULT_KEEPALIVE_TIMEOUT_MS)),
+            max_receive_message_mb=int(os.getenv('GRPC_MAX_RECEIVE_MESSAGE_MB', DEFAULT_MAX_RECEIVE_MESSAGE_MB)),
+            bdp_probe=os.getenv('GRPC_HTTP2_BDP_PROBE', '1') != '0'
+        ),
+        compression=compression_from_env()
+    )
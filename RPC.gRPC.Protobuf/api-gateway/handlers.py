@@ -0,0 +1,229 @@
+import logging
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import glossary_pb2
+from deadlines import http_status
+from http_cache import is_not_modified, last_modified, make_etag, validator_headers
+from serialization import MAX_SSE_BATCH_SIZE, SSE_BATCH_SIZE, response_mimetype, term_to_dict
+
+logger = logging.getLogger(__name__)
+
+# Разбор запросов и сборка тел ответов, общие для gateway.py (Flask)
+# и gateway_aio.py (Quart): тела возвращаются словарем или парой
+# (словарь, статус), их одинаково принимают оба фреймворка. Вызовы
+# сервиса и объекты ответов остаются в модулях шлюзов
+
+SERVICE_UNAVAILABLE = ({'error': 'gRPC service unavailable'}, 503)
+TERM_NOT_FOUND = ({'error': 'Term not found'}, 404)
+
+# Числовые поля запросов сервиса - int32
+INT32_MAX = 2 ** 31 - 1
+
+
+class InvalidArgument(ValueError):
+    """Некорректный параметр запроса; шлюзы отвечают на него 400"""
+
+
+def bad_request(e: InvalidArgument) -> Tuple[Dict, int]:
+    return {'error': str(e)}, 400
+
+
+def int_arg(args: Mapping, name: str, default: int, minimum: int = 0,
+            maximum: int = INT32_MAX) -> int:
+    """Целый параметр запроса не меньше minimum; больше maximum - maximum.
+
+    Не число или значение меньше minimum - InvalidArgument
+    """
+    value = args.get(name, '')
+    if value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise InvalidArgument(f"{name} must be an integer") from None
+    if number < minimum:
+        raise InvalidArgument(f"{name} must be >= {minimum}")
+    return min(number, maximum)
+
+
+ENDPOINTS = {
+    "GET /api/health": "Health check",
+    "GET /metrics": "Prometheus metrics",
+    "GET /api/terms": "Get all terms (?page_size=&page_token= for pages, ?ids=1,2,3 for a batch)",
+    "GET /api/terms/<id>": "Get term by ID",
+    "GET /api/terms/search?q=<query>": "Search terms",
+    "POST /api/terms": "Add new term",
+    "DELETE /api/terms/<id>": "Delete term",
+    "POST /api/terms/bulk": "Add many terms",
+    "GET /api/terms/stream": "Stream terms (SSE)",
+    "GET /api/categories": "List categories with term counts",
+    "GET /api/categories/<name>": "Get terms of category"
+}
+
+
+def index_body(service: str) -> Dict:
+    """Главная страница: список маршрутов"""
+    return {"service": service, "version": "1.0", "endpoints": ENDPOINTS}
+
+
+def health_body(service: str, grpc_server: str, components: Mapping) -> Dict:
+    """Проверка здоровья: адреса сервиса и счетчики компонентов шлюза"""
+    return {
+        "status": "healthy",
+        "service": service,
+        "grpc_server": grpc_server,
+        **{name: stats() for name, stats in components.items()},
+        "timestamp": "2024-01-01T00:00:00Z"  # В реальном приложении используйте datetime
+    }
+
+
+def error_response(where: str, e: Exception) -> Tuple[Dict, int]:
+    """Ответ на ошибку со статусом по коду gRPC (deadlines.GRPC_HTTP_STATUS).
+
+    На ошибки запроса (4xx) отвечаем текстом сервиса, остальные
+    пишутся в журнал и отдаются целиком
+    """
+    status = http_status(e)
+    if status < 500:
+        logger.debug("Rejected in %s: %s", where, e)
+        return {'error': e.details() or e.code().name}, status
+    logger.error("Error in %s: %s", where, e)
+    return {'error': str(e)}, status
+
+
+def conditional_check(version, headers: Mapping, accept_mimetypes) -> Tuple[str, Dict, bool]:
+    """ETag, заголовки валидаторов и признак ответа 304 для поколения данных.
+
+    JSON и protobuf - разные представления: у каждого свой ETag и своя
+    запись в кэше ответов.
+    """
+    etag = make_etag(version, response_mimetype(accept_mimetypes))
+    modified = last_modified(version)
+    return etag, validator_headers(etag, modified), is_not_modified(headers, etag, modified)
+
+
+def page_request(args: Mapping) -> glossary_pb2.PageRequest:
+    """PageRequest из ?page_size=&page_token=.
+
+    Курсор - ID последнего термина предыдущей страницы, то есть
+    десятичное число; другой курсор сервис все равно отклонит.
+    """
+    page_token = args.get('page_token', '')
+    if page_token and not (page_token.isascii() and page_token.isdigit()):
+        raise InvalidArgument(f"Invalid page token: {page_token}")
+    return glossary_pb2.PageRequest(
+        page_size=int_arg(args, 'page_size', 0),
+        page_token=page_token
+    )
+
+
+def page_fields(response) -> Dict:
+    return {'total': response.total_count, 'next_page_token': response.next_page_token}
+
+
+def batch_ids(ids_param: str) -> List[str]:
+    """ID из ?ids=1,2,3"""
+    return [term_id for term_id in ids_param.split(',') if term_id]
+
+
+def batch_fields(term_ids: List[str], response) -> Dict:
+    """Поля ответа на пакетное чтение: ID, которых нет в глоссарии"""
+    found = {term.id for term in response.terms}
+    return {
+        'total': response.total_count,
+        'missing': [term_id for term_id in term_ids if term_id not in found]
+    }
+
+
+def search_request(args: Mapping) -> glossary_pb2.SearchRequest:
+    """SearchRequest из ?q=&category=&limit="""
+    return glossary_pb2.SearchRequest(
+        query=args.get('q', ''),
+        category=args.get('category', ''),
+        limit=int_arg(args, 'limit', 10)
+    )
+
+
+def category_request(category: str) -> glossary_pb2.SearchRequest:
+    """Пустой запрос с категорией читает только множество category:{name}"""
+    return glossary_pb2.SearchRequest(query='', category=category)
+
+
+def stream_request(args: Mapping) -> glossary_pb2.StreamRequest:
+    """StreamRequest из ?category=&batch_size=; batch_size от 1 до MAX_SSE_BATCH_SIZE"""
+    return glossary_pb2.StreamRequest(
+        category=args.get('category', ''),
+        batch_size=int_arg(args, 'batch_size', SSE_BATCH_SIZE, minimum=1, maximum=MAX_SSE_BATCH_SIZE)
+    )
+
+
+def term_body(term):
+    """Тело ответа на чтение термина; пустой Term - термина нет"""
+    if not term.id:
+        return TERM_NOT_FOUND
+    return term_to_dict(term)
+
+
+def add_term_request(item: Mapping) -> glossary_pb2.AddTermRequest:
+    """AddTermRequest из JSON-объекта"""
+    return glossary_pb2.AddTermRequest(
+        name=item.get('name', ''),
+        definition=item.get('definition', ''),
+        category=item.get('category', 'General'),
+        examples=item.get('examples', []),
+        synonyms=item.get('synonyms', [])
+    )
+
+
+def bulk_items(data) -> Optional[List]:
+    """Список терминов из тела POST /api/terms/bulk ([...] или {"terms": [...]})"""
+    if isinstance(data, dict):
+        data = data.get('terms')
+    if not data or not isinstance(data, list):
+        return None
+    return data
+
+
+def add_result(response) -> Tuple[Dict, int]:
+    """Ответ на AddTerm: 201 или 400 с сообщением сервиса"""
+    if response.success:
+        return {
+            'success': True,
+            'message': response.message,
+            'term_id': response.term_id
+        }, 201
+    return {'success': False, 'error': response.message}, 400
+
+
+def bulk_add_result(response, count: int) -> Tuple[Dict, int]:
+    """Ответ на AddTerms: 201, если добавлен хотя бы один термин"""
+    return {
+        'success': response.added_count == count,
+        'added': response.added_count,
+        'results': [
+            {
+                'success': result.success,
+                'message': result.message,
+                'term_id': result.term_id
+            }
+            for result in response.results
+        ]
+    }, 201 if response.added_count else 400
+
+
+def delete_result(response):
+    """Ответ на DeleteTerm"""
+    if response.success:
+        return {'success': True, 'message': response.message}
+    return {'success': False, 'error': response.message}, 404
+
+
+def categories_body(response) -> Dict:
+    """Список категорий с количеством терминов"""
+    return {
+        'categories': [
+            {'name': category.name, 'term_count': category.term_count}
+            for category in response.categories
+        ],
+        'total': len(response.categories)
+    }
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import grpc
+
+
+# Методы, которые можно безопасно повторить на второй реплике:
+# точечные чтения без побочных эффектов
+HEDGED_METHODS = frozenset({'GetTerm', 'SearchTerms'})
+
+# Доля вызовов, для которых разрешен дублирующий запрос: при общей
+# деградации сервиса хеджирование не должно удваивать нагрузку
+DEFAULT_HEDGE_MAX_RATIO = 0.1
+
+
+class Hedger:
+    """Хеджирование медленных чтений (hedged requests).
+
+    Если ответ на GetTerm или SearchTerms не пришел за delay_ms,
+    тот же запрос отправляется на другую реплику, и берется первый
+    успешный ответ; второй вызов отменяется. Дублирующих запросов не
+    больше max_ratio от числа вызовов. delay_ms=0 - хеджирование
+    выключено. Задержку стоит выбирать около p95 метода: тогда
+    дублируется только хвост медленных ответов.
+    """
+
+    def __init__(self, delay_ms: int = 0, max_ratio: float = DEFAULT_HEDGE_MAX_RATIO,
+                 methods=HEDGED_METHODS) -> None:
+        self.delay = delay_ms / 1000
+        self.max_ratio = max_ratio
+        self.methods = frozenset(methods)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+
+    def hedges(self, method: str) -> bool:
+        """Хеджируется ли метод"""
+        return self.delay > 0 and method in self.methods
+
+    def _start(self) -> None:
+        with self._lock:
+            self._calls += 1
+
+    def _reserve(self) -> bool:
+        """Разрешить дублирующий запрос, если бюджет max_ratio не исчерпан"""
+        with self._lock:
+            if self._hedged + 1 > self._calls * self.max_ratio:
+                return False
+            self._hedged += 1
+            return True
+
+    def _won(self) -> None:
+        with self._lock:
+            self._hedge_wins += 1
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+    def call(self, stub, alternate, method: str, request_msg, timeout: Optional[float] = None) -> Any:
+        """stub.<method>(request_msg, timeout=timeout) с хеджированием на alternate"""
+        rpc = getattr(stub, method)
+        if alternate is None or not self.hedges(method):
+            return rpc(request_msg, timeout=timeout)
+
+        self._start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        primary = rpc.future(request_msg, timeout=timeout)
+        try:
+            return primary.result(timeout=self.delay)
+        except grpc.FutureTimeoutError:
+            pass
+        if not self._reserve():
+            return primary.result()
+
+        secondary = getattr(alternate, method).future(request_msg, timeout=self._remaining(deadline))
+        done = queue.Queue()
+        primary.add_done_callback(done.put)
+        secondary.add_done_callback(done.put)
+        error = None
+        try:
+            for _ in range(2):
+                future = done.get()
+                if future.exception() is None:
+                    if future is secondary:
+                        self._won()
+                    return future.result()
+                error = error or future.exception()
+            raise error
+        finally:
+            primary.cancel()
+            secondary.cancel()
+
+    async def call_async(self, stub, alternate, method: str, request_msg,
+                         timeout: Optional[float] = None) -> Any:
+        """call() для заглушек grpc.aio"""
+        rpc = getattr(stub, method)
+        if alternate is None or not self.hedges(method):
+            return await rpc(request_msg, timeout=timeout)
+
+        self._start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        calls = [rpc(request_msg, timeout=timeout)]
+        tasks = [asyncio.ensure_future(calls[0])]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay)
+            if done or not self._reserve():
+                return await tasks[0]
+
+            calls.append(getattr(alternate, method)(request_msg, timeout=self._remaining(deadline)))
+            tasks.append(asyncio.ensure_future(calls[1]))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self._won()
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # Проигравший (или брошенный клиентом) вызов отменяется и на сервисе
+            for call in calls:
+                call.cancel()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self.delay > 0,
+                'delay_ms': round(self.delay * 1000),
+                'max_ratio': self.max_ratio,
+                'calls': self._calls,
+                'hedged': self._hedged,
+                'hedge_wins': self._hedge_wins
+            }
+
+
+def hedger_from_env() -> Hedger:
+    """Hedger по GATEWAY_HEDGE_DELAY_MS (0 - выключено) и GATEWAY_HEDGE_MAX_RATIO"""
+    return Hedger(
+        delay_ms=int(os.getenv('GATEWAY_HEDGE_DELAY_MS', 0)),
+        max_ratio=float(os.getenv('GATEWAY_HEDGE_MAX_RATIO', DEFAULT_HEDGE_MAX_RATIO))
+    )
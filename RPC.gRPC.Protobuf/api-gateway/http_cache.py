@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Mapping, NamedTuple, Optional
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    content_type: str
+    # Сжатые варианты тела по Content-Encoding, заполняются по запросу
+    encoded: Dict[str, bytes]
+
+
+def make_etag(version, mimetype: str = '') -> str:
+    """ETag по поколению данных сервиса и формату представления.
+
+    Поколение меняется при любом добавлении или удалении термина; время
+    изменения в ETag отличает поколения после сброса Redis.
+    """
+    stamp = version.updated_at.replace(':', '').replace('-', '').replace('.', '')
+    suffix = '-' + mimetype.rsplit('/', 1)[-1] if mimetype else ''
+    return f'"g{version.generation}-{stamp}{suffix}"'
+
+
+# Разрешение HTTP-даты Last-Modified
+LAST_MODIFIED_RESOLUTION = timedelta(seconds=1)
+
+
+def last_modified(version, now: Optional[datetime] = None) -> Optional[str]:
+    """Заголовок Last-Modified (HTTP-дата) по времени изменения данных.
+
+    HTTP-дата хранит целые секунды: пока секунда изменения не прошла,
+    в нее же может попасть следующее изменение, и If-Modified-Since с
+    этой датой получил бы 304 на устаревшую копию. Поэтому данные,
+    измененные меньше секунды назад, отдаются без Last-Modified и
+    проверяются только по ETag (слабый валидатор, RFC 9110, 8.8.2.2).
+    """
+    if not version.updated_at:
+        return None
+    try:
+        modified = datetime.fromisoformat(version.updated_at)
+    except ValueError:
+        return None
+    if (now or datetime.now()) - modified < LAST_MODIFIED_RESOLUTION:
+        return None
+    # Сервис пишет локальное время без часового пояса
+    return format_datetime(modified.astimezone().replace(microsecond=0), usegmt=True)
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, modified: Optional[str]) -> bool:
+    """Можно ли ответить 304 на условный запрос.
+
+    If-None-Match проверяется первым; If-Modified-Since учитывается,
+    только если If-None-Match нет (RFC 9110, 13.2.2).
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since and modified:
+        try:
+            return parsedate_to_datetime(modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(etag: str, modified: Optional[str]) -> Dict[str, str]:
+    """Заголовки валидаторов для ответа 200 и 304"""
+    headers = {
+        'ETag': etag,
+        # Клиент может хранить ответ, но перед использованием проверяет ETag
+        'Cache-Control': 'no-cache',
+        # Представление (JSON или protobuf) выбирается по Accept,
+        # сжатие - по Accept-Encoding
+        'Vary': 'Accept, Accept-Encoding'
+    }
+    if modified:
+        headers['Last-Modified'] = modified
+    return headers
+
+
+class ResponseCache:
+    """LRU кэш готовых тел ответов шлюза.
+
+    Ключ - URL запроса вместе с ETag поколения данных, поэтому после
+    изменения глоссария старые записи просто перестают совпадать и
+    вытесняются. max_size=0 отключает кэш.
+    """
+
+    def __init__(self, max_size: int = 256) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, etag: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get((url, etag))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((url, etag))
+            self.hits += 1
+            return entry
+
+    def put(self, url: str, etag: str, entry: CachedResponse) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[(url, etag)] = entry
+            self._entries.move_to_end((url, etag))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
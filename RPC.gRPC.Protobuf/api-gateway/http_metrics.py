@@ -0,0 +1,111 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from metrics_common import LATENCY_BUCKETS, labelled
+
+
+HTTP_SECONDS = Histogram(
+    'gateway_http_request_duration_seconds',
+    'Время обработки HTTP-запроса шлюзом до отправки заголовков ответа',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+GRPC_SECONDS = Histogram(
+    'gateway_grpc_client_duration_seconds',
+    'Время вызова сервиса глоссария с точки зрения шлюза',
+    ['method', 'code'], buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    'gateway_http_requests_in_flight',
+    'HTTP-запросы, которые шлюз обрабатывает сейчас'
+)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def start_request() -> float:
+    """Отметка начала HTTP-запроса"""
+    IN_FLIGHT.inc()
+    return time.perf_counter()
+
+
+def finish_request(started: Optional[float], route: Optional[str], method: str, status: int) -> None:
+    """Учесть запрос в gateway_http_request_duration_seconds.
+
+    route - имя обработчика (get_term, search_terms), а не URL: иначе
+    каждый ID термина давал бы свой временной ряд.
+    """
+    if started is None:
+        return
+    IN_FLIGHT.dec()
+    labelled(HTTP_SECONDS, route or 'unknown', method, str(status)).observe(time.perf_counter() - started)
+
+
+def grpc_code(error: Optional[Exception]) -> str:
+    """Код ответа сервиса для метки: OK или код RpcError"""
+    if error is None:
+        return 'OK'
+    code = getattr(error, 'code', None)
+    return code().name if callable(code) else 'UNKNOWN'
+
+
+def timed_call(method: str, fn: Callable[[], Any]) -> Any:
+    """fn() с учетом в gateway_grpc_client_duration_seconds"""
+    started = time.perf_counter()
+    error = None
+    try:
+        return fn()
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        labelled(GRPC_SECONDS, method, grpc_code(error)).observe(time.perf_counter() - started)
+
+
+async def timed_call_async(method: str, fn: Callable[[], Awaitable]) -> Any:
+    """timed_call для корутин"""
+    started = time.perf_counter()
+    error = None
+    try:
+        return await fn()
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        labelled(GRPC_SECONDS, method, grpc_code(error)).observe(time.perf_counter() - started)
+
+
+# Компоненты шлюза со своими stats(): кэш ответов, single-flight, хеджирование
+_stats_sources: Dict[str, Callable[[], Dict]] = {}
+
+
+def register_stats(component: str, stats: Callable[[], Dict]) -> None:
+    """Отдавать числовые поля stats() как gateway_<component>_<поле>.
+
+    Повторная регистрация компонента заменяет источник, поэтому оба
+    варианта шлюза можно импортировать в одном процессе.
+    """
+    _stats_sources[component] = stats
+
+
+class _StatsCollector:
+    """Значения stats() компонентов на момент запроса /metrics"""
+
+    def collect(self):
+        for component, stats in sorted(_stats_sources.items()):
+            for field, value in sorted(stats().items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                yield GaugeMetricFamily(
+                    f'gateway_{component}_{field}', f'{component}.stats()["{field}"]', value=value
+                )
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render() -> bytes:
+    """Текст /metrics в формате Prometheus"""
+    return generate_latest()
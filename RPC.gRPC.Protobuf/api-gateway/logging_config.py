@@ -0,0 +1,83 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, Tuple
+
+
+# Формат строк журнала; уровень - LOG_LEVEL (DEBUG, INFO, WARNING, ERROR)
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Сколько одинаковых сообщений пропускать за период (LOG_RATE_LIMIT_BURST,
+# LOG_RATE_LIMIT_PERIOD): тысяча одинаковых ошибок в секунду при
+# недоступном сервисе не должна забивать журнал и нагружать вывод
+DEFAULT_RATE_LIMIT_BURST = 10
+DEFAULT_RATE_LIMIT_PERIOD = 60.0
+
+
+class RateLimitFilter(logging.Filter):
+    """Не больше burst сообщений с одним шаблоном за period секунд.
+
+    Сообщения различаются по логгеру, уровню и шаблону (record.msg до
+    подстановки аргументов), поэтому ошибки с разными ID терминов
+    считаются одним сообщением. Первое сообщение нового периода
+    сообщает, сколько таких было отброшено. burst=0 - без ограничения.
+    """
+
+    def __init__(self, burst: int = DEFAULT_RATE_LIMIT_BURST,
+                 period: float = DEFAULT_RATE_LIMIT_PERIOD) -> None:
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._lock = threading.Lock()
+        # Ключ сообщения -> [начало периода, пропущено, отброшено]
+        self._windows: Dict[Tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.burst:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                dropped = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if dropped:
+                    record.msg = f"{record.msg} [{dropped} similar messages suppressed]"
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            return True
+
+
+def configure_logging() -> None:
+    """Журнал процесса: уровень из LOG_LEVEL и запись в stderr из отдельного потока.
+
+    Обработчики запросов только кладут запись в очередь (QueueHandler),
+    а в поток вывода ее пишет QueueListener: медленный stdout/stderr
+    контейнера не задерживает ответы. Если журнал уже настроен
+    (например, тестовым окружением), ничего не меняется.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(RateLimitFilter(
+        burst=int(os.getenv('LOG_RATE_LIMIT_BURST', DEFAULT_RATE_LIMIT_BURST)),
+        period=float(os.getenv('LOG_RATE_LIMIT_PERIOD', DEFAULT_RATE_LIMIT_PERIOD))
+    ))
+    root.addHandler(handler)
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    listener = logging.handlers.QueueListener(records, stream)
+    listener.start()
+    atexit.register(listener.stop)
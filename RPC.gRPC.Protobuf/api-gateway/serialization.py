@@ -0,0 +1,92 @@
+import json
+import os
+from typing import Dict, Iterator, Optional, Sequence
+
+JSON_MIME = 'application/json'
+PROTOBUF_MIME = 'application/x-protobuf'
+
+# Списки длиннее порога отдаются потоком, а не одной строкой JSON
+STREAM_JSON_THRESHOLD = int(os.getenv('GATEWAY_STREAM_JSON_THRESHOLD', 1000))
+
+# Сколько терминов сериализуется в один фрагмент потока
+STREAM_JSON_CHUNK = 500
+
+# Терминов в одном SSE-событии /api/terms/stream по умолчанию
+SSE_BATCH_SIZE = int(os.getenv('GATEWAY_SSE_BATCH_SIZE', 100))
+
+# Верхняя граница ?batch_size=: столько же сервис принимает в StreamRequest
+MAX_SSE_BATCH_SIZE = 1000
+
+# Длина определения в SSE-событии
+SSE_DEFINITION_LENGTH = 100
+
+
+def term_to_dict(term, with_dates=True) -> Dict:
+    """Конвертация Term в словарь для JSON-ответа"""
+    data = {
+        'id': term.id,
+        'name': term.name,
+        'definition': term.definition,
+        'category': term.category,
+        'examples': list(term.examples),
+        'synonyms': list(term.synonyms)
+    }
+    if with_dates:
+        data['created_at'] = term.created_at
+        data['updated_at'] = term.updated_at
+    return data
+
+
+def term_summary(term) -> Dict:
+    """Краткое представление термина для SSE: определение обрезается"""
+    definition = term.definition
+    if len(definition) > SSE_DEFINITION_LENGTH:
+        definition = definition[:SSE_DEFINITION_LENGTH] + '...'
+    return {
+        'id': term.id,
+        'name': term.name,
+        'definition': definition,
+        'category': term.category
+    }
+
+
+def sse_batch_event(terms: Sequence) -> str:
+    """Одно SSE-событие с пакетом терминов"""
+    return f'data: {dumps({"terms": [term_summary(term) for term in terms]})}\n\n'
+
+
+def sse_error_event(message: str) -> str:
+    return f'data: {dumps({"error": message})}\n\n'
+
+
+def dumps(value) -> str:
+    """JSON в том же компактном виде, что и jsonify"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def response_mimetype(accept_mimetypes) -> str:
+    """Формат ответа по заголовку Accept: JSON, если клиент не просит protobuf явно"""
+    return accept_mimetypes.best_match([JSON_MIME, PROTOBUF_MIME]) or JSON_MIME
+
+
+def should_stream(terms: Sequence) -> bool:
+    return len(terms) > STREAM_JSON_THRESHOLD
+
+
+def iter_terms_json(terms: Sequence, with_dates=True, fields: Optional[Dict] = None) -> Iterator[str]:
+    """JSON-объект {"terms": [...], **fields} фрагментами.
+
+    Термины сериализуются пакетами по STREAM_JSON_CHUNK, поэтому
+    в памяти никогда не лежит весь ответ целиком.
+    """
+    yield '{"terms":['
+    for start in range(0, len(terms), STREAM_JSON_CHUNK):
+        chunk = ','.join(
+            dumps(term_to_dict(term, with_dates))
+            for term in terms[start:start + STREAM_JSON_CHUNK]
+        )
+        yield chunk if start == 0 else ',' + chunk
+    yield ']'
+    for key, value in (fields or {}).items():
+        yield f',{dumps(key)}:{dumps(value)}'
+    yield '}'
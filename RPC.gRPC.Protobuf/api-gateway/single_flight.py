@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """Выполняющийся вызов и его результат для ожидающих"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных вызовов в один.
+
+    Первый запрос с ключом выполняет вызов, остальные с тем же ключом
+    ждут его завершения и получают тот же результат или то же
+    исключение. Как только вызов завершился, следующий запрос снова
+    идет в сервис: устаревшие результаты не переиспользуются.
+    enabled=False - каждый вызов выполняется отдельно (для сравнения).
+
+    Ожидающий запрос ждет не дольше своего timeout и получает
+    TimeoutError, сам вызов при этом продолжается для остальных.
+    shared=False - вызов с собственными условиями (например, сроком
+    клиента), он выполняется отдельно и не становится общим.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, Hashable], Any] = {}
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {'upstream': 0, 'coalesced': 0})
+
+    def _count(self, name: str, counter: str) -> None:
+        self._counters[name][counter] += 1
+
+    def do(self, name: str, key: Hashable, fn: Callable[[], Any],
+           timeout: Optional[float] = None, shared: bool = True) -> Any:
+        """Результат fn(); name - метка для счетчиков (имя RPC)"""
+        if not self.enabled or not shared:
+            with self._lock:
+                self._count(name, 'upstream')
+            return fn()
+
+        with self._lock:
+            call = self._calls.get((name, key))
+            leader = call is None
+            if leader:
+                call = self._calls[(name, key)] = _Call()
+                self._count(name, 'upstream')
+            else:
+                self._count(name, 'coalesced')
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"{name}: deadline exceeded waiting for a coalesced call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[(name, key)]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            by_method = {name: dict(counters) for name, counters in sorted(self._counters.items())}
+            return {
+                'enabled': self.enabled,
+                'in_flight': len(self._calls),
+                'upstream': sum(counters['upstream'] for counters in by_method.values()),
+                'coalesced': sum(counters['coalesced'] for counters in by_method.values()),
+                'by_method': by_method
+            }
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight для asyncio.
+
+    Вызов выполняется отдельной задачей: если клиент, начавший его,
+    отключился, остальные ожидающие все равно получат результат.
+    """
+
+    async def do(self, name: str, key: Hashable, fn: Callable[[], Awaitable],
+                 timeout: Optional[float] = None, shared: bool = True) -> Any:
+        """Результат await fn(); name - метка для счетчиков (имя RPC)"""
+        if not self.enabled or not shared:
+            self._count(name, 'upstream')
+            return await fn()
+
+        task = self._calls.get((name, key))
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[(name, key)] = task
+            task.add_done_callback(lambda _: self._forget((name, key), task))
+            self._count(name, 'upstream')
+        else:
+            self._count(name, 'coalesced')
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{name}: deadline exceeded waiting for a coalesced call") from None
+
+    def _forget(self, key: Tuple[str, Hashable], task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
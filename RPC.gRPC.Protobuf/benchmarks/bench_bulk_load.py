@@ -0,0 +1,53 @@
+"""Бенчмарк загрузки глоссария: add_term по одному против add_terms пакетами.
+
+Запуск:
+    python benchmarks/bench_bulk_load.py
+    python benchmarks/bench_bulk_load.py --redis-url redis://localhost:6379/15 --sizes 100000
+"""
+import argparse
+import json
+import random
+
+from common import RoundTripCounter, make_redis, synthetic_term, timer
+from glossary_data import GlossaryStorage
+
+
+def make_terms(count):
+    rng = random.Random(count)
+    return [synthetic_term(i, rng) for i in range(count)]
+
+
+def run(sizes, batch_sizes, redis_url=None):
+    results = []
+    for size in sizes:
+        row = {'terms': size}
+
+        client = make_redis(redis_url)
+        storage = GlossaryStorage(client=client)
+        counter = RoundTripCounter(client)
+        with counter.measure(), timer(row, 'one_by_one_ms'):
+            for term in make_terms(size):
+                storage.add_term(term)
+        row['one_by_one_round_trips'] = counter.count
+
+        for batch_size in batch_sizes:
+            client = make_redis(redis_url)
+            storage = GlossaryStorage(batch_size=batch_size, client=client)
+            terms = make_terms(size)
+            with counter.measure(), timer(row, f'bulk_{batch_size}_ms'):
+                term_ids = storage.add_terms(terms)
+            row[f'bulk_{batch_size}_round_trips'] = counter.count
+            assert not any(isinstance(term_id, Exception) for term_id in term_ids)
+
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--redis-url', help='настоящий Redis (база будет очищена); по умолчанию fakeredis')
+    args = parser.parse_args()
+    run(args.sizes, args.batch_sizes, args.redis_url)
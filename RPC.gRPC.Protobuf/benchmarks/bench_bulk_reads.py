@@ -0,0 +1,53 @@
+"""Бенчмарк чтения всего глоссария: HGETALL на термин против pipeline.
+
+Запуск:
+    python benchmarks/bench_bulk_reads.py
+    python benchmarks/bench_bulk_reads.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import json
+
+from common import RoundTripCounter, fill_hash_layout, make_redis, timer
+from glossary_data import GlossaryStorage, decode_term
+
+
+def read_one_by_one(client):
+    """Исходный алгоритм get_all_terms: один HGETALL на термин"""
+    terms = []
+    for term_id in client.smembers('term:list'):
+        term = client.hgetall(f'term:{term_id}')
+        if term:
+            terms.append(decode_term(term))
+    return terms
+
+
+def run(sizes, batch_sizes, redis_url=None):
+    results = []
+    for size in sizes:
+        client = make_redis(redis_url)
+        fill_hash_layout(client, size)
+        counter = RoundTripCounter(client)
+
+        row = {'terms': size}
+        with counter.measure(), timer(row, 'one_by_one_ms'):
+            assert len(read_one_by_one(client)) == size
+        row['one_by_one_round_trips'] = counter.count
+
+        for batch_size in batch_sizes:
+            storage = GlossaryStorage(batch_size=batch_size, client=client)
+            with counter.measure(), timer(row, f'pipeline_{batch_size}_ms'):
+                assert len(storage.get_all_terms()) == size
+            row[f'pipeline_{batch_size}_round_trips'] = counter.count
+
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--redis-url', help='настоящий Redis (база будет очищена); по умолчанию fakeredis')
+    args = parser.parse_args()
+    run(args.sizes, args.batch_sizes, args.redis_url)
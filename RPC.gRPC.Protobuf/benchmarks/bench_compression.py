@@ -0,0 +1,157 @@
+"""Бенчмарк сжатия больших списков терминов: gRPC и HTTP.
+
+gRPC: GetAllTerms через TCP-прокси, который считает байты и ограничивает
+полосу (--link-mbit), для GRPC_COMPRESSION=none|gzip|deflate - байты
+по сети и задержка вызова.
+
+HTTP: GET /api/terms через тестовый клиент шлюза без сжатия, с gzip и
+brotli - размер тела, время шлюза и оценка передачи по той же полосе.
+Полный список отдается потоком и сжимается на каждый запрос; страница
+/api/terms?page_size=1000 кэшируется, и сжатое тело берется из кэша.
+
+Определения терминов - русский текст (common.russian_term).
+
+Запуск:
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --terms 50000 --link-mbit 1000
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from common import ROOT_DIR, prebuilt_servicer, russian_term
+import glossary_pb2
+import glossary_pb2_grpc
+
+PORT = 50065
+os.environ['GRPC_SERVERS'] = f'localhost:{PORT}'
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api-gateway'))
+import gateway  # noqa: E402
+from compression import ENCODINGS  # noqa: E402
+from grpc_compression import COMPRESSION_ALGORITHMS  # noqa: E402
+from grpc_pool import channel_options  # noqa: E402
+
+
+class LinkProxy:
+    """TCP-прокси с подсчетом байтов и ограничением полосы"""
+
+    def __init__(self, target_port, mbit):
+        self.target_port = target_port
+        self.seconds_per_byte = 8 / (mbit * 1000 * 1000)
+        self.bytes_down = 0
+        self.bytes_up = 0
+        self._listener = socket.create_server(('localhost', 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self._listener.accept()
+            upstream = socket.create_connection(('localhost', self.target_port))
+            threading.Thread(target=self._pump, args=(client, upstream, 'bytes_up'), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client, 'bytes_down'), daemon=True).start()
+
+    def _pump(self, source, destination, counter):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                setattr(self, counter, getattr(self, counter) + len(data))
+                time.sleep(len(data) * self.seconds_per_byte)
+                destination.sendall(data)
+        except OSError:
+            pass
+        finally:
+            destination.close()
+
+
+def start_server(servicer, port, compression):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), compression=compression,
+                         options=[('grpc.max_send_message_length', -1)])
+    glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(servicer, server)
+    server.add_insecure_port(f'localhost:{port}')
+    server.start()
+    return server
+
+
+def bench_grpc(servicer, count, repeat, mbit):
+    """Байты по сети и задержка GetAllTerms для каждого алгоритма сжатия"""
+    for offset, (name, algorithm) in enumerate(COMPRESSION_ALGORITHMS.items(), start=1):
+        server = start_server(servicer, PORT + offset, algorithm)
+        proxy = LinkProxy(PORT + offset, mbit)
+        channel = grpc.insecure_channel(f'localhost:{proxy.port}', options=channel_options(),
+                                        compression=algorithm)
+        stub = glossary_pb2_grpc.GlossaryServiceStub(channel)
+        try:
+            stub.GetAllTerms(glossary_pb2.PageRequest())  # прогрев соединения
+            proxy.bytes_down = 0
+            started = time.perf_counter()
+            for _ in range(repeat):
+                response = stub.GetAllTerms(glossary_pb2.PageRequest())
+            elapsed = time.perf_counter() - started
+            assert len(response.terms) == count
+            print(json.dumps({
+                'layer': 'grpc',
+                'compression': name,
+                'terms': count,
+                'wire_kb_per_call': round(proxy.bytes_down / repeat / 1024),
+                'ms_per_call': round(elapsed / repeat * 1000, 1)
+            }, ensure_ascii=False))
+        finally:
+            channel.close()
+            server.stop(None)
+
+
+def bench_http(repeat, mbit):
+    """Размер и время ответа шлюза для каждой кодировки"""
+    client = gateway.app.test_client()
+    for url in ('/api/terms', '/api/terms?page_size=1000'):
+        for encoding in ('identity',) + ENCODINGS:
+            headers = {'Accept-Encoding': encoding}
+            client.get(url, headers=headers)  # прогрев и заполнение кэша
+            started = time.perf_counter()
+            for _ in range(repeat):
+                response = client.get(url, headers=headers)
+                body = response.get_data()
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 200, response.status_code
+            assert response.headers.get('Content-Encoding', 'identity') == encoding
+            gateway_ms = elapsed / repeat * 1000
+            transfer_ms = len(body) * 8 / (mbit * 1000)
+            print(json.dumps({
+                'layer': 'http',
+                'url': url,
+                'encoding': encoding,
+                'body_kb': round(len(body) / 1024),
+                'gateway_ms': round(gateway_ms, 1),
+                'total_ms_at_link': round(gateway_ms + transfer_ms, 1)
+            }, ensure_ascii=False))
+
+
+def run(count, repeat, mbit):
+    servicer = prebuilt_servicer(count, russian_term)
+    bench_grpc(servicer, count, repeat, mbit)
+
+    server = start_server(servicer, PORT, grpc.Compression.NoCompression)
+    try:
+        bench_http(repeat, mbit)
+    finally:
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--link-mbit', type=float, default=100,
+                        help='Полоса канала между узлами, Мбит/с')
+    args = parser.parse_args()
+    run(args.terms, args.repeat, args.link_mbit)
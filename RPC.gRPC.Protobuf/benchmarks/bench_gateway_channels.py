@@ -0,0 +1,89 @@
+"""Бенчмарк gRPC-каналов шлюза: новый канал на каждый запрос против пула.
+
+Сервис глоссария запускается в этом же процессе (fakeredis или --redis-url),
+запросы GET /api/terms/<id> выполняются через тестовый клиент Flask
+последовательно или из нескольких потоков.
+
+Запуск:
+    python benchmarks/bench_gateway_channels.py
+    python benchmarks/bench_gateway_channels.py --requests 5000 --threads 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+from common import ROOT_DIR, make_redis
+import glossary_pb2_grpc
+from glossary_data import GlossaryStorage
+import server
+
+PORT = 50062
+os.environ['GRPC_SERVERS'] = f'localhost:{PORT}'
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api-gateway'))
+import gateway  # noqa: E402
+
+
+def channel_per_request():
+    """Исходный get_grpc_stub: новый канал на каждый HTTP-запрос"""
+    channel = grpc.insecure_channel(gateway.GRPC_SERVER)
+    return glossary_pb2_grpc.GlossaryServiceStub(channel)
+
+
+def start_server(redis_url):
+    server.GlossaryStorage = lambda **kwargs: GlossaryStorage(client=make_redis(redis_url))
+    servicer = server.GlossaryServicer()
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=16), options=server.server_options())
+    glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(servicer, grpc_server)
+    grpc_server.add_insecure_port(f'localhost:{PORT}')
+    grpc_server.start()
+    return grpc_server
+
+
+def measure(requests_count, threads):
+    """p50/p99 задержки GET /api/terms/<id>"""
+    client = gateway.app.test_client()
+
+    def call(i):
+        started = time.perf_counter()
+        response = client.get(f'/api/terms/{i % 5 + 1}')
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(call, range(requests_count)))
+    elapsed = time.perf_counter() - started
+    return {
+        'rps': round(requests_count / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 3)
+    }
+
+
+def run(requests_count, threads, redis_url=None):
+    grpc_server = start_server(redis_url)
+    pooled_stub = gateway.get_grpc_stub
+    try:
+        for name, get_stub in (('channel_per_request', channel_per_request), ('pooled', pooled_stub)):
+            gateway.get_grpc_stub = get_stub
+            measure(min(requests_count, 100), threads)  # прогрев
+            row = {'mode': name, 'requests': requests_count, 'threads': threads}
+            row.update(measure(requests_count, threads))
+            print(json.dumps(row, ensure_ascii=False))
+    finally:
+        gateway.get_grpc_stub = pooled_stub
+        grpc_server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--redis-url', help='настоящий Redis (база будет очищена); по умолчанию fakeredis')
+    args = parser.parse_args()
+    run(args.requests, args.threads, args.redis_url)
@@ -0,0 +1,81 @@
+"""Бенчмарк форматов ответа шлюза на GET /api/terms (GetAllTerms).
+
+Режимы: JSON одной строкой (jsonify), JSON потоком (iter_terms_json)
+и application/x-protobuf (байты ответа сервиса без разбора). Сервис
+отдает заранее собранный TermList, поэтому измеряется только работа
+шлюза: CPU потока, обрабатывающего запрос, на один запрос.
+
+Запуск:
+    python benchmarks/bench_gateway_formats.py
+    python benchmarks/bench_gateway_formats.py --terms 50000 --repeat 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+from common import ROOT_DIR, prebuilt_servicer
+import glossary_pb2
+import glossary_pb2_grpc
+
+PORT = 50064
+os.environ['GRPC_SERVERS'] = f'localhost:{PORT}'
+os.environ['GATEWAY_RESPONSE_CACHE_SIZE'] = '0'
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api-gateway'))
+import gateway  # noqa: E402
+import serialization  # noqa: E402
+
+
+MODES = {
+    # mode: (Accept, порог потоковой отдачи)
+    'json': ('application/json', sys.maxsize),
+    'json_stream': ('application/json', 0),
+    'protobuf': ('application/x-protobuf', sys.maxsize),
+}
+
+
+def run(count, repeat):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), options=[
+        ('grpc.max_send_message_length', -1)
+    ])
+    glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(prebuilt_servicer(count), server)
+    server.add_insecure_port(f'localhost:{PORT}')
+    server.start()
+
+    client = gateway.app.test_client()
+    try:
+        for mode, (accept, threshold) in MODES.items():
+            serialization.STREAM_JSON_THRESHOLD = threshold
+            row = {'mode': mode, 'terms': count}
+            cpu = wall = 0.0
+            for i in range(repeat + 1):
+                wall_started, cpu_started = time.perf_counter(), time.thread_time()
+                response = client.get('/api/terms', headers={'Accept': accept})
+                body = response.get_data()
+                if i == 0:
+                    continue  # прогрев
+                cpu += time.thread_time() - cpu_started
+                wall += time.perf_counter() - wall_started
+            assert response.status_code == 200, response.status_code
+            if accept == 'application/json':
+                assert len(json.loads(body)['terms']) == count
+            else:
+                assert len(glossary_pb2.TermList.FromString(body).terms) == count
+            row['cpu_ms_per_request'] = round(cpu / repeat * 1000, 1)
+            row['wall_ms_per_request'] = round(wall / repeat * 1000, 1)
+            row['body_kb'] = round(len(body) / 1024)
+            print(json.dumps(row, ensure_ascii=False))
+    finally:
+        server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.terms, args.repeat)
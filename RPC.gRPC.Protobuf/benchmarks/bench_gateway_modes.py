@@ -0,0 +1,110 @@
+"""Бенчмарк режимов шлюза: Flask (поток на запрос) против Quart + grpc.aio.
+
+Сервис глоссария и шлюз запускаются отдельными процессами, клиент на
+aiohttp держит заданное число одновременных запросов GET /api/terms/<id>.
+Кроме RPS и задержек выводится пиковое число потоков и RSS процесса
+шлюза (из /proc, только Linux).
+
+Запуск:
+    python benchmarks/bench_gateway_modes.py
+    python benchmarks/bench_gateway_modes.py --concurrency 50 500 2000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import aiohttp
+
+from common import GATEWAY_DIR, GATEWAY_RUNNERS, SERVICE_DIR, proc_status, spawn, wait_ready
+
+
+async def run_load(session, base_url, concurrency, requests_per_worker, pid):
+    latencies = []
+    errors = 0
+    peak = {'threads': 0, 'rss_kb': 0}
+
+    async def worker(n):
+        nonlocal errors
+        for i in range(requests_per_worker):
+            started = time.perf_counter()
+            try:
+                async with session.get(f'{base_url}/api/terms/{(n + i) % 5 + 1}') as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def sample():
+        while True:
+            threads, rss = proc_status(pid)
+            peak['threads'] = max(peak['threads'], threads)
+            peak['rss_kb'] = max(peak['rss_kb'], rss)
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    latencies.sort()
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        'errors': errors,
+        'gateway_threads': peak['threads'],
+        'gateway_rss_kb': peak['rss_kb']
+    }
+
+
+async def bench_mode(mode, args, grpc_port):
+    port = args.port
+    gateway = spawn(
+        [sys.executable, '-c', GATEWAY_RUNNERS[mode].format(port=port)],
+        GATEWAY_DIR,
+        GRPC_SERVERS=f'localhost:{grpc_port}'
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_ready(session, f'{base_url}/api/health')
+            # Первый запрос открывает HTTP/2-соединения к сервису: до получения
+            # SETTINGS клиент не знает лимит grpc.max_concurrent_streams
+            await wait_ready(session, f'{base_url}/api/terms/1')
+            for concurrency in args.concurrency:
+                row = {'mode': mode, 'concurrency': concurrency}
+                row.update(await run_load(session, base_url, concurrency, args.requests, gateway.pid))
+                print(json.dumps(row, ensure_ascii=False))
+    finally:
+        gateway.terminate()
+        gateway.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=list(GATEWAY_RUNNERS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 200])
+    parser.add_argument('--requests', type=int, default=20, help='запросов на одного клиента')
+    parser.add_argument('--port', type=int, default=5061)
+    parser.add_argument('--grpc-port', type=int, default=50063)
+    args = parser.parse_args()
+
+    # Сервис с хранилищем в памяти: Redis на недоступном порту
+    service = spawn(
+        [sys.executable, 'server.py', '--mode', 'aio', '--port', str(args.grpc_port)],
+        SERVICE_DIR,
+        REDIS_HOST='127.0.0.1',
+        REDIS_PORT='1'
+    )
+    try:
+        for mode in args.modes:
+            asyncio.run(bench_mode(mode, args, args.grpc_port))
+    finally:
+        service.terminate()
+        service.wait()
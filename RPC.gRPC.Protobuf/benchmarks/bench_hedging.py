@@ -0,0 +1,149 @@
+"""Бенчмарк хеджирования запросов и сроков шлюза.
+
+Две реплики сервиса глоссария запускаются в этом же процессе на общем
+fakeredis (или --redis-url), шлюз Flask - через тестовый клиент с
+GRPC_SERVERS на обе реплики. Каждая реплика с вероятностью --tail-prob
+отвечает на GetTerm и SearchTerms с задержкой --tail-ms (GC, медленный
+диск, соседи по узлу). Для GATEWAY_HEDGE_DELAY_MS=0 и --hedge-delay-ms
+печатаются p50/p99/max и доля продублированных запросов.
+
+Последняя строка - проверка сроков: обе реплики зависают, ответ шлюза
+на GET /api/terms/<id> - 504 примерно через срок маршрута
+(--deadline-ms), а не через время зависания.
+
+Запуск:
+    python benchmarks/bench_hedging.py
+    python benchmarks/bench_hedging.py --requests 2000 --tail-prob 0.02 --hedge-delay-ms 30
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+from common import ROOT_DIR, fill_hash_layout, make_redis
+import glossary_pb2_grpc
+from glossary_data import GlossaryStorage
+import server
+
+PORTS = (50068, 50069)
+os.environ['GRPC_SERVERS'] = ','.join(f'localhost:{port}' for port in PORTS)
+os.environ['GATEWAY_RESPONSE_CACHE_SIZE'] = '0'
+os.environ['GATEWAY_SINGLE_FLIGHT'] = '0'
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api-gateway'))
+import gateway  # noqa: E402
+from hedging import Hedger  # noqa: E402
+
+URLS = ('/api/terms/{id}', '/api/terms/search?q=term{id}&limit=10')
+
+
+class SlowTailServicer(server.GlossaryServicer):
+    """Реплика с редкими медленными ответами на точечные чтения"""
+
+    tail_prob = 0.0
+    tail = 0.0
+
+    def _pause(self):
+        if random.random() < self.tail_prob:
+            time.sleep(self.tail)
+
+    def GetTerm(self, request, context):
+        self._pause()
+        return super().GetTerm(request, context)
+
+    def SearchTerms(self, request, context):
+        self._pause()
+        return super().SearchTerms(request, context)
+
+
+def start_replicas(count, redis_url):
+    client = make_redis(redis_url)
+    fill_hash_layout(client, count)
+    server.GlossaryStorage = lambda **kwargs: GlossaryStorage(client=client)
+    replicas = []
+    for port in PORTS:
+        grpc_server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=16),
+            options=server.server_options(),
+            interceptors=[server.DeadlineInterceptor()]
+        )
+        glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(SlowTailServicer(), grpc_server)
+        grpc_server.add_insecure_port(f'localhost:{port}')
+        grpc_server.start()
+        replicas.append(grpc_server)
+    return replicas
+
+
+def get(url):
+    """Статус и задержка запроса к шлюзу в секундах"""
+    started = time.perf_counter()
+    response = gateway.app.test_client().get(url)
+    response.get_data()
+    return response.status_code, time.perf_counter() - started
+
+
+def percentile(latencies, share):
+    return round(latencies[min(int(len(latencies) * share), len(latencies) - 1)] * 1000, 1)
+
+
+def run(count, requests, concurrency, tail_prob, tail_ms, hedge_delay_ms, max_ratio,
+        deadline_ms, redis_url):
+    replicas = start_replicas(count, redis_url)
+    rng = random.Random(42)
+    try:
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            get(URLS[0].format(id=1))  # прогрев каналов
+            for template in URLS:
+                urls = [template.format(id=rng.randint(1, count)) for _ in range(requests)]
+                for delay_ms in (0, hedge_delay_ms):
+                    SlowTailServicer.tail_prob, SlowTailServicer.tail = tail_prob, tail_ms / 1000
+                    gateway.hedger = Hedger(delay_ms, max_ratio)
+                    results = list(executor.map(get, urls))
+                    assert all(status == 200 for status, _ in results), results[:5]
+                    latencies = sorted(latency for _, latency in results)
+                    stats = gateway.hedger.stats()
+                    print(json.dumps({
+                        'url': template,
+                        'hedge_delay_ms': delay_ms,
+                        'requests': len(latencies),
+                        'hedged': stats['hedged'],
+                        'hedge_wins': stats['hedge_wins'],
+                        'p50_ms': percentile(latencies, 0.5),
+                        'p99_ms': percentile(latencies, 0.99),
+                        'max_ms': round(latencies[-1] * 1000, 1)
+                    }))
+
+            # Обе реплики зависают: шлюз отвечает 504 по сроку маршрута
+            SlowTailServicer.tail_prob, SlowTailServicer.tail = 1.0, deadline_ms / 1000 * 5
+            gateway.route_deadlines['get_term'] = deadline_ms
+            status, latency = get(URLS[0].format(id=1))
+            print(json.dumps({
+                'url': URLS[0],
+                'replicas_hang_ms': deadline_ms * 5,
+                'deadline_ms': deadline_ms,
+                'status': status,
+                'latency_ms': round(latency * 1000, 1)
+            }))
+    finally:
+        for grpc_server in replicas:
+            grpc_server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--tail-prob', type=float, default=0.03)
+    parser.add_argument('--tail-ms', type=int, default=200)
+    parser.add_argument('--hedge-delay-ms', type=int, default=50)
+    parser.add_argument('--max-ratio', type=float, default=0.1)
+    parser.add_argument('--deadline-ms', type=int, default=300)
+    parser.add_argument('--redis-url', help='redis://host:port/db (по умолчанию fakeredis)')
+    args = parser.parse_args()
+    run(args.terms, args.requests, args.concurrency, args.tail_prob, args.tail_ms,
+        args.hedge_delay_ms, args.max_ratio, args.deadline_ms, args.redis_url)
@@ -0,0 +1,62 @@
+"""Бенчмарк SearchTerms: линейный просмотр против триграммного индекса.
+
+Отдельно измеряется поиск с limit=10: ранжированный top-k, который
+останавливается, когда оставшиеся поля не могут улучшить результат.
+
+Запуск:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import json
+
+from common import fill_hash_layout, make_redis, timer
+from glossary_data import GlossaryStorage, term_matches
+
+QUERIES = ['alias7', 'term42 ', 'abc', 'term1']
+TOP_K = 10
+
+
+def linear_scan(storage, query):
+    """Исходный алгоритм search_terms: все термины и поиск подстроки"""
+    query_lower = query.lower()
+    return [t for t in storage.get_all_terms() if term_matches(t, query_lower)]
+
+
+def run(sizes, redis_url=None, repeat=5):
+    results = []
+    for size in sizes:
+        client = make_redis(redis_url)
+        fill_hash_layout(client, size)
+        row = {'terms': size}
+        with timer(row, 'index_build_ms'):
+            storage = GlossaryStorage(client=client)
+
+        for query in QUERIES:
+            expected = {t['id'] for t in linear_scan(storage, query)}
+            with timer(row, f'scan[{query}]_ms'):
+                for _ in range(repeat):
+                    linear_scan(storage, query)
+            with timer(row, f'index[{query}]_ms'):
+                for _ in range(repeat):
+                    found = storage.search_terms(query)
+            assert {t['id'] for t in found} == expected
+            with timer(row, f'top{TOP_K}[{query}]_ms'):
+                for _ in range(repeat):
+                    top = storage.search_terms(query, limit=TOP_K)
+            assert top == found[:TOP_K]
+            for key in ('scan', 'index', f'top{TOP_K}'):
+                row[f'{key}[{query}]_ms'] = round(row[f'{key}[{query}]_ms'] / repeat, 2)
+            row[f'matches[{query}]'] = len(expected)
+
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--redis-url', help='настоящий Redis (база будет очищена); по умолчанию fakeredis')
+    args = parser.parse_args()
+    run(args.sizes, args.redis_url)
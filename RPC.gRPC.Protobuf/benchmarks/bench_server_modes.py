@@ -0,0 +1,136 @@
+"""Бенчмарк режимов сервера: ThreadPoolExecutor против grpc.aio.
+
+Сервер запускается отдельным процессом (python server.py --mode ...),
+клиент на grpc.aio держит заданное число одновременных запросов
+GetTerm и StreamTerms. Кэш терминов отключен, чтобы каждый запрос
+доходил до хранилища.
+
+Без --redis-host сервер работает с хранилищем в памяти и измеряется
+только накладная часть gRPC; с настоящим Redis видно, как потоки
+пула простаивают в ожидании ответа.
+
+Запуск:
+    python benchmarks/bench_server_modes.py
+    python benchmarks/bench_server_modes.py --redis-host localhost --concurrency 10 100 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import grpc
+
+from common import SERVICE_DIR, generate_protos, synthetic_term
+import glossary_pb2
+import glossary_pb2_grpc
+
+
+def start_server(mode, port, redis_host, redis_port, max_workers):
+    """Запустить server.py в отдельном процессе"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([generate_protos(), SERVICE_DIR]),
+        REDIS_HOST=redis_host,
+        REDIS_PORT=str(redis_port),
+        TERM_CACHE_SIZE='0',
+        GRPC_MAX_WORKERS=str(max_workers)
+    )
+    return subprocess.Popen(
+        [sys.executable, os.path.join(SERVICE_DIR, 'server.py'), '--mode', mode, '--port', str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(stub, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await stub.ListCategories(glossary_pb2.Empty(), timeout=1)
+            return
+        except grpc.aio.AioRpcError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def seed(stub, count):
+    """Добавить count терминов через AddTerms"""
+    rng = random.Random(count)
+
+    async def requests():
+        for i in range(count):
+            yield glossary_pb2.AddTermRequest(**synthetic_term(i, rng))
+
+    response = await stub.AddTerms(requests())
+    return [result.term_id for result in response.results if result.success]
+
+
+async def run_load(call, concurrency, duration):
+    """Выполнять call() в concurrency задачах duration секунд"""
+    latencies = []
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2)
+    }
+
+
+async def bench_mode(mode, args):
+    server = start_server(mode, args.port, args.redis_host, args.redis_port, args.max_workers)
+    try:
+        async with grpc.aio.insecure_channel(f'localhost:{args.port}') as channel:
+            stub = glossary_pb2_grpc.GlossaryServiceStub(channel)
+            await wait_ready(stub)
+            term_ids = await seed(stub, args.terms)
+            rng = random.Random(0)
+
+            async def get_term():
+                await stub.GetTerm(glossary_pb2.TermRequest(id=rng.choice(term_ids)))
+
+            async def stream_terms():
+                async for _ in stub.StreamTerms(glossary_pb2.StreamRequest()):
+                    pass
+
+            for concurrency in args.concurrency:
+                row = {'mode': mode, 'concurrency': concurrency}
+                for name, call in (('get_term', get_term), ('stream_terms', stream_terms)):
+                    for key, value in (await run_load(call, concurrency, args.duration)).items():
+                        row[f'{name}_{key}'] = value
+                print(json.dumps(row, ensure_ascii=False))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['threaded', 'aio'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--duration', type=float, default=3.0, help='секунд на каждое измерение')
+    parser.add_argument('--terms', type=int, default=500, help='сколько терминов добавить перед замером')
+    parser.add_argument('--max-workers', type=int, default=10, help='GRPC_MAX_WORKERS для threaded')
+    parser.add_argument('--port', type=int, default=50061)
+    parser.add_argument('--redis-host', default='127.0.0.1',
+                        help='Redis для сервера; по умолчанию недоступный порт и хранилище в памяти')
+    parser.add_argument('--redis-port', type=int, default=1)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        asyncio.run(bench_mode(mode, args))
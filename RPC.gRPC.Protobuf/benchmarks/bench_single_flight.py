@@ -0,0 +1,102 @@
+"""Бенчмарк объединения одинаковых запросов в шлюзе (single-flight).
+
+Сервис глоссария запускается в этом же процессе (fakeredis или
+--redis-url), шлюз Flask - через тестовый клиент. Всплеск из
+--concurrency одинаковых запросов GET /api/terms и
+GET /api/terms/search выполняется --bursts раз с GATEWAY_SINGLE_FLIGHT=0
+и =1. Кэш ответов шлюза отключен, чтобы каждый запрос доходил до
+gRPC. Для каждого режима - число вызовов сервиса, объединенных
+запросов, время всплеска и p50/p99 запроса.
+
+Запуск:
+    python benchmarks/bench_single_flight.py
+    python benchmarks/bench_single_flight.py --terms 20000 --concurrency 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+from common import ROOT_DIR, fill_hash_layout, make_redis
+import glossary_pb2_grpc
+from glossary_data import GlossaryStorage
+import server
+
+PORT = 50067
+os.environ['GRPC_SERVERS'] = f'localhost:{PORT}'
+os.environ['GATEWAY_RESPONSE_CACHE_SIZE'] = '0'
+# Без объединения всплеск полных списков в одном процессе может идти
+# дольше срока маршрута; сравниваем задержки, а не 504
+os.environ['GATEWAY_ROUTE_DEADLINES_MS'] = 'get_all_terms=0,search_terms=0'
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api-gateway'))
+import gateway  # noqa: E402
+
+URLS = ('/api/terms', '/api/terms/search?q=term1&limit=10')
+
+
+def start_server(count, redis_url):
+    client = make_redis(redis_url)
+    fill_hash_layout(client, count)
+    server.GlossaryStorage = lambda **kwargs: GlossaryStorage(client=client)
+    servicer = server.GlossaryServicer()
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=16), options=server.server_options())
+    glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(servicer, grpc_server)
+    grpc_server.add_insecure_port(f'localhost:{PORT}')
+    grpc_server.start()
+    return grpc_server
+
+
+def burst(executor, url, concurrency):
+    """concurrency одновременных запросов url; задержки в секундах"""
+    def call(_):
+        started = time.perf_counter()
+        response = gateway.app.test_client().get(url)
+        response.get_data()
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+
+    return list(executor.map(call, range(concurrency)))
+
+
+def run(count, concurrency, bursts, redis_url):
+    grpc_server = start_server(count, redis_url)
+    try:
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            burst(executor, URLS[0], 1)  # прогрев каналов
+            for url in URLS:
+                for enabled in (False, True):
+                    gateway.single_flight = gateway.SingleFlight(enabled)
+                    latencies = []
+                    started = time.perf_counter()
+                    for _ in range(bursts):
+                        latencies.extend(burst(executor, url, concurrency))
+                    elapsed = time.perf_counter() - started
+                    latencies.sort()
+                    stats = gateway.single_flight.stats()
+                    method = 'SearchTerms' if 'search' in url else 'GetAllTerms'
+                    print(json.dumps({
+                        'url': url,
+                        'single_flight': enabled,
+                        'requests': len(latencies),
+                        'upstream_calls': stats['by_method'][method]['upstream'],
+                        'coalesced': stats['by_method'][method]['coalesced'],
+                        'burst_ms': round(elapsed / bursts * 1000, 1),
+                        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+                        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1)
+                    }))
+    finally:
+        grpc_server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--redis-url', help='redis://host:port/db (по умолчанию fakeredis)')
+    args = parser.parse_args()
+    run(args.terms, args.concurrency, args.bursts, args.redis_url)
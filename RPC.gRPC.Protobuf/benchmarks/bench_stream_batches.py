@@ -0,0 +1,159 @@
+"""Бенчмарк потоковой выгрузки: StreamTerms против StreamTermBatches.
+
+Сервис запускается в этом же процессе поверх fakeredis (или --redis-url)
+с --terms терминами. Измеряется:
+- gRPC: терминов в секунду для StreamTerms (сообщение на термин) и
+  StreamTermBatches (TermList на пакет) при разных batch_size;
+- SSE: /api/terms/stream через тестовый клиент Flask - событий и
+  терминов в секунду;
+- управление потоком: медленный клиент читает пакеты с паузой, а
+  бенчмарк считает, на сколько пакетов чтение из хранилища опередило
+  клиента (ограничено окном HTTP/2, а не размером глоссария) - с
+  опциями канала шлюза по умолчанию и с GRPC_HTTP2_BDP_PROBE=0.
+
+Запуск:
+    python benchmarks/bench_stream_batches.py
+    python benchmarks/bench_stream_batches.py --terms 100000 --batch-sizes 100 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent import futures
+
+import grpc
+
+from common import ROOT_DIR, fill_hash_layout, make_redis
+import glossary_pb2
+import glossary_pb2_grpc
+from glossary_data import GlossaryStorage
+import server
+
+PORT = 50066
+os.environ['GRPC_SERVERS'] = f'localhost:{PORT}'
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api-gateway'))
+import gateway  # noqa: E402
+from grpc_pool import channel_options  # noqa: E402
+
+
+class ReadCounter:
+    """Счетчик пакетов, прочитанных сервисом из хранилища"""
+
+    def __init__(self, storage):
+        self.batches = 0
+        original = storage.iter_term_batches
+
+        def iter_term_batches(*args, **kwargs):
+            for terms in original(*args, **kwargs):
+                self.batches += 1
+                yield terms
+
+        storage.iter_term_batches = iter_term_batches
+
+
+def start_server(count, redis_url):
+    client = make_redis(redis_url)
+    fill_hash_layout(client, count)
+    # Поисковый индекс бенчмарку не нужен
+    client.set('index:built', 1)
+    server.GlossaryStorage = lambda **kwargs: GlossaryStorage(client=client)
+    servicer = server.GlossaryServicer()
+    grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), options=server.server_options())
+    glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(servicer, grpc_server)
+    grpc_server.add_insecure_port(f'localhost:{PORT}')
+    grpc_server.start()
+    return grpc_server, servicer
+
+
+def bench_grpc(stub, count, batch_sizes):
+    rows = [('StreamTerms', 0, lambda: stub.StreamTerms(glossary_pb2.StreamRequest()))]
+    for batch_size in batch_sizes:
+        request = glossary_pb2.StreamRequest(batch_size=batch_size)
+        rows.append(('StreamTerms', batch_size, lambda request=request: stub.StreamTerms(request)))
+        rows.append(('StreamTermBatches', batch_size,
+                     lambda request=request: stub.StreamTermBatches(request)))
+
+    for method, batch_size, call in rows:
+        started = time.perf_counter()
+        messages = terms = 0
+        for message in call():
+            messages += 1
+            terms += len(message.terms) if method == 'StreamTermBatches' else 1
+        elapsed = time.perf_counter() - started
+        assert terms == count, terms
+        print(json.dumps({
+            'layer': 'grpc',
+            'method': method,
+            'batch_size': batch_size or 'default',
+            'messages': messages,
+            'terms_per_sec': round(terms / elapsed)
+        }))
+
+
+def bench_sse(count, batch_sizes):
+    client = gateway.app.test_client()
+    for batch_size in (1,) + tuple(batch_sizes):
+        started = time.perf_counter()
+        response = client.get(f'/api/terms/stream?batch_size={batch_size}')
+        events = [
+            json.loads(event[len('data: '):])
+            for event in response.get_data(as_text=True).split('\n\n') if event
+        ]
+        elapsed = time.perf_counter() - started
+        assert sum(len(event['terms']) for event in events) == count
+        print(json.dumps({
+            'layer': 'sse',
+            'batch_size': batch_size,
+            'events': len(events),
+            'terms_per_sec': round(count / elapsed)
+        }))
+
+
+def bench_flow_control(counter, batch_size, pause):
+    """Насколько чтение из хранилища опережает медленного клиента"""
+    for bdp_probe in (True, False):
+        channel = grpc.insecure_channel(f'localhost:{PORT}', options=channel_options(bdp_probe=bdp_probe))
+        stub = glossary_pb2_grpc.GlossaryServiceStub(channel)
+        counter.batches = 0
+        received = ahead = 0
+        call = stub.StreamTermBatches(glossary_pb2.StreamRequest(batch_size=batch_size))
+        for _ in call:
+            received += 1
+            ahead = max(ahead, counter.batches - received)
+            time.sleep(pause)
+            if received >= 50:
+                call.cancel()
+                break
+        channel.close()
+        print(json.dumps({
+            'layer': 'flow_control',
+            'bdp_probe': bdp_probe,
+            'batch_size': batch_size,
+            'pause_ms': pause * 1000,
+            'batches_received': received,
+            'max_batches_read_ahead': ahead
+        }))
+
+
+def run(count, batch_sizes, redis_url):
+    grpc_server, servicer = start_server(count, redis_url)
+    counter = ReadCounter(servicer.storage)
+    channel = grpc.insecure_channel(f'localhost:{PORT}', options=channel_options())
+    stub = glossary_pb2_grpc.GlossaryServiceStub(channel)
+    try:
+        bench_grpc(stub, count, batch_sizes)
+        bench_sse(count, batch_sizes)
+        bench_flow_control(counter, batch_sizes[0], pause=0.02)
+    finally:
+        channel.close()
+        grpc_server.stop(None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terms', type=int, default=20000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--redis-url', help='redis://host:port/db (по умолчанию fakeredis)')
+    args = parser.parse_args()
+    run(args.terms, args.batch_sizes, args.redis_url)
@@ -0,0 +1,468 @@
+"""Нагрузочный прогон всего стека глоссария с результатом в JSON.
+
+Сервис глоссария запускается отдельным процессом с выбранным
+хранилищем (--backend):
+    fakeredis - fakeredis внутри процесса сервиса;
+    redis     - настоящий Redis по --redis-url (база очищается!);
+    memory    - хранилище в памяти (Redis недоступен).
+Глоссарий заполняется --terms синтетическими терминами (1k - 1M;
+заполнение fakeredis и построение индекса на сотнях тысяч терминов
+занимает десятки минут, для больших размеров используйте redis или
+memory). Шлюз (--gateway-mode flask|aio) - тоже отдельный процесс,
+кэш ответов в нем по умолчанию выключен, чтобы каждый запрос доходил
+до сервиса (--gateway-env GATEWAY_RESPONSE_CACHE_SIZE=256 - включить).
+
+Каждый сценарий - RPC сервиса (клиент grpc.aio) или маршрут шлюза
+(клиент aiohttp) - выполняется при каждом значении --concurrency.
+Для сценария печатается строка JSON: запросов в секунду, p50/p95/p99
+и максимум задержки, ошибки, пиковый RSS процессов сервиса и шлюза.
+--output сохраняет прогон вместе с описанием окружения (коммит,
+версия Python, параметры), --baseline сравнивает с сохраненным ранее
+прогоном: изменение RPS и p99 в процентах по каждому сценарию.
+
+Запуск:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --terms 100000 --backend memory --concurrency 1 16 64 \\
+        --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_suite.py --only GetTerm /api/terms/search --baseline results/base.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import aiohttp
+import grpc
+
+from common import (
+    CATEGORIES, GATEWAY_DIR, GATEWAY_RUNNERS, ROOT_DIR, fill_hash_layout, make_redis,
+    proc_status, spawn, synthetic_term, wait_ready
+)
+import glossary_pb2
+import glossary_pb2_grpc
+
+BACKENDS = ('fakeredis', 'redis', 'memory')
+
+# Терминов в одном запросе пакетных сценариев
+BATCH_IDS = 20
+BULK_TERMS = 100
+PAGE_SIZE = 100
+
+
+# --- Процесс сервиса ---------------------------------------------------------
+
+def build_storage(backend, count, redis_url):
+    """Хранилище сервиса, заполненное count синтетическими терминами"""
+    from glossary_data import GlossaryStorage
+
+    if backend == 'memory':
+        storage = GlossaryStorage(host='127.0.0.1', port=1)
+        rng = random.Random(count)
+        batch = []
+        for i in range(1, count + 1):
+            batch.append(synthetic_term(i, rng))
+            if len(batch) == 10000:
+                storage.add_terms(batch)
+                batch = []
+        storage.add_terms(batch)
+        return storage, None
+
+    if backend == 'fakeredis':
+        import fakeredis
+
+        fake_server = fakeredis.FakeServer()
+        client = fakeredis.FakeRedis(server=fake_server, decode_responses=True)
+        async_client = lambda: fakeredis.aioredis.FakeRedis(server=fake_server, decode_responses=True)
+    else:
+        import redis.asyncio as aioredis
+
+        client = make_redis(redis_url)
+        async_client = lambda: aioredis.Redis.from_url(redis_url, decode_responses=True)
+    fill_hash_layout(client, count)
+    # Индекс поиска и служебные ключи строит само хранилище при старте
+    return GlossaryStorage(client=client), async_client
+
+
+def serve(args):
+    """Точка входа дочернего процесса: сервис на args.serve_port"""
+    import server
+
+    storage, async_client = build_storage(args.backend, args.terms, args.redis_url)
+    server.GlossaryStorage = lambda **kwargs: storage
+    if async_client is not None:
+        async_storage = server.AsyncGlossaryStorage
+        server.AsyncGlossaryStorage = lambda storage, **kwargs: async_storage(
+            storage, client=async_client()
+        )
+
+    if args.server_mode == 'aio':
+        asyncio.run(server.serve_aio(args.serve_port))
+    else:
+        server.serve(args.serve_port)
+
+
+def start_service(args):
+    """Запустить процесс сервиса и дождаться, пока он примет соединение"""
+    process = spawn(
+        [sys.executable, os.path.abspath(__file__), '--serve-port', str(args.grpc_port),
+         '--backend', args.backend, '--terms', str(args.terms), '--server-mode', args.server_mode]
+        + (['--redis-url', args.redis_url] if args.redis_url else []),
+        os.path.dirname(os.path.abspath(__file__)),
+        METRICS_PORT='0',
+        LOG_LEVEL='WARNING'
+    )
+    started = time.perf_counter()
+    with grpc.insecure_channel(f'localhost:{args.grpc_port}') as channel:
+        while True:
+            try:
+                grpc.channel_ready_future(channel).result(timeout=1)
+                break
+            except grpc.FutureTimeoutError:
+                if process.poll() is not None:
+                    raise RuntimeError(f'glossary service exited with code {process.returncode}')
+    return process, round(time.perf_counter() - started, 1)
+
+
+# --- Сценарии ----------------------------------------------------------------
+
+class Workload:
+    """Случайные параметры запросов и ID терминов, добавленных сценариями записи"""
+
+    def __init__(self, count):
+        self.count = count
+        self.rng = random.Random(20240101)
+        self.next_new = itertools.count(count + 1)
+        self.added = deque()
+
+    def term_id(self):
+        return str(self.rng.randint(1, self.count))
+
+    def term_ids(self, n):
+        return [self.term_id() for _ in range(n)]
+
+    def category(self):
+        return self.rng.choice(CATEGORIES)
+
+    def new_term(self):
+        return synthetic_term(next(self.next_new), self.rng)
+
+    def added_id(self):
+        """ID термина, добавленного AddTerm/POST; удаляется ровно один раз"""
+        return self.added.popleft() if self.added else str(self.count + 10 ** 9)
+
+
+def grpc_scenarios(stub, work):
+    """(имя, тяжелый ли сценарий, корутина одного запроса)"""
+
+    async def get_term():
+        await stub.GetTerm(glossary_pb2.TermRequest(id=work.term_id()))
+
+    async def page():
+        await stub.GetAllTerms(glossary_pb2.PageRequest(page_size=PAGE_SIZE, page_token=work.term_id()))
+
+    async def all_terms():
+        await stub.GetAllTerms(glossary_pb2.PageRequest())
+
+    async def batch_get():
+        await stub.BatchGetTerms(glossary_pb2.BatchGetRequest(ids=work.term_ids(BATCH_IDS)))
+
+    async def search():
+        await stub.SearchTerms(glossary_pb2.SearchRequest(query=f'term{work.term_id()}', limit=10))
+
+    async def category_terms():
+        await stub.SearchTerms(glossary_pb2.SearchRequest(query='', category=work.category()))
+
+    async def stream_terms():
+        async for _ in stub.StreamTerms(glossary_pb2.StreamRequest(category=work.category())):
+            pass
+
+    async def stream_batches():
+        async for _ in stub.StreamTermBatches(glossary_pb2.StreamRequest(category=work.category())):
+            pass
+
+    async def add_term():
+        response = await stub.AddTerm(glossary_pb2.AddTermRequest(**work.new_term()))
+        work.added.append(response.term_id)
+
+    async def add_terms():
+        await stub.AddTerms(glossary_pb2.AddTermRequest(**work.new_term()) for _ in range(BULK_TERMS))
+
+    async def delete_term():
+        await stub.DeleteTerm(glossary_pb2.TermRequest(id=work.added_id()))
+
+    async def list_categories():
+        await stub.ListCategories(glossary_pb2.Empty())
+
+    async def cache_stats():
+        await stub.GetCacheStats(glossary_pb2.Empty())
+
+    async def version():
+        await stub.GetVersion(glossary_pb2.Empty())
+
+    return [
+        ('GetTerm', False, get_term),
+        ('GetAllTerms(page)', False, page),
+        ('GetAllTerms(all)', True, all_terms),
+        ('BatchGetTerms', False, batch_get),
+        ('SearchTerms', False, search),
+        ('SearchTerms(category)', True, category_terms),
+        ('StreamTerms', True, stream_terms),
+        ('StreamTermBatches', True, stream_batches),
+        ('ListCategories', False, list_categories),
+        ('GetCacheStats', False, cache_stats),
+        ('GetVersion', False, version),
+        # Запись - после чтения: добавленные термины не меняют замеры чтения
+        ('AddTerm', False, add_term),
+        ('AddTerms', True, add_terms),
+        ('DeleteTerm', False, delete_term),
+    ]
+
+
+def gateway_scenarios(session, base_url, work):
+    """Маршруты шлюза: (имя, тяжелый ли сценарий, корутина одного запроса)"""
+
+    async def request(method, path, **kwargs):
+        async with session.request(method, base_url + path, **kwargs) as response:
+            await response.read()
+            if response.status >= 400:
+                raise RuntimeError(f'{method} {path}: HTTP {response.status}')
+            return response
+
+    async def add_term():
+        async with session.post(base_url + '/api/terms', json=work.new_term()) as response:
+            data = await response.json()
+            if response.status >= 400:
+                raise RuntimeError(f'POST /api/terms: HTTP {response.status}')
+            work.added.append(data['term_id'])
+
+    return [
+        ('GET /api/terms/<id>', False, lambda: request('GET', f'/api/terms/{work.term_id()}')),
+        ('GET /api/terms?page_size=', False,
+         lambda: request('GET', f'/api/terms?page_size={PAGE_SIZE}&page_token={work.term_id()}')),
+        ('GET /api/terms', True, lambda: request('GET', '/api/terms')),
+        ('GET /api/terms?ids=', False,
+         lambda: request('GET', '/api/terms?ids=' + ','.join(work.term_ids(BATCH_IDS)))),
+        ('GET /api/terms/search', False,
+         lambda: request('GET', f'/api/terms/search?q=term{work.term_id()}&limit=10')),
+        ('GET /api/categories', False, lambda: request('GET', '/api/categories')),
+        ('GET /api/categories/<name>', True, lambda: request('GET', f'/api/categories/{work.category()}')),
+        ('GET /api/terms/stream', True,
+         lambda: request('GET', f'/api/terms/stream?category={work.category()}')),
+        ('GET /api/health', False, lambda: request('GET', '/api/health')),
+        ('GET /metrics', False, lambda: request('GET', '/metrics')),
+        ('POST /api/terms', False, add_term),
+        ('POST /api/terms/bulk', True,
+         lambda: request('POST', '/api/terms/bulk', json=[work.new_term() for _ in range(BULK_TERMS)])),
+        ('DELETE /api/terms/<id>', False, lambda: request('DELETE', f'/api/terms/{work.added_id()}')),
+    ]
+
+
+# --- Нагрузка ----------------------------------------------------------------
+
+def percentile(latencies, share):
+    """Перцентиль отсортированных задержек (секунды) в мс"""
+    return round(latencies[min(int(len(latencies) * share), len(latencies) - 1)] * 1000, 2)
+
+
+async def run_scenario(call, requests, concurrency, pids):
+    """requests вызовов call() в concurrency параллельных потоках запросов"""
+    latencies = []
+    errors = []
+    issued = itertools.count()
+    peak_rss = {name: 0 for name in pids}
+
+    async def worker():
+        while next(issued) < requests:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - started)
+
+    async def sample():
+        while True:
+            for name, pid in pids.items():
+                peak_rss[name] = max(peak_rss[name], proc_status(pid)[1])
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    latencies.sort()
+    row = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 0.5),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+    if errors:
+        row['first_error'] = str(errors[0])[:200]
+    row.update({f'{name}_peak_rss_kb': rss for name, rss in peak_rss.items()})
+    return row
+
+
+def selected(name, only):
+    return not only or any(pattern.lower() in name.lower() for pattern in only)
+
+
+async def run_target(target, scenarios, args, pids):
+    rows = []
+    for name, heavy, call in scenarios:
+        if not selected(name, args.only):
+            continue
+        for concurrency in args.concurrency:
+            requests = args.heavy_requests if heavy else args.requests
+            row = {'target': target, 'scenario': name, 'concurrency': concurrency}
+            row.update(await run_scenario(call, max(requests, concurrency), concurrency, pids))
+            print(json.dumps(row, ensure_ascii=False), flush=True)
+            rows.append(row)
+    return rows
+
+
+async def run_all(args, service_pid, gateway):
+    work = Workload(args.terms)
+    pids = {'service': service_pid}
+    rows = []
+    if 'grpc' in args.targets:
+        options = [('grpc.max_receive_message_length', -1)]
+        async with grpc.aio.insecure_channel(f'localhost:{args.grpc_port}', options=options) as channel:
+            stub = glossary_pb2_grpc.GlossaryServiceStub(channel)
+            rows += await run_target('grpc', grpc_scenarios(stub, work), args, pids)
+
+    if gateway is not None:
+        pids['gateway'] = gateway.pid
+        base_url = f'http://127.0.0.1:{args.port}'
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as session:
+            await wait_ready(session, f'{base_url}/api/health')
+            rows += await run_target('gateway', gateway_scenarios(session, base_url, work), args, pids)
+    return rows
+
+
+# --- Результаты --------------------------------------------------------------
+
+def git_revision():
+    """Коммит и признак незакоммиченных изменений (None вне git)"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, text=True,
+                                         stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--', '.'], cwd=ROOT_DIR,
+                                             text=True, stderr=subprocess.DEVNULL).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def describe(args, load_seconds, service_rss_kb):
+    commit, dirty = git_revision()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'grpc': grpc.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': args.backend,
+        'terms': args.terms,
+        'server_mode': args.server_mode,
+        'gateway_mode': args.gateway_mode if 'gateway' in args.targets else None,
+        'gateway_env': args.gateway_env,
+        'requests': args.requests,
+        'heavy_requests': args.heavy_requests,
+        'load_seconds': load_seconds,
+        'service_rss_kb_after_load': service_rss_kb,
+    }
+
+
+def compare(rows, baseline_path):
+    """Изменение RPS и p99 относительно сохраненного прогона, в процентах"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    before = {(row['target'], row['scenario'], row['concurrency']): row for row in baseline['results']}
+    print(json.dumps({'baseline_commit': baseline['meta'].get('commit')}))
+    for row in rows:
+        old = before.get((row['target'], row['scenario'], row['concurrency']))
+        if not old or not old['rps'] or not old['p99_ms']:
+            continue
+        print(json.dumps({
+            'target': row['target'],
+            'scenario': row['scenario'],
+            'concurrency': row['concurrency'],
+            'rps_change_pct': round((row['rps'] / old['rps'] - 1) * 100, 1),
+            'p99_change_pct': round((row['p99_ms'] / old['p99_ms'] - 1) * 100, 1),
+        }, ensure_ascii=False))
+
+
+def main(args):
+    service, load_seconds = start_service(args)
+    gateway = None
+    try:
+        service_rss_kb = proc_status(service.pid)[1]
+        if 'gateway' in args.targets:
+            env = dict(item.split('=', 1) for item in args.gateway_env)
+            env.setdefault('GATEWAY_RESPONSE_CACHE_SIZE', '0')
+            gateway = spawn(
+                [sys.executable, '-c', GATEWAY_RUNNERS[args.gateway_mode].format(port=args.port)],
+                GATEWAY_DIR,
+                **{'GRPC_SERVERS': f'localhost:{args.grpc_port}', 'LOG_LEVEL': 'WARNING', **env}
+            )
+        rows = asyncio.run(run_all(args, service.pid, gateway))
+    finally:
+        for process in (gateway, service):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': describe(args, load_seconds, service_rss_kb), 'results': rows},
+                      f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        compare(rows, args.baseline)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=BACKENDS, default='fakeredis')
+    parser.add_argument('--redis-url', help='redis://host:port/db для --backend redis')
+    parser.add_argument('--terms', type=int, default=1000)
+    parser.add_argument('--server-mode', choices=('threaded', 'aio'), default='threaded')
+    parser.add_argument('--targets', nargs='+', choices=('grpc', 'gateway'), default=['grpc', 'gateway'])
+    parser.add_argument('--gateway-mode', choices=tuple(GATEWAY_RUNNERS), default='flask')
+    parser.add_argument('--gateway-env', nargs='*', default=[], metavar='KEY=VALUE',
+                        help='переменные окружения шлюза')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--requests', type=int, default=500, help='запросов на сценарий')
+    parser.add_argument('--heavy-requests', type=int, default=20,
+                        help='запросов на сценарий со всем глоссарием или категорией')
+    parser.add_argument('--only', nargs='*', default=[], help='сценарии, в имени которых есть подстрока (без учета регистра)')
+    parser.add_argument('--port', type=int, default=5071)
+    parser.add_argument('--grpc-port', type=int, default=50071)
+    parser.add_argument('--output', help='сохранить прогон в JSON-файл')
+    parser.add_argument('--baseline', help='сравнить с прогоном из JSON-файла')
+    parser.add_argument('--serve-port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.backend == 'redis' and not args.redis_url:
+        parser.error('--backend redis requires --redis-url')
+
+    if args.serve_port:
+        serve(args)
+    else:
+        main(args)
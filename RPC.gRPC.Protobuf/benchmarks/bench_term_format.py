@@ -0,0 +1,60 @@
+"""Бенчмарк формата хранения терминов: hash с JSON-полями против protobuf-блоба.
+
+Измеряется путь GetAllTerms: чтение всех терминов из Redis, получение
+сообщений Term и сериализация TermList.
+
+Запуск:
+    python benchmarks/bench_term_format.py
+    python benchmarks/bench_term_format.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import json
+import time
+
+from common import fill_hash_layout, make_redis, timer
+import glossary_pb2
+from glossary_data import TERM_FORMAT_HASH, TERM_FORMAT_PROTO, GlossaryStorage
+
+
+def get_all_terms_rpc(storage):
+    """Тело GlossaryServicer.GetAllTerms без gRPC"""
+    terms = storage.get_all_terms(as_proto=True)
+    return glossary_pb2.TermList(terms=terms, total_count=len(terms)).SerializeToString()
+
+
+def run(sizes, redis_url=None, repeat=3):
+    results = []
+    for size in sizes:
+        client = make_redis(redis_url)
+        fill_hash_layout(client, size)
+        # Индекс не нужен для этого бенчмарка
+        client.set('index:built', 1)
+        row = {'terms': size}
+
+        for term_format in (TERM_FORMAT_HASH, TERM_FORMAT_PROTO):
+            if term_format == TERM_FORMAT_PROTO:
+                with timer(row, 'migration_ms'):
+                    storage = GlossaryStorage(client=client, term_format=term_format)
+            else:
+                storage = GlossaryStorage(client=client, term_format=term_format)
+
+            cpu_started = time.process_time()
+            with timer(row, f'{term_format}_ms'):
+                for _ in range(repeat):
+                    payload = get_all_terms_rpc(storage)
+            cpu_us = (time.process_time() - cpu_started) / repeat / size * 1e6
+            row[f'{term_format}_ms'] = round(row[f'{term_format}_ms'] / repeat, 2)
+            row[f'{term_format}_cpu_us_per_term'] = round(cpu_us, 2)
+            row[f'{term_format}_bytes'] = len(payload)
+
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--redis-url', help='настоящий Redis (база будет очищена); по умолчанию fakeredis')
+    args = parser.parse_args()
+    run(args.sizes, args.redis_url)
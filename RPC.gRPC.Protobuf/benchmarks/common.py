@@ -0,0 +1,232 @@
+"""Общие утилиты для бенчмарков глоссария"""
+import asyncio
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import redis
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIR = os.path.join(ROOT_DIR, 'glossary-service')
+GATEWAY_DIR = os.path.join(ROOT_DIR, 'api-gateway')
+
+PROTO_DIR = os.path.join(SERVICE_DIR, 'protobufs')
+
+
+def generate_protos():
+    """Сгенерировать glossary_pb2 из .proto во временный каталог"""
+    from grpc_tools import protoc
+
+    out_dir = os.path.join(tempfile.gettempdir(), 'glossary-bench-protos')
+    os.makedirs(out_dir, exist_ok=True)
+    code = protoc.main([
+        'grpc_tools.protoc',
+        f'-I{PROTO_DIR}',
+        f'--python_out={out_dir}',
+        f'--grpc_python_out={out_dir}',
+        os.path.join(PROTO_DIR, 'glossary.proto')
+    ])
+    if code != 0:
+        raise RuntimeError('protoc failed')
+    return out_dir
+
+
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, generate_protos())
+
+CATEGORIES = [
+    'Data Serialization', 'RPC Framework', 'Containerization',
+    'API Design', 'Data Transfer', 'Architecture'
+]
+
+
+def make_redis(url=None):
+    """Клиент Redis: настоящий по URL или fakeredis.
+
+    ВНИМАНИЕ: бенчмарки очищают выбранную базу (FLUSHDB),
+    поэтому для настоящего Redis указывайте отдельный номер базы.
+    """
+    if url:
+        client = redis.Redis.from_url(url, decode_responses=True)
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis(decode_responses=True)
+    client.flushdb()
+    return client
+
+
+def synthetic_term(index, rng=random):
+    """Сгенерировать синтетический термин"""
+    words = [
+        ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+        for _ in range(rng.randint(8, 20))
+    ]
+    return {
+        'name': f'Term{index} {words[0]}',
+        'definition': ' '.join(words),
+        'category': rng.choice(CATEGORIES),
+        'examples': words[1:3],
+        'synonyms': [words[3], f'alias{index}']
+    }
+
+
+# Словарь для терминов, похожих на настоящие: определения глоссария -
+# русский текст, он сжимается иначе, чем случайные латинские буквы
+RUSSIAN_WORDS = (
+    'механизм сериализации данных разработанный компанией для эффективного '
+    'обмена структурированными данными между системами высокопроизводительный '
+    'фреймворк удаленного вызова процедур использующий протокол платформа '
+    'разработки доставки запуска приложений контейнерах архитектурный стиль '
+    'распределенных технология передачи реальном времени виде непрерывного '
+    'потока сервис клиент сервер запрос ответ сообщение схема поле тип '
+    'значение ключ индекс хранилище кэш очередь событие поток соединение'
+).split()
+
+
+def russian_term(index, rng=random):
+    """Синтетический термин с определением на русском языке"""
+    words = rng.choices(RUSSIAN_WORDS, k=rng.randint(15, 40))
+    return {
+        'name': f'Термин {index} {words[0]}',
+        'definition': ' '.join(words).capitalize() + '.',
+        'category': rng.choice(CATEGORIES),
+        'examples': [' '.join(words[1:4]), ' '.join(words[4:7])],
+        'synonyms': [words[7], f'синоним{index}']
+    }
+
+
+def prebuilt_servicer(count, make_term=synthetic_term):
+    """Сервис, отдающий на GetAllTerms один заранее собранный TermList.
+
+    Данные не читаются из хранилища, поэтому бенчмарк измеряет только
+    путь ответа: передачу по gRPC и работу шлюза.
+    """
+    import glossary_pb2
+    import glossary_pb2_grpc
+
+    class PrebuiltServicer(glossary_pb2_grpc.GlossaryServiceServicer):
+        def __init__(self):
+            rng = random.Random(count)
+            terms = []
+            for i in range(1, count + 1):
+                terms.append(glossary_pb2.Term(id=str(i), created_at='2024-01-01T00:00:00',
+                                               updated_at='2024-01-01T00:00:00', **make_term(i, rng)))
+            self.term_list = glossary_pb2.TermList(terms=terms, total_count=count)
+
+        def GetAllTerms(self, request, context):
+            if request.page_size:
+                return glossary_pb2.TermList(terms=self.term_list.terms[:request.page_size],
+                                             total_count=count)
+            return self.term_list
+
+        def GetVersion(self, request, context):
+            return glossary_pb2.Version(generation=1, updated_at='2024-01-01T00:00:00')
+
+    return PrebuiltServicer()
+
+
+def fill_hash_layout(client, count, batch_size=1000):
+    """Записать count терминов в исходной hash-раскладке (term:{id})"""
+    rng = random.Random(count)
+    pipe = client.pipeline(transaction=False)
+    for i in range(1, count + 1):
+        term = synthetic_term(i, rng)
+        term['id'] = str(i)
+        term['examples'] = json.dumps(term['examples'])
+        term['synonyms'] = json.dumps(term['synonyms'])
+        pipe.hset(f'term:{i}', mapping=term)
+        pipe.sadd('term:list', i)
+        pipe.sadd(f'category:{term["category"]}', i)
+        if i % batch_size == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+class RoundTripCounter:
+    """Счетчик round trip'ов клиента Redis.
+
+    Каждая команда и каждый pipeline.execute() отправляются в сокет
+    одним вызовом send_packed_command, его и считаем.
+    """
+
+    def __init__(self, client):
+        self.connection_class = client.connection_pool.connection_class
+        self.count = 0
+
+    @contextmanager
+    def measure(self):
+        original = self.connection_class.send_packed_command
+        counter = self
+
+        def send_packed_command(connection, *args, **kwargs):
+            counter.count += 1
+            return original(connection, *args, **kwargs)
+
+        self.count = 0
+        self.connection_class.send_packed_command = send_packed_command
+        try:
+            yield self
+        finally:
+            self.connection_class.send_packed_command = original
+
+
+@contextmanager
+def timer(result, key):
+    """Записать время выполнения блока (в мс) в result[key]"""
+    started = time.perf_counter()
+    yield
+    result[key] = round((time.perf_counter() - started) * 1000, 2)
+
+
+# Запуск шлюза отдельным процессом на заданном порту
+GATEWAY_RUNNERS = {
+    'flask': 'import gateway; gateway.app.run(host="127.0.0.1", port={port}, threaded=True)',
+    'aio': 'import gateway_aio; gateway_aio.main({port})',
+}
+
+
+def spawn(args, cwd, **env):
+    """Дочерний процесс с путем к сгенерированным protobuf-модулям"""
+    return subprocess.Popen(
+        args,
+        cwd=cwd,
+        env=dict(os.environ, PYTHONPATH=generate_protos(), **env),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def proc_status(pid):
+    """Число потоков и RSS (КБ) процесса"""
+    status = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                status[key] = value.split()[:1]
+    except OSError:
+        return 0, 0
+    return int(status.get('Threads', ['0'])[0]), int(status.get('VmRSS', ['0'])[0])
+
+
+async def wait_ready(session, url, timeout=30):
+    """Дождаться ответа 200 от url (сессия aiohttp)"""
+    import aiohttp
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f'{url} did not start')
+        await asyncio.sleep(0.2)
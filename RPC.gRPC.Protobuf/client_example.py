@@ -12,11 +12,24 @@ def run():
 
     # 1. Получить все термины
     print("1. Получение всех терминов:")
-    all_terms = stub.GetAllTerms(glossary_pb2.Empty())
+    all_terms = stub.GetAllTerms(glossary_pb2.PageRequest())
     for term in all_terms.terms:
         print(f"  - {term.name} ({term.category})")
     print(f"Всего терминов: {all_terms.total_count}\n")
 
+    # 1a. Постраничное чтение по курсору
+    print("1a. Постраничное чтение (по 2 термина):")
+    page_token = ""
+    while True:
+        page = stub.GetAllTerms(
+            glossary_pb2.PageRequest(page_size=2, page_token=page_token)
+        )
+        print(f"  Страница: {', '.join(term.name for term in page.terms)}")
+        page_token = page.next_page_token
+        if not page_token:
+            break
+    print()
+
     # 2. Получить конкретный термин
     print("2. Получение термина по ID:")
     term = stub.GetTerm(glossary_pb2.TermRequest(id="1"))
@@ -0,0 +1,35 @@
+import contextvars
+import time
+from typing import Optional
+
+# Срок текущего запроса (time.monotonic()) или None без срока.
+# Переменная контекста своя у каждого потока пула и у каждой задачи
+# asyncio, поэтому хранилищу не нужно передавать срок в аргументах
+_deadline: contextvars.ContextVar = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Срок запроса истек: клиент ответ уже не ждет"""
+
+
+def set_deadline(time_remaining: Optional[float]) -> contextvars.Token:
+    """Установить срок текущего запроса по оставшемуся времени (секунды)"""
+    deadline = None if time_remaining is None else time.monotonic() + time_remaining
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Оставшееся время текущего запроса (None - без срока)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Прервать многошаговое чтение из Redis, если срок запроса истек"""
+    remaining = time_remaining()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded()
@@ -1,58 +1,534 @@
+import heapq
 import json
+import logging
+from bisect import bisect_right
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, List, Optional
+from itertools import count, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import redis
 
+import glossary_pb2
+from call_deadline import check_deadline
+from redis_scripts import ADD_TERM_SCRIPT, DELETE_TERM_SCRIPT
+from service_metrics import instrument_redis
+
+logger = logging.getLogger(__name__)
+
+# Сколько HGETALL отправлять в Redis за один round trip
+DEFAULT_BATCH_SIZE = 500
+
+# Предельное время ответа Redis на одну команду или pipeline (секунды)
+DEFAULT_SOCKET_TIMEOUT = 5.0
+
+# Форматы хранения термина в Redis: hash с JSON-полями или
+# сериализованное protobuf-сообщение Term
+TERM_FORMAT_HASH = 'hash'
+TERM_FORMAT_PROTO = 'proto'
+TERM_FORMATS = (TERM_FORMAT_HASH, TERM_FORMAT_PROTO)
+
+# Канал Redis pub/sub, в который публикуются ID измененных терминов
+INVALIDATION_CHANNEL = 'term:invalidate'
+
+# Хеш с поколением данных (generation) и временем последнего изменения
+# (updated_at); обновляется скриптами добавления и удаления
+VERSION_KEY = 'term:version'
+
+# Поля термина, по которым строится поисковый индекс
+INDEXED_FIELDS = ('name', 'synonyms', 'definition')
+
+# Длина n-граммы поискового индекса
+NGRAM_SIZE = 3
+
+# Вес совпадения в поле при ранжировании поиска. Веса подобраны так, что
+# совпадение в названии всегда выше любых совпадений только в синонимах
+# и определении, а совпадение в синонимах - выше совпадения в определении
+FIELD_WEIGHTS = {'name': 100, 'synonyms': 20, 'definition': 4}
+
+# Множители веса для точного совпадения поля и совпадения с начала
+EXACT_BOOST = 4
+PREFIX_BOOST = 2
+
+
+def ngrams(text: str) -> Set[str]:
+    """Множество триграмм строки (в нижнем регистре)"""
+    text = text.lower()
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def field_texts(term, field: str) -> List[str]:
+    """Тексты поля термина (словаря или Term) в нижнем регистре"""
+    value = (term.get(field) if isinstance(term, dict) else getattr(term, field)) or []
+    if isinstance(value, str):
+        value = [value]
+    return [text.lower() for text in value]
+
+
+def index_keys(term: Dict) -> Set[str]:
+    """Ключи индекса index:{field}:{ngram}, в которые входит термин"""
+    keys = set()
+    for field in INDEXED_FIELDS:
+        for text in field_texts(term, field):
+            keys.update(f'index:{field}:{gram}' for gram in ngrams(text))
+    return keys
+
+
+def search_fields(term: Dict) -> Dict[str, str]:
+    """Поля хеша term:{id}:search, по которым Lua-скрипт удаления
+    находит ключи индекса"""
+    return {
+        'category': term.get('category', ''),
+        'name': term.get('name', '').lower(),
+        'synonyms': json.dumps(field_texts(term, 'synonyms'), ensure_ascii=False),
+        'definition': term.get('definition', '').lower()
+    }
+
+
+def term_matches(term, query_lower: str) -> bool:
+    """Содержит ли название, синоним или определение подстроку запроса"""
+    return any(
+        query_lower in text
+        for field in INDEXED_FIELDS
+        for text in field_texts(term, field)
+    )
+
+
+def term_score(term, query_lower: str) -> int:
+    """Релевантность термина запросу; 0 - термин не подходит.
+
+    По каждому полю берется лучшее совпадение: точное, с начала строки
+    или подстрока, с весом поля из FIELD_WEIGHTS.
+    """
+    score = 0
+    for field in INDEXED_FIELDS:
+        best = 0
+        for text in field_texts(term, field):
+            if text == query_lower:
+                best = EXACT_BOOST
+                break
+            if text.startswith(query_lower):
+                best = max(best, PREFIX_BOOST)
+            elif query_lower in text:
+                best = max(best, 1)
+        score += best * FIELD_WEIGHTS[field]
+    return score
+
+
+def max_score(fields: Iterable[str]) -> int:
+    """Наибольшая релевантность термина, совпавшего только в полях fields"""
+    return sum(FIELD_WEIGHTS[field] * EXACT_BOOST for field in fields)
+
+
+def search_hash_score(values: List[Optional[str]], query_lower: str) -> int:
+    """Релевантность по полям name, synonyms, definition хеша term:{id}:search"""
+    name, synonyms, definition = values
+    if name is None:
+        return 0
+    return term_score({
+        'name': name,
+        'synonyms': json.loads(synonyms or '[]'),
+        'definition': definition or ''
+    }, query_lower)
+
+
+class TopTerms:
+    """Лучшие limit терминов по релевантности.
+
+    Хранит не больше limit элементов в куче с худшим наверху, поэтому
+    память не зависит от числа совпадений. limit=0 - без ограничения.
+    При равной релевантности выше термин с меньшим ID.
+    """
+
+    def __init__(self, limit: int = 0) -> None:
+        self.limit = limit
+        self._heap: List = []
+        self._seq = count()
+
+    def push(self, item, term_id: str, score: int) -> None:
+        if score <= 0:
+            return
+        order = int(term_id) if term_id.isdigit() else 0
+        entry = (score, -order, next(self._seq), item)
+        if not self.limit or len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def settled(self, bound: int) -> bool:
+        """Куча заполнена, и термин с релевантностью не выше bound в нее не попадет"""
+        return bool(self.limit) and len(self._heap) >= self.limit and self._heap[0][0] > bound
+
+    def results(self) -> List:
+        """Элементы от самого релевантного"""
+        return [entry[-1] for entry in sorted(self._heap, key=lambda entry: entry[:3], reverse=True)]
+
+
+def term_to_proto(term: Dict) -> glossary_pb2.Term:
+    """Конвертация словаря в protobuf сообщение"""
+    return glossary_pb2.Term(
+        id=term.get('id', ''),
+        name=term.get('name', ''),
+        definition=term.get('definition', ''),
+        category=term.get('category', ''),
+        examples=term.get('examples', []),
+        synonyms=term.get('synonyms', []),
+        created_at=term.get('created_at', ''),
+        updated_at=term.get('updated_at', '')
+    )
+
+
+def term_from_proto(term: glossary_pb2.Term) -> Dict:
+    """Конвертация protobuf сообщения в словарь"""
+    return {
+        'id': term.id,
+        'name': term.name,
+        'definition': term.definition,
+        'category': term.category,
+        'examples': list(term.examples),
+        'synonyms': list(term.synonyms),
+        'created_at': term.created_at,
+        'updated_at': term.updated_at
+    }
+
+
+def decode_term(term_data: Dict) -> Dict:
+    """Десериализация JSON полей термина, прочитанного из Redis hash"""
+    for field in ('examples', 'synonyms'):
+        if field in term_data:
+            try:
+                term_data[field] = json.loads(term_data[field])
+            except:
+                term_data[field] = []
+    return term_data
+
+
+def encode_term(term_data: Dict) -> Dict:
+    """Сериализация списков термина в JSON для хранения в hash"""
+    term_hash = term_data.copy()
+    for field in ('examples', 'synonyms'):
+        if isinstance(term_hash.get(field), list):
+            term_hash[field] = json.dumps(term_hash[field])
+    return term_hash
+
+
+def parse_terms(results: List, as_proto: bool, term_format: str) -> List:
+    """Термины из ответов pipeline (GET блобов или HGETALL).
+
+    Общая часть синхронного и асинхронного хранилищ: чтение
+    отличается только способом выполнения pipeline.
+    """
+    if term_format == TERM_FORMAT_PROTO:
+        # Блоб уже является сообщением Term: один разбор без JSON
+        terms = [glossary_pb2.Term.FromString(blob) for blob in results if blob]
+        return terms if as_proto else [term_from_proto(term) for term in terms]
+
+    terms = [decode_term(term) for term in results if term]
+    return [term_to_proto(term) for term in terms] if as_proto else terms
+
+
+def chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Разбиение последовательности на пакеты по size"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def page_min_score(page_token: str) -> str:
+    """Нижняя граница ZRANGEBYSCORE term:order для курсора.
+
+    Бросает ValueError для некорректного курсора.
+    """
+    return f'({int(page_token)}' if page_token else '-inf'
+
+
+def split_page(term_ids: List[str], page_size: int) -> Tuple[List[str], str]:
+    """ID страницы и курсор следующей из page_size + 1 прочитанных ID"""
+    next_token = term_ids[page_size - 1] if len(term_ids) > page_size else ''
+    return term_ids[:page_size], next_token
+
+
+def search_key_sets(query_lower: str, category: Optional[str] = None) -> Optional[List[List[str]]]:
+    """Для каждого поля - ключи множеств, пересечение которых дает кандидатов.
+
+    None, если запрос короче n-граммы и индекс не применим.
+    """
+    grams = ngrams(query_lower)
+    if not grams:
+        return None
+
+    scope = [f'category:{category}'] if category else []
+    return [
+        [f'index:{field}:{gram}' for gram in grams] + scope
+        for field in INDEXED_FIELDS
+    ]
+
+
+def add_script_keys(term_data: Dict) -> List[str]:
+    """KEYS для ADD_TERM_SCRIPT; term:{id} скрипт строит сам (см. redis_scripts)"""
+    return [
+        'term:counter',
+        'term:list',
+        'term:order',
+        f'category:{term_data["category"]}',
+        'categories',
+        VERSION_KEY,
+        *index_keys(term_data)
+    ]
+
+
+def add_script_args(term_data: Dict, term_format: str) -> List:
+    """ARGV для ADD_TERM_SCRIPT"""
+    fields = search_fields(term_data)
+    args = [
+        term_format,
+        term_data['category'],
+        INVALIDATION_CHANNEL,
+        fields['name'],
+        fields['synonyms'],
+        fields['definition'],
+        term_data.get('updated_at') or datetime.now().isoformat()
+    ]
+    # ID назначает скрипт, поэтому в payload его нет
+    payload = {key: value for key, value in term_data.items() if key != 'id'}
+    if term_format == TERM_FORMAT_PROTO:
+        args.append(term_to_proto(payload).SerializeToString())
+    else:
+        for field, value in encode_term(payload).items():
+            args.extend((field, value))
+    return args
+
+
+def delete_script_keys(term_id: str) -> List[str]:
+    """KEYS для DELETE_TERM_SCRIPT; ключи категории и индекса скрипт строит сам"""
+    return [
+        f'term:{term_id}',
+        f'term:{term_id}:search',
+        'term:list',
+        'term:order',
+        'categories',
+        VERSION_KEY
+    ]
+
+
+def delete_script_args(term_id: str) -> List:
+    """ARGV для DELETE_TERM_SCRIPT"""
+    return [term_id, INVALIDATION_CHANNEL, NGRAM_SIZE, datetime.now().isoformat()]
+
+
+def parse_version(values: Dict) -> Dict:
+    """Поколение данных из хеша term:version"""
+    return {
+        'generation': int(values.get('generation') or 0),
+        'updated_at': values.get('updated_at') or ''
+    }
+
+
+class _InvalidationPubSub(redis.client.PubSub):
+    """PubSub, сообщающий о переподключении к Redis"""
+
+    def __init__(self, *args, on_reconnect: Callable[[], None], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_reconnect = on_reconnect
+
+    def on_connect(self, connection):
+        # redis-py вызывает on_connect только при повторном подключении
+        super().on_connect(connection)
+        self.on_reconnect()
+
 
 class GlossaryStorage:
-    def __init__(self, host='redis', port=6379, db=0):
+    def __init__(self, host='redis', port=6379, db=0,
+                 batch_size=DEFAULT_BATCH_SIZE, client=None,
+                 term_format=TERM_FORMAT_HASH, socket_timeout=DEFAULT_SOCKET_TIMEOUT):
+        if term_format not in TERM_FORMATS:
+            raise ValueError(f"Unknown term format: {term_format}")
+        self.batch_size = max(1, batch_size)
+        self.term_format = term_format
+        self.socket_timeout = socket_timeout
         try:
-            self.redis = redis.Redis(
+            # Время и число обращений к Redis - в метриках glossary_redis_*
+            self.redis = instrument_redis(client or redis.Redis(
                 host=host,
                 port=port,
                 db=db,
                 decode_responses=True,
-                socket_connect_timeout=5
-            )
+                socket_connect_timeout=5,
+                socket_timeout=socket_timeout
+            ))
             # Проверка подключения
             self.redis.ping()
-            print(f"Connected to Redis at {host}:{port}")
+            logger.info("Connected to Redis at %s:%s", host, port)
+            # Клиент без декодирования ответов для чтения protobuf-блобов
+            self.redis_raw = instrument_redis(self._raw_client(self.redis))
+            self._add_script = self.redis.register_script(ADD_TERM_SCRIPT)
+            self._delete_script = self.redis.register_script(DELETE_TERM_SCRIPT)
             self._initialize_data()
+            self._ensure_term_format()
+            self._ensure_search_index()
+            self._ensure_category_list()
+            self._ensure_term_order()
+            self._ensure_term_counter()
+            self._ensure_version()
         except Exception as e:
-            print(f"Error connecting to Redis: {e}")
+            logger.error("Error connecting to Redis: %s", e)
             # Fallback: хранение в памяти
             self.in_memory_storage = {}
             self.redis = None
+            self.redis_raw = None
             self._initialize_in_memory()
 
+    @staticmethod
+    def _raw_client(client: redis.Redis) -> redis.Redis:
+        """Клиент на тот же сервер, но возвращающий bytes"""
+        pool = client.connection_pool
+        return redis.Redis(connection_pool=redis.ConnectionPool(
+            connection_class=pool.connection_class,
+            **{**pool.connection_kwargs, 'decode_responses': False}
+        ))
+
     def _initialize_data(self):
         """Инициализация начальными данными о Python"""
         if not self.redis.exists('term:list'):
-            print("Initializing glossary data in Redis...")
+            logger.info("Initializing glossary data in Redis...")
             initial_terms = self._get_initial_terms()
 
+            pipe = self.redis.pipeline(transaction=False)
             for term in initial_terms:
                 term_id = term['id']
-                # Сериализуем списки в строки JSON перед сохранением
-                term_copy = term.copy()
-                if isinstance(term_copy.get('examples'), list):
-                    term_copy['examples'] = json.dumps(term_copy['examples'])
-                if isinstance(term_copy.get('synonyms'), list):
-                    term_copy['synonyms'] = json.dumps(term_copy['synonyms'])
+                self._write_term(pipe, term)
+                pipe.sadd('term:list', term_id)
+                pipe.zadd('term:order', {term_id: int(term_id)})
+                pipe.sadd(f'category:{term["category"]}', term_id)
+                pipe.sadd('categories', term['category'])
+            pipe.set('term:format', self.term_format)
+            pipe.execute()
 
-                self.redis.hset(f'term:{term_id}', mapping=term_copy)
-                self.redis.sadd('term:list', term_id)
-                self.redis.sadd(f'category:{term["category"]}', term_id)
+            logger.info("Initialized %d terms", len(initial_terms))
 
-            print(f"Initialized {len(initial_terms)} terms")
+    def _ensure_term_format(self):
+        """Миграция терминов, если в Redis они лежат в другом формате"""
+        stored_format = self.redis.get('term:format') or TERM_FORMAT_HASH
+        if stored_format != self.term_format:
+            self.migrate_term_format(self.term_format)
+
+    def migrate_term_format(self, target_format: str) -> int:
+        """Перевести все термины в формат target_format.
+
+        Каждый пакет перезаписывается в транзакции. Формат ключа
+        определяется через TYPE, поэтому прерванную миграцию можно
+        безопасно запустить снова.
+        """
+        logger.info("Migrating terms to %s format...", target_format)
+        count = 0
+        for chunk in self._chunks(self.redis.smembers('term:list')):
+            pipe = self.redis.pipeline(transaction=False)
+            for term_id in chunk:
+                pipe.type(f'term:{term_id}')
+            types = pipe.execute()
+
+            hash_ids = [i for i, t in zip(chunk, types) if t == 'hash']
+            proto_ids = [i for i, t in zip(chunk, types) if t == 'string']
+            terms = (self._fetch_chunk(hash_ids, False, TERM_FORMAT_HASH)
+                     + self._fetch_chunk(proto_ids, False, TERM_FORMAT_PROTO))
+
+            pipe = self.redis.pipeline(transaction=True)
+            for term in terms:
+                pipe.delete(f'term:{term["id"]}')
+                self._write_term(pipe, term, target_format)
+            pipe.execute()
+            count += len(terms)
+
+        self.redis.set('term:format', target_format)
+        self.term_format = target_format
+        logger.info("Migrated %d terms", count)
+        return count
+
+    def _ensure_search_index(self):
+        """Построение поискового индекса для уже существующих терминов"""
+        if self.redis.exists('index:built'):
+            return
+
+        logger.info("Building search index in Redis...")
+        count = 0
+        for terms in self._chunks(self.redis.smembers('term:list')):
+            pipe = self.redis.pipeline(transaction=False)
+            for term in self.get_terms(terms):
+                for key in index_keys(term):
+                    pipe.sadd(key, term['id'])
+                pipe.hset(f'term:{term["id"]}:search', mapping=search_fields(term))
+                count += 1
+            pipe.execute()
+        self.redis.set('index:built', 1)
+        logger.info("Indexed %d terms", count)
+
+    def _ensure_category_list(self):
+        """Восстановление множества categories по ключам category:{name}"""
+        if self.redis.exists('categories') or not self.redis.exists('term:list'):
+            return
+
+        names = [
+            key[len('category:'):]
+            for key in self.redis.scan_iter(match='category:*', count=1000)
+        ]
+        if names:
+            self.redis.sadd('categories', *names)
+
+    def _ensure_term_order(self):
+        """Построение упорядоченного индекса term:order для курсоров"""
+        if self.redis.exists('term:order') or not self.redis.exists('term:list'):
+            return
+
+        for chunk in self._chunks(self.redis.smembers('term:list')):
+            self.redis.zadd('term:order', {term_id: int(term_id) for term_id in chunk})
+
+    def _ensure_term_counter(self):
+        """Счетчик ID не должен отставать от уже занятых ID"""
+        last = self.redis.zrevrange('term:order', 0, 0, withscores=True)
+        if last and int(self.redis.get('term:counter') or 0) < last[0][1]:
+            self.redis.set('term:counter', int(last[0][1]))
+
+    def _ensure_version(self):
+        """Время изменения для term:version, если его еще нет.
+
+        Поколение после FLUSHDB снова начинается с нуля, а время старта
+        новое, поэтому пара (generation, updated_at) не повторяется.
+        """
+        self.redis.hsetnx(VERSION_KEY, 'generation', 0)
+        self.redis.hsetnx(VERSION_KEY, 'updated_at', datetime.now().isoformat())
 
     def _initialize_in_memory(self):
         """Инициализация данных в памяти если Redis недоступен"""
-        print("Using in-memory storage")
+        logger.warning("Using in-memory storage")
         self.in_memory_storage = {}
+        self.search_index: Dict[str, Set[str]] = defaultdict(set)
+        self.version = parse_version({'updated_at': datetime.now().isoformat()})
         initial_terms = self._get_initial_terms()
         for term in initial_terms:
             self.in_memory_storage[term['id']] = term
+            self._index_in_memory(term)
+        # Счетчик ID как term:id в Redis: ID удаленных терминов не переиспользуются
+        self.last_memory_id = max((int(term['id']) for term in initial_terms), default=0)
+
+    def _index_in_memory(self, term: Dict):
+        """Добавить термин в индекс в памяти.
+
+        search_index повторяет множества Redis: index:{field}:{ngram}
+        и category:{name}.
+        """
+        for key in index_keys(term) | {f'category:{term.get("category")}'}:
+            self.search_index[key].add(term['id'])
+
+    def _unindex_in_memory(self, term: Dict):
+        """Удалить термин из индекса в памяти"""
+        for key in index_keys(term) | {f'category:{term.get("category")}'}:
+            ids = self.search_index.get(key)
+            if ids is not None:
+                ids.discard(term['id'])
+                if not ids:
+                    del self.search_index[key]
 
     def _get_initial_terms(self):
         """Получение начальных терминов"""
@@ -110,119 +586,339 @@ class GlossaryStorage:
             }
         ]
 
-    def get_term(self, term_id: str) -> Optional[Dict]:
+    def _write_term(self, pipe, term_data: Dict, term_format: Optional[str] = None):
+        """Добавить в pipeline запись термина в заданном формате"""
+        key = f'term:{term_data["id"]}'
+        if (term_format or self.term_format) == TERM_FORMAT_PROTO:
+            pipe.set(key, term_to_proto(term_data).SerializeToString())
+        else:
+            pipe.hset(key, mapping=encode_term(term_data))
+
+    def _chunks(self, items: Iterable[str]) -> Iterator[List[str]]:
+        """Разбиение последовательности на пакеты по batch_size"""
+        return chunked(items, self.batch_size)
+
+    def get_term(self, term_id: str, as_proto: bool = False):
         """Получить термин по ID"""
-        if self.redis:
-            term_data = self.redis.hgetall(f'term:{term_id}')
-            if term_data:
-                # Десериализация JSON полей
-                if 'examples' in term_data:
-                    try:
-                        term_data['examples'] = json.loads(term_data['examples'])
-                    except:
-                        term_data['examples'] = []
-                if 'synonyms' in term_data:
-                    try:
-                        term_data['synonyms'] = json.loads(term_data['synonyms'])
-                    except:
-                        term_data['synonyms'] = []
-            return term_data
+        terms = self.get_terms([term_id], as_proto)
+        return terms[0] if terms else None
+
+    def get_terms(self, term_ids: Iterable[str], as_proto: bool = False) -> List:
+        """Получить несколько терминов по ID.
+
+        Команды чтения отправляются через pipeline пакетами по batch_size,
+        поэтому чтение N терминов стоит N / batch_size round trip'ов
+        вместо N. Отсутствующие ID пропускаются. При as_proto=True
+        возвращаются сообщения glossary_pb2.Term вместо словарей.
+        Перед каждым пакетом проверяется срок запроса (call_deadline).
+        """
+        if not self.redis:
+            terms = [
+                self.in_memory_storage[term_id]
+                for term_id in term_ids
+                if term_id in self.in_memory_storage
+            ]
+            return [term_to_proto(term) for term in terms] if as_proto else terms
+
+        terms = []
+        for chunk in self._chunks(term_ids):
+            check_deadline()
+            terms.extend(self._fetch_chunk(chunk, as_proto))
+        return terms
+
+    def _fetch_chunk(self, term_ids: List[str], as_proto: bool,
+                     term_format: Optional[str] = None) -> List:
+        """Прочитать пакет терминов из Redis за один round trip"""
+        if not term_ids:
+            return []
+
+        term_format = term_format or self.term_format
+        if term_format == TERM_FORMAT_PROTO:
+            pipe = self.redis_raw.pipeline(transaction=False)
+            for term_id in term_ids:
+                pipe.get(f'term:{term_id}')
         else:
-            return self.in_memory_storage.get(term_id)
+            pipe = self.redis.pipeline(transaction=False)
+            for term_id in term_ids:
+                pipe.hgetall(f'term:{term_id}')
+        return parse_terms(pipe.execute(), as_proto, term_format)
 
-    def get_all_terms(self) -> List[Dict]:
+    def get_all_terms(self, as_proto: bool = False) -> List:
         """Получить все термины"""
         if self.redis:
-            term_ids = self.redis.smembers('term:list')
-            terms = []
-            for term_id in term_ids:
-                term = self.redis.hgetall(f'term:{term_id}')
-                if term:
-                    # Десериализация JSON полей
-                    if 'examples' in term:
-                        try:
-                            term['examples'] = json.loads(term['examples'])
-                        except:
-                            term['examples'] = []
-                    if 'synonyms' in term:
-                        try:
-                            term['synonyms'] = json.loads(term['synonyms'])
-                        except:
-                            term['synonyms'] = []
-                    terms.append(term)
-            return terms
+            return self.get_terms(self.redis.smembers('term:list'), as_proto)
         else:
-            return list(self.in_memory_storage.values())
+            return self.get_terms(list(self.in_memory_storage), as_proto)
 
-    def search_terms(self, query: str, category: Optional[str] = None) -> List[Dict]:
-        """Поиск терминов"""
-        results = []
-        all_terms = self.get_all_terms()
+    def count_terms(self) -> int:
+        """Общее количество терминов"""
+        if self.redis:
+            return self.redis.zcard('term:order')
+        return len(self.in_memory_storage)
 
-        for term in all_terms:
-            # Фильтр по категории
-            if category and term.get('category') != category:
-                continue
+    def get_terms_page(self, page_size: int, page_token: str = '',
+                       as_proto: bool = False) -> Tuple[List, str]:
+        """Страница терминов в порядке ID, начиная после курсора page_token.
 
-            # Поиск по названию и определению
-            query_lower = query.lower()
-            name = term.get('name', '').lower()
-            definition = term.get('definition', '').lower()
+        Курсор - ID последнего термина предыдущей страницы, поэтому
+        добавление и удаление терминов не сдвигает страницы. Возвращает
+        термины и курсор следующей страницы ('' для последней).
+        """
+        min_score = page_min_score(page_token)
+        if self.redis:
+            # Читаем на один ID больше, чтобы узнать, есть ли продолжение
+            term_ids = self.redis.zrangebyscore(
+                'term:order', min_score, '+inf', start=0, num=page_size + 1
+            )
+        else:
+            ordered = sorted(self.in_memory_storage, key=int)
+            start = bisect_right([int(i) for i in ordered], int(page_token)) if page_token else 0
+            term_ids = ordered[start:start + page_size + 1]
 
-            if query_lower in name or query_lower in definition:
-                results.append(term)
+        term_ids, next_token = split_page(term_ids, page_size)
+        return self.get_terms(term_ids, as_proto), next_token
 
-        return results
+    def iter_term_batches(self, category: Optional[str] = None, as_proto: bool = False,
+                          batch_size: int = 0) -> Iterator[List]:
+        """Ленивый обход терминов пакетами (списками) по batch_size.
 
-    def add_term(self, term_data: Dict) -> str:
-        """Добавить новый термин"""
+        В памяти одновременно находится только один пакет: следующий
+        читается из хранилища, когда потребитель забрал предыдущий.
+        Без категории термины идут в порядке ID по курсору term:order,
+        с категорией - в порядке SSCAN по множеству category:{name}
+        (SSCAN может изредка вернуть элемент повторно, если множество
+        меняется во время обхода). batch_size=0 - REDIS_BATCH_SIZE.
+        """
+        batch_size = batch_size or self.batch_size
+        if category:
+            if self.redis:
+                term_ids = self.redis.sscan_iter(f'category:{category}', count=batch_size)
+            else:
+                term_ids = list(self.search_index.get(f'category:{category}', ()))
+            for chunk in chunked(term_ids, batch_size):
+                terms = self.get_terms(chunk, as_proto)
+                if terms:
+                    yield terms
+            return
+
+        page_token = ''
+        while True:
+            terms, page_token = self.get_terms_page(batch_size, page_token, as_proto)
+            if terms:
+                yield terms
+            if not page_token:
+                return
+
+    def iter_terms(self, category: Optional[str] = None, as_proto: bool = False,
+                   batch_size: int = 0) -> Iterator:
+        """Ленивый обход терминов по одному, см. iter_term_batches"""
+        for terms in self.iter_term_batches(category, as_proto, batch_size):
+            yield from terms
+
+    def get_terms_by_category(self, category: str, as_proto: bool = False) -> List:
+        """Получить термины категории через множество category:{name}"""
         if self.redis:
-            # Генерация ID
-            term_id = str(self.redis.incr('term:counter', 1))
-            if term_id == '1':  # Если счетчик только создан
-                term_id = '6'  # Продолжаем с 6, так как у нас уже есть 1-5
-        else:
-            term_id = str(len(self.in_memory_storage) + 1)
+            return self.get_terms(self.redis.smembers(f'category:{category}'), as_proto)
+        return self.get_terms(self.search_index.get(f'category:{category}', ()), as_proto)
+
+    def list_categories(self) -> Dict[str, int]:
+        """Категории и число терминов в каждой"""
+        if self.redis:
+            names = sorted(self.redis.smembers('categories'))
+            pipe = self.redis.pipeline(transaction=False)
+            for name in names:
+                pipe.scard(f'category:{name}')
+            counts = pipe.execute()
+            return {name: count for name, count in zip(names, counts) if count}
+
+        return {
+            key[len('category:'):]: len(ids)
+            for key, ids in sorted(self.search_index.items())
+            if key.startswith('category:') and ids
+        }
+
+    def search_terms(self, query: str, category: Optional[str] = None,
+                     as_proto: bool = False, limit: int = 0) -> List:
+        """Поиск терминов, от самых релевантных (см. term_score).
+
+        Кандидаты из индекса оцениваются по хешам term:{id}:search, а
+        целиком читаются только limit лучших. Кандидаты обрабатываются
+        по полям в порядке INDEXED_FIELDS: сначала совпавшие по названию,
+        затем по синонимам и определению. Как только limit лучших набран
+        и термины следующих полей уже не могут их обойти, поиск
+        останавливается.
+        """
+        query_lower = query.lower()
+        top = TopTerms(limit)
+        tiers = self._search_candidates(query_lower, category)
+        if tiers is None:
+            # Запрос короче n-граммы - просматриваем категорию или все термины
+            for term in self.iter_terms(category, as_proto):
+                term_id = term['id'] if isinstance(term, dict) else term.id
+                top.push(term, term_id, term_score(term, query_lower))
+            return top.results()
+
+        if not limit:
+            # Без ограничения читаются все совпадения, оцениваем их сразу
+            for chunk in self._chunks(set().union(*tiers)):
+                for term in self.get_terms(chunk, as_proto):
+                    term_id = term['id'] if isinstance(term, dict) else term.id
+                    top.push(term, term_id, term_score(term, query_lower))
+            return top.results()
+
+        seen = set()
+        for tier, candidates in enumerate(tiers):
+            if top.settled(max_score(INDEXED_FIELDS[tier:])):
+                break
+            candidates -= seen
+            seen |= candidates
+            for term_id, score in self._score_candidates(candidates, query_lower):
+                top.push(term_id, term_id, score)
+        return self.get_terms(top.results(), as_proto)
+
+    def _score_candidates(self, term_ids: Iterable[str],
+                          query_lower: str) -> Iterator[Tuple[str, int]]:
+        """Релевантность кандидатов; индекс дает кандидатов, подстроку
+        проверяет term_score"""
+        if not self.redis:
+            for term_id in term_ids:
+                yield term_id, term_score(self.in_memory_storage[term_id], query_lower)
+            return
+
+        for chunk in self._chunks(term_ids):
+            check_deadline()
+            pipe = self.redis.pipeline(transaction=False)
+            for term_id in chunk:
+                pipe.hmget(f'term:{term_id}:search', INDEXED_FIELDS)
+            for term_id, values in zip(chunk, pipe.execute()):
+                yield term_id, search_hash_score(values, query_lower)
+
+    def _search_candidates(self, query_lower: str,
+                           category: Optional[str] = None) -> Optional[List[Set[str]]]:
+        """ID терминов, содержащих все триграммы запроса, отдельно по каждому
+        полю из INDEXED_FIELDS.
+
+        Если задана категория, множество category:{name} участвует
+        в пересечении. Возвращает None, если запрос слишком короткий
+        для индекса.
+        """
+        per_field = search_key_sets(query_lower, category)
+        if per_field is None:
+            return None
+
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            for keys in per_field:
+                pipe.sinter(keys)
+            return pipe.execute()
 
-        term_data['id'] = term_id
-        term_data['created_at'] = datetime.now().isoformat()
-        term_data['updated_at'] = datetime.now().isoformat()
+        return [
+            set.intersection(*(self.search_index.get(key, set()) for key in keys))
+            for keys in per_field
+        ]
 
-        # Сериализация списков в JSON
-        if 'examples' in term_data and isinstance(term_data['examples'], list):
-            term_data['examples'] = json.dumps(term_data['examples'])
-        if 'synonyms' in term_data and isinstance(term_data['synonyms'], list):
-            term_data['synonyms'] = json.dumps(term_data['synonyms'])
+    def add_term(self, term_data: Dict) -> str:
+        """Добавить новый термин.
+
+        В Redis термин и все индексы записываются одним Lua-скриптом:
+        один round trip, и индексы не остаются обновленными наполовину.
+        """
+        now = datetime.now().isoformat()
+        term_data['created_at'] = now
+        term_data['updated_at'] = now
 
         if self.redis:
-            # Сохранение в Redis
-            self.redis.hset(f'term:{term_id}', mapping=term_data)
-            self.redis.sadd('term:list', term_id)
-            self.redis.sadd(f'category:{term_data["category"]}', term_id)
+            term_data['id'] = self._add_script(
+                keys=add_script_keys(term_data),
+                args=add_script_args(term_data, self.term_format)
+            )
         else:
-            # Сохранение в памяти
-            self.in_memory_storage[term_id] = term_data
+            self.last_memory_id += 1
+            term_data['id'] = str(self.last_memory_id)
+            # Сохранение в памяти; заменяемый термин убирается из индекса
+            replaced = self.in_memory_storage.get(term_data['id'])
+            if replaced is not None:
+                self._unindex_in_memory(replaced)
+            self.in_memory_storage[term_data['id']] = term_data
+            self._index_in_memory(term_data)
+            self._bump_version(now)
+
+        return term_data['id']
+
+    def add_terms(self, terms: List[Dict]) -> List[Union[str, Exception]]:
+        """Добавить несколько терминов.
+
+        Вызовы ADD_TERM_SCRIPT отправляются через pipeline пакетами
+        по batch_size: один round trip на пакет, каждый термин по-прежнему
+        записывается атомарно. Возвращает ID добавленных терминов в том же
+        порядке; для терминов, которые не удалось записать, - исключение.
+        """
+        if not self.redis:
+            return [self.add_term(term_data) for term_data in terms]
 
-        return term_id
+        now = datetime.now().isoformat()
+        results = []
+        for start in range(0, len(terms), self.batch_size):
+            chunk = terms[start:start + self.batch_size]
+            pipe = self.redis.pipeline(transaction=False)
+            for term_data in chunk:
+                term_data['created_at'] = now
+                term_data['updated_at'] = now
+                self._add_script(
+                    keys=add_script_keys(term_data),
+                    args=add_script_args(term_data, self.term_format),
+                    client=pipe
+                )
+            for term_data, result in zip(chunk, pipe.execute(raise_on_error=False)):
+                if not isinstance(result, Exception):
+                    term_data['id'] = result
+                results.append(result)
+        return results
 
     def delete_term(self, term_id: str) -> bool:
         """Удалить термин"""
         if self.redis:
-            # Получаем данные термина для удаления из категории
-            term = self.redis.hgetall(f'term:{term_id}')
-            if not term:
-                return False
-
-            # Удаляем из всех коллекций
-            self.redis.delete(f'term:{term_id}')
-            self.redis.srem('term:list', term_id)
-            category = term.get('category')
-            if category:
-                self.redis.srem(f'category:{category}', term_id)
-
-            return True
+            # Термин, категория и индекс удаляются одним Lua-скриптом
+            return bool(self._delete_script(
+                keys=delete_script_keys(term_id),
+                args=delete_script_args(term_id)
+            ))
         else:
             if term_id in self.in_memory_storage:
-                del self.in_memory_storage[term_id]
+                self._unindex_in_memory(self.in_memory_storage.pop(term_id))
+                self._bump_version(datetime.now().isoformat())
                 return True
-            return False
\ No newline at end of file
+            return False
+
+    def get_version(self) -> Dict:
+        """Поколение данных: generation растет при каждом добавлении
+        и удалении, updated_at - время последнего изменения"""
+        if not self.redis:
+            return dict(self.version)
+        return parse_version(self.redis.hgetall(VERSION_KEY))
+
+    def _bump_version(self, now: str):
+        """Новое поколение данных в памяти"""
+        self.version = {'generation': self.version['generation'] + 1, 'updated_at': now}
+
+    def subscribe_invalidations(self, callback: Callable[[Optional[str]], None]):
+        """Подписаться на изменения терминов, сделанные любым экземпляром сервиса.
+
+        callback вызывается из фонового потока с ID измененного термина.
+        После переподключения подписки вызывается callback(None): пока
+        соединения не было, сообщения могли потеряться, поэтому весь кэш
+        считается устаревшим. Без Redis подписка не нужна, возвращается None.
+        """
+        if not self.redis:
+            return None
+
+        def on_message(message):
+            callback(message['data'])
+
+        pubsub = _InvalidationPubSub(
+            self.redis.connection_pool,
+            on_reconnect=lambda: callback(None),
+            ignore_subscribe_messages=True
+        )
+        pubsub.subscribe(**{INVALIDATION_CHANNEL: on_message})
+        return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
@@ -0,0 +1,259 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+import redis.asyncio as aioredis
+
+from call_deadline import check_deadline
+from glossary_data import (
+    INDEXED_FIELDS, TERM_FORMAT_PROTO, VERSION_KEY, GlossaryStorage, TopTerms,
+    add_script_args, add_script_keys, chunked, delete_script_args,
+    delete_script_keys, max_score, page_min_score, parse_terms,
+    parse_version, search_hash_score, search_key_sets, split_page, term_score
+)
+from redis_scripts import ADD_TERM_SCRIPT, DELETE_TERM_SCRIPT
+from service_metrics import instrument_async_redis
+
+
+class AsyncGlossaryStorage:
+    """Асинхронный доступ к глоссарию поверх redis.asyncio.
+
+    Инициализация данных, построение индексов и миграция формата
+    выполняются один раз при старте синхронным GlossaryStorage; этот
+    класс обслуживает запросы asyncio-сервера с той же раскладкой
+    ключей и теми же Lua-скриптами. Если Redis недоступен, вызовы
+    делегируются хранилищу в памяти (они не блокируют на вводе-выводе).
+    """
+
+    def __init__(self, storage: GlossaryStorage, host='redis', port=6379, db=0, client=None):
+        self.storage = storage
+        self.batch_size = storage.batch_size
+        self.term_format = storage.term_format
+
+        if storage.redis is None:
+            self.redis = None
+            self.redis_raw = None
+            return
+
+        self.redis = instrument_async_redis(client or aioredis.Redis(
+            host=host,
+            port=port,
+            db=db,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            socket_timeout=storage.socket_timeout
+        ))
+        pool = self.redis.connection_pool
+        # Клиент без декодирования ответов для чтения protobuf-блобов
+        self.redis_raw = instrument_async_redis(aioredis.Redis(connection_pool=aioredis.ConnectionPool(
+            connection_class=pool.connection_class,
+            **{**pool.connection_kwargs, 'decode_responses': False}
+        )))
+        self._add_script = self.redis.register_script(ADD_TERM_SCRIPT)
+        self._delete_script = self.redis.register_script(DELETE_TERM_SCRIPT)
+
+    async def close(self):
+        """Закрыть соединения с Redis"""
+        if self.redis:
+            await self.redis.aclose()
+            await self.redis_raw.aclose()
+
+    async def get_term(self, term_id: str, as_proto: bool = False):
+        """Получить термин по ID"""
+        terms = await self.get_terms([term_id], as_proto)
+        return terms[0] if terms else None
+
+    async def get_terms(self, term_ids: Iterable[str], as_proto: bool = False) -> List:
+        """Получить несколько терминов по ID пакетами по batch_size"""
+        if not self.redis:
+            return self.storage.get_terms(term_ids, as_proto)
+
+        terms = []
+        for chunk in chunked(term_ids, self.batch_size):
+            check_deadline()
+            terms.extend(await self._fetch_chunk(chunk, as_proto))
+        return terms
+
+    async def _fetch_chunk(self, term_ids: List[str], as_proto: bool) -> List:
+        """Прочитать пакет терминов из Redis за один round trip"""
+        if self.term_format == TERM_FORMAT_PROTO:
+            pipe = self.redis_raw.pipeline(transaction=False)
+            for term_id in term_ids:
+                pipe.get(f'term:{term_id}')
+        else:
+            pipe = self.redis.pipeline(transaction=False)
+            for term_id in term_ids:
+                pipe.hgetall(f'term:{term_id}')
+        return parse_terms(await pipe.execute(), as_proto, self.term_format)
+
+    async def get_all_terms(self, as_proto: bool = False) -> List:
+        """Получить все термины"""
+        if not self.redis:
+            return self.storage.get_all_terms(as_proto)
+        return await self.get_terms(await self.redis.smembers('term:list'), as_proto)
+
+    async def count_terms(self) -> int:
+        """Общее количество терминов"""
+        if not self.redis:
+            return self.storage.count_terms()
+        return await self.redis.zcard('term:order')
+
+    async def get_terms_page(self, page_size: int, page_token: str = '',
+                             as_proto: bool = False) -> Tuple[List, str]:
+        """Страница терминов в порядке ID после курсора page_token"""
+        if not self.redis:
+            return self.storage.get_terms_page(page_size, page_token, as_proto)
+
+        term_ids = await self.redis.zrangebyscore(
+            'term:order', page_min_score(page_token), '+inf', start=0, num=page_size + 1
+        )
+        term_ids, next_token = split_page(term_ids, page_size)
+        return await self.get_terms(term_ids, as_proto), next_token
+
+    async def iter_term_batches(self, category: Optional[str] = None, as_proto: bool = False,
+                                batch_size: int = 0) -> AsyncIterator[List]:
+        """Ленивый обход терминов пакетами, см. GlossaryStorage.iter_term_batches"""
+        if not self.redis:
+            for terms in self.storage.iter_term_batches(category, as_proto, batch_size):
+                yield terms
+            return
+
+        batch_size = batch_size or self.batch_size
+        if category:
+            chunk = []
+            async for term_id in self.redis.sscan_iter(f'category:{category}', count=batch_size):
+                chunk.append(term_id)
+                if len(chunk) >= batch_size:
+                    terms = await self.get_terms(chunk, as_proto)
+                    if terms:
+                        yield terms
+                    chunk = []
+            terms = await self.get_terms(chunk, as_proto)
+            if terms:
+                yield terms
+            return
+
+        page_token = ''
+        while True:
+            terms, page_token = await self.get_terms_page(batch_size, page_token, as_proto)
+            if terms:
+                yield terms
+            if not page_token:
+                return
+
+    async def iter_terms(self, category: Optional[str] = None, as_proto: bool = False,
+                         batch_size: int = 0) -> AsyncIterator:
+        """Ленивый обход терминов по одному"""
+        async for terms in self.iter_term_batches(category, as_proto, batch_size):
+            for term in terms:
+                yield term
+
+    async def get_terms_by_category(self, category: str, as_proto: bool = False) -> List:
+        """Получить термины категории через множество category:{name}"""
+        if not self.redis:
+            return self.storage.get_terms_by_category(category, as_proto)
+        return await self.get_terms(await self.redis.smembers(f'category:{category}'), as_proto)
+
+    async def list_categories(self) -> Dict[str, int]:
+        """Категории и число терминов в каждой"""
+        if not self.redis:
+            return self.storage.list_categories()
+
+        names = sorted(await self.redis.smembers('categories'))
+        pipe = self.redis.pipeline(transaction=False)
+        for name in names:
+            pipe.scard(f'category:{name}')
+        counts = await pipe.execute()
+        return {name: count for name, count in zip(names, counts) if count}
+
+    async def search_terms(self, query: str, category: Optional[str] = None,
+                           as_proto: bool = False, limit: int = 0) -> List:
+        """Поиск терминов по релевантности, см. GlossaryStorage.search_terms"""
+        if not self.redis:
+            return self.storage.search_terms(query, category, as_proto, limit)
+
+        query_lower = query.lower()
+        top = TopTerms(limit)
+        tiers = await self._search_candidates(query_lower, category)
+        if tiers is None:
+            async for term in self.iter_terms(category, as_proto):
+                term_id = term['id'] if isinstance(term, dict) else term.id
+                top.push(term, term_id, term_score(term, query_lower))
+            return top.results()
+
+        if not limit:
+            for chunk in chunked(set().union(*tiers), self.batch_size):
+                for term in await self.get_terms(chunk, as_proto):
+                    term_id = term['id'] if isinstance(term, dict) else term.id
+                    top.push(term, term_id, term_score(term, query_lower))
+            return top.results()
+
+        seen = set()
+        for tier, candidates in enumerate(tiers):
+            if top.settled(max_score(INDEXED_FIELDS[tier:])):
+                break
+            candidates -= seen
+            seen |= candidates
+            for chunk in chunked(candidates, self.batch_size):
+                check_deadline()
+                pipe = self.redis.pipeline(transaction=False)
+                for term_id in chunk:
+                    pipe.hmget(f'term:{term_id}:search', INDEXED_FIELDS)
+                for term_id, values in zip(chunk, await pipe.execute()):
+                    top.push(term_id, term_id, search_hash_score(values, query_lower))
+        return await self.get_terms(top.results(), as_proto)
+
+    async def _search_candidates(self, query_lower: str,
+                                 category: Optional[str] = None) -> Optional[List[Set[str]]]:
+        """ID терминов-кандидатов из поискового индекса по каждому полю"""
+        per_field = search_key_sets(query_lower, category)
+        if per_field is None:
+            return None
+
+        pipe = self.redis.pipeline(transaction=False)
+        for keys in per_field:
+            pipe.sinter(keys)
+        return await pipe.execute()
+
+    async def get_version(self) -> Dict:
+        """Поколение данных, см. GlossaryStorage.get_version"""
+        if not self.redis:
+            return self.storage.get_version()
+        return parse_version(await self.redis.hgetall(VERSION_KEY))
+
+    async def add_term(self, term_data: Dict) -> str:
+        """Добавить новый термин одним вызовом Lua-скрипта"""
+        if not self.redis:
+            return self.storage.add_term(term_data)
+        return (await self.add_terms([term_data]))[0]
+
+    async def add_terms(self, terms: List[Dict]) -> List[Union[str, Exception]]:
+        """Добавить несколько терминов пакетами по batch_size"""
+        if not self.redis:
+            return self.storage.add_terms(terms)
+
+        now = datetime.now().isoformat()
+        results = []
+        for start in range(0, len(terms), self.batch_size):
+            chunk = terms[start:start + self.batch_size]
+            pipe = self.redis.pipeline(transaction=False)
+            for term_data in chunk:
+                term_data['created_at'] = now
+                term_data['updated_at'] = now
+                await self._add_script(
+                    keys=add_script_keys(term_data),
+                    args=add_script_args(term_data, self.term_format),
+                    client=pipe
+                )
+            for term_data, result in zip(chunk, await pipe.execute(raise_on_error=False)):
+                if not isinstance(result, Exception):
+                    term_data['id'] = result
+                results.append(result)
+        return results
+
+    async def delete_term(self, term_id: str) -> bool:
+        """Удалить термин одним вызовом Lua-скрипта"""
+        if not self.redis:
+            return self.storage.delete_term(term_id)
+        return bool(await self._delete_script(
+            keys=delete_script_keys(term_id),
+            args=delete_script_args(term_id)
+        ))
@@ -0,0 +1,24 @@
+import os
+
+import grpc
+
+
+# Сжатие сообщений gRPC (GRPC_COMPRESSION): запросы сжимает канал шлюза,
+# ответы - сервер глоссария с тем же параметром. Списки терминов - в
+# основном текст определений, gzip уменьшает их в несколько раз.
+# Модуль одинаковый в glossary-service и api-gateway
+DEFAULT_COMPRESSION = 'none'
+
+COMPRESSION_ALGORITHMS = {
+    'none': grpc.Compression.NoCompression,
+    'gzip': grpc.Compression.Gzip,
+    'deflate': grpc.Compression.Deflate,
+}
+
+
+def compression_from_env() -> grpc.Compression:
+    """Алгоритм сжатия из GRPC_COMPRESSION; неизвестное значение - ValueError"""
+    name = os.getenv('GRPC_COMPRESSION', DEFAULT_COMPRESSION).strip().lower()
+    if name not in COMPRESSION_ALGORITHMS:
+        raise ValueError(f"Unknown GRPC_COMPRESSION: {name}")
+    return COMPRESSION_ALGORITHMS[name]
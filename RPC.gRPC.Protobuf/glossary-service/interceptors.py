@@ -0,0 +1,191 @@
+import asyncio
+import time
+from functools import partial
+
+import grpc
+
+from call_deadline import DeadlineExceeded, reset_deadline, set_deadline
+from metrics_common import labelled
+from service_metrics import GRPC_SECONDS
+
+
+def wrap_handler(handler, wrap):
+    """Обработчик RPC с поведением, обернутым wrap(behavior, response_streaming).
+
+    Подходит и для grpc.server, и для grpc.aio.server: фабрики
+    *_rpc_method_handler принимают как обычные функции, так и корутины.
+    """
+    if handler is None:
+        return None
+    if handler.request_streaming and handler.response_streaming:
+        factory, behavior = grpc.stream_stream_rpc_method_handler, handler.stream_stream
+    elif handler.request_streaming:
+        factory, behavior = grpc.stream_unary_rpc_method_handler, handler.stream_unary
+    elif handler.response_streaming:
+        factory, behavior = grpc.unary_stream_rpc_method_handler, handler.unary_stream
+    else:
+        factory, behavior = grpc.unary_unary_rpc_method_handler, handler.unary_unary
+    return factory(
+        wrap(behavior, handler.response_streaming),
+        request_deserializer=handler.request_deserializer,
+        response_serializer=handler.response_serializer
+    )
+
+
+def _with_deadline(behavior, response_streaming):
+    if response_streaming:
+        # Генератор потока может быть закрыт из другого потока, где сброс
+        # невозможен; каждый следующий RPC все равно ставит свой срок
+        def wrapper(request, context):
+            set_deadline(context.time_remaining())
+            try:
+                yield from behavior(request, context)
+            except DeadlineExceeded:
+                context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, 'Deadline exceeded')
+        return wrapper
+
+    def wrapper(request, context):
+        token = set_deadline(context.time_remaining())
+        try:
+            return behavior(request, context)
+        except DeadlineExceeded:
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, 'Deadline exceeded')
+        finally:
+            reset_deadline(token)
+    return wrapper
+
+
+def _with_deadline_async(behavior, response_streaming):
+    # Каждый RPC grpc.aio выполняется своей задачей с копией контекста,
+    # поэтому срок не нужно сбрасывать после вызова
+    if response_streaming:
+        async def wrapper(request, context):
+            set_deadline(context.time_remaining())
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            except DeadlineExceeded:
+                await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, 'Deadline exceeded')
+        return wrapper
+
+    async def wrapper(request, context):
+        set_deadline(context.time_remaining())
+        try:
+            return await behavior(request, context)
+        except DeadlineExceeded:
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, 'Deadline exceeded')
+    return wrapper
+
+
+class DeadlineInterceptor(grpc.ServerInterceptor):
+    """Передает срок вызова (grpc-timeout клиента) в хранилище.
+
+    Хранилище проверяет срок между пакетами чтения из Redis и
+    прекращает работу, которую клиент уже не дождется.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        return wrap_handler(continuation(handler_call_details), _with_deadline)
+
+
+class AioDeadlineInterceptor(grpc.aio.ServerInterceptor):
+    """DeadlineInterceptor для grpc.aio.server"""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        return wrap_handler(await continuation(handler_call_details), _with_deadline_async)
+
+
+def _observe(method, context, error_code, started):
+    """Время RPC в glossary_grpc_server_handling_seconds с кодом ответа"""
+    code = context.code() or error_code or grpc.StatusCode.OK
+    labelled(GRPC_SECONDS, method, getattr(code, 'name', str(code))).observe(time.perf_counter() - started)
+
+
+def _with_metrics(method, behavior, response_streaming):
+    if response_streaming:
+        def wrapper(request, context):
+            started = time.perf_counter()
+            error_code = None
+            try:
+                yield from behavior(request, context)
+            except GeneratorExit:
+                # Клиент закрыл поток
+                error_code = grpc.StatusCode.CANCELLED
+                raise
+            except Exception:
+                error_code = grpc.StatusCode.UNKNOWN
+                raise
+            finally:
+                _observe(method, context, error_code, started)
+        return wrapper
+
+    def wrapper(request, context):
+        started = time.perf_counter()
+        error_code = None
+        try:
+            return behavior(request, context)
+        except Exception:
+            error_code = grpc.StatusCode.UNKNOWN
+            raise
+        finally:
+            _observe(method, context, error_code, started)
+    return wrapper
+
+
+def _with_metrics_async(method, behavior, response_streaming):
+    if response_streaming:
+        async def wrapper(request, context):
+            started = time.perf_counter()
+            error_code = None
+            try:
+                async for response in behavior(request, context):
+                    yield response
+            except asyncio.CancelledError:
+                error_code = grpc.StatusCode.CANCELLED
+                raise
+            except Exception:
+                error_code = grpc.StatusCode.UNKNOWN
+                raise
+            finally:
+                _observe(method, context, error_code, started)
+        return wrapper
+
+    async def wrapper(request, context):
+        started = time.perf_counter()
+        error_code = None
+        try:
+            return await behavior(request, context)
+        except asyncio.CancelledError:
+            error_code = grpc.StatusCode.CANCELLED
+            raise
+        except Exception:
+            error_code = grpc.StatusCode.UNKNOWN
+            raise
+        finally:
+            _observe(method, context, error_code, started)
+    return wrapper
+
+
+def _method_name(handler_call_details):
+    """Короткое имя метода: /glossary.GlossaryService/GetTerm -> GetTerm"""
+    return handler_call_details.method.rsplit('/', 1)[-1]
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Время обработки каждого RPC по методу и коду ответа.
+
+    Ставится первым в списке interceptors, чтобы учитывать и ответы,
+    прерванные другими перехватчиками (DEADLINE_EXCEEDED).
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        method = _method_name(handler_call_details)
+        return wrap_handler(continuation(handler_call_details), partial(_with_metrics, method))
+
+
+class AioMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """MetricsInterceptor для grpc.aio.server"""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        method = _method_name(handler_call_details)
+        return wrap_handler(await continuation(handler_call_details), partial(_with_metrics_async, method))
@@ -0,0 +1,23 @@
+from typing import Any, Dict, Tuple
+
+
+# Общие части метрик Prometheus сервиса глоссария и шлюза.
+# Модуль одинаковый в glossary-service и api-gateway
+
+# Границы корзин (секунды): от ответа из кэша до выгрузки всего глоссария
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Дочерние серии по значениям меток: metric.labels() на каждый вызов
+# проверяет метки и ищет серию под блокировкой, а наблюдения идут на
+# горячем пути - на каждый RPC и каждую команду Redis в сервисе, на
+# каждый HTTP-запрос и вызов сервиса в шлюзе
+_children: Dict[Tuple, Any] = {}
+
+
+def labelled(metric, *labels):
+    """metric.labels(*labels) из кэша"""
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
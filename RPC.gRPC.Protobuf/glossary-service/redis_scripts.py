@@ -0,0 +1,112 @@
+# Lua-скрипты атомарной записи терминов в Redis.
+#
+# Каждый скрипт выполняется за один round trip и атомарно обновляет
+# сам термин и все индексы: term:list, term:order, category:{name},
+# categories, index:{field}:{ngram}, поколение данных term:version,
+# а также публикует инвалидацию.
+#
+# Скрипты рассчитаны на один узел Redis (или на прокси без префиксов
+# ключей и без шардирования): часть ключей они строят сами, а не
+# получают в KEYS. ADD_TERM_SCRIPT узнает ID только из INCR, поэтому
+# term:{id} и term:{id}:search собирает внутри. DELETE_TERM_SCRIPT
+# строит category:{name} и index:{field}:{ngram} из term:{id}:search,
+# прочитанного в том же вызове. Передать эти ключи в KEYS можно только
+# ценой лишнего round trip до вызова скрипта. Redis Cluster не подходит
+# и так: ключи одной записи лежат в разных слотах.
+
+# KEYS: term:counter, term:list, term:order, category:{name}, categories,
+#       term:version, index:{field}:{ngram}...
+# Строит сам: term:{id}, term:{id}:search
+# ARGV: формат (hash|proto), категория, канал инвалидации,
+#       название, синонимы (JSON), определение - в нижнем регистре,
+#       время изменения, затем protobuf-блоб без id или пары
+#       поле/значение для hash
+ADD_TERM_SCRIPT = """
+local id = tostring(redis.call('INCR', KEYS[1]))
+local key = 'term:' .. id
+
+if ARGV[1] == 'proto' then
+    -- Порядок полей в protobuf не важен: дописываем поле id (номер 1,
+    -- length-delimited) перед остальными. Длина ID меньше 128 байт,
+    -- поэтому varint длины занимает один байт.
+    redis.call('SET', key, '\\10' .. string.char(#id) .. id .. ARGV[8])
+else
+    redis.call('HSET', key, 'id', id, unpack(ARGV, 8))
+end
+
+redis.call('HSET', key .. ':search',
+    'category', ARGV[2], 'name', ARGV[4], 'synonyms', ARGV[5], 'definition', ARGV[6])
+redis.call('SADD', KEYS[2], id)
+redis.call('ZADD', KEYS[3], id, id)
+redis.call('SADD', KEYS[4], id)
+redis.call('SADD', KEYS[5], ARGV[2])
+for i = 7, #KEYS do
+    redis.call('SADD', KEYS[i], id)
+end
+
+redis.call('HINCRBY', KEYS[6], 'generation', 1)
+redis.call('HSET', KEYS[6], 'updated_at', ARGV[7])
+
+redis.call('PUBLISH', ARGV[3], id)
+return id
+"""
+
+# KEYS: term:{id}, term:{id}:search, term:list, term:order, categories,
+#       term:version
+# Строит сам: category:{name}, index:{field}:{ngram}
+# ARGV: ID, канал инвалидации, длина n-граммы, время изменения
+#
+# Ключи индекса вычисляются из term:{id}:search так же, как в
+# glossary_data.ngrams(): тексты там уже в нижнем регистре, остается
+# разбить UTF-8 строку на символы и взять все n-граммы.
+DELETE_TERM_SCRIPT = """
+local id = ARGV[1]
+local n = tonumber(ARGV[3])
+local search = redis.call('HGETALL', KEYS[2])
+if redis.call('DEL', KEYS[1]) == 0 then
+    return 0
+end
+
+local fields = {}
+for i = 1, #search, 2 do
+    fields[search[i]] = search[i + 1]
+end
+
+local function unindex(field, text)
+    local chars = {}
+    for char in string.gmatch(text, '[%z\\1-\\127\\194-\\244][\\128-\\191]*') do
+        chars[#chars + 1] = char
+    end
+    for i = 1, #chars - n + 1 do
+        redis.call('SREM', 'index:' .. field .. ':' .. table.concat(chars, '', i, i + n - 1), id)
+    end
+end
+
+if fields.name then
+    unindex('name', fields.name)
+end
+if fields.synonyms then
+    for _, synonym in ipairs(cjson.decode(fields.synonyms)) do
+        unindex('synonyms', synonym)
+    end
+end
+if fields.definition then
+    unindex('definition', fields.definition)
+end
+
+if fields.category then
+    local category_key = 'category:' .. fields.category
+    redis.call('SREM', category_key, id)
+    if redis.call('SCARD', category_key) == 0 then
+        redis.call('SREM', KEYS[5], fields.category)
+    end
+end
+
+redis.call('DEL', KEYS[2])
+redis.call('SREM', KEYS[3], id)
+redis.call('ZREM', KEYS[4], id)
+redis.call('HINCRBY', KEYS[6], 'generation', 1)
+redis.call('HSET', KEYS[6], 'updated_at', ARGV[4])
+redis.call('PUBLISH', ARGV[2], id)
+return 1
+"""
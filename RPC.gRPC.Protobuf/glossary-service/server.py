@@ -1,143 +1,483 @@
 import grpc
 from concurrent import futures
+import argparse
+import asyncio
 import logging
+import os
 from datetime import datetime
 
 import glossary_pb2
 import glossary_pb2_grpc
-from glossary_data import GlossaryStorage
+from glossary_data import (
+    DEFAULT_BATCH_SIZE, DEFAULT_SOCKET_TIMEOUT, TERM_FORMAT_HASH, GlossaryStorage
+)
+from glossary_data_async import AsyncGlossaryStorage
+from grpc_compression import compression_from_env
+from interceptors import (
+    AioDeadlineInterceptor, AioMetricsInterceptor, DeadlineInterceptor, MetricsInterceptor
+)
+from logging_config import configure_logging
+from service_metrics import start_metrics_server
+from term_cache import TermCache
+
+logger = logging.getLogger(__name__)
+
+# Верхняя граница batch_size потоковых RPC: пакет должен помещаться
+# в одно сообщение gRPC и не раздувать память сервиса
+MAX_STREAM_BATCH_SIZE = 1000
+
+
+def stream_batch_size(request):
+    """Размер пакета потока из StreamRequest (0 - REDIS_BATCH_SIZE хранилища)"""
+    return min(max(request.batch_size, 0), MAX_STREAM_BATCH_SIZE)
+
+
+def stream_params(request):
+    """Аргументы iter_terms/iter_term_batches из StreamRequest"""
+    return {
+        'category': request.category or None,
+        'as_proto': True,
+        'batch_size': stream_batch_size(request)
+    }
+
+
+def search_params(request):
+    """Аргументы search_terms из SearchRequest"""
+    return {
+        'query': request.query,
+        'category': request.category or None,
+        'as_proto': True,
+        'limit': max(request.limit, 0)
+    }
+
+
+def request_to_dict(request):
+    """Конвертация AddTermRequest в словарь для хранилища"""
+    return {
+        'name': request.name,
+        'definition': request.definition,
+        'category': request.category,
+        'examples': list(request.examples),
+        'synonyms': list(request.synonyms)
+    }
+
+
+def term_list(terms, total_count=None, next_page_token=''):
+    """TermList; total_count по умолчанию - число терминов в списке"""
+    return glossary_pb2.TermList(
+        terms=terms,
+        total_count=len(terms) if total_count is None else total_count,
+        next_page_token=next_page_token
+    )
+
+
+def term_not_found(context, term_id):
+    """Ответ GetTerm для отсутствующего термина"""
+    context.set_code(grpc.StatusCode.NOT_FOUND)
+    context.set_details(f"Term with id {term_id} not found")
+    return glossary_pb2.Term()
+
+
+def invalid_page_token(context, page_token):
+    """Ответ GetAllTerms для некорректного курсора"""
+    context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+    context.set_details(f"Invalid page token: {page_token}")
+    return glossary_pb2.TermList()
+
+
+def split_cached(cache, ids):
+    """ID без повторов, найденные в кэше термины и ID, которых в кэше нет"""
+    term_ids = list(dict.fromkeys(ids))
+    found = {}
+    missing = []
+    for term_id in term_ids:
+        term = cache.get(term_id)
+        if term is not None:
+            found[term_id] = term
+        else:
+            missing.append(term_id)
+    return term_ids, found, missing
+
+
+def merge_loaded(cache, found, terms, version):
+    """Добавить прочитанные из хранилища термины к найденным и в кэш"""
+    for term in terms:
+        found[term.id] = term
+        cache.put(term.id, term, version)
+
+
+def batch_term_list(term_ids, found):
+    """TermList для BatchGetTerms: найденные термины в порядке запроса"""
+    return term_list([found[term_id] for term_id in term_ids if term_id in found])
+
+
+def add_result(cache, term_id):
+    """OperationResponse для ID добавленного термина или исключения хранилища"""
+    if isinstance(term_id, Exception):
+        return glossary_pb2.OperationResponse(
+            success=False,
+            message=f"Error adding term: {str(term_id)}",
+            term_id=""
+        )
+    cache.invalidate(term_id)
+    return glossary_pb2.OperationResponse(
+        success=True,
+        message="Term added successfully",
+        term_id=term_id
+    )
+
+
+def add_failed(context, error):
+    """Ответ AddTerm, если хранилище не записало термин"""
+    context.set_code(grpc.StatusCode.INTERNAL)
+    context.set_details(str(error))
+    return add_result(None, error)
+
+
+def bulk_add_response(results):
+    """BulkAddResponse по результатам отдельных терминов"""
+    return glossary_pb2.BulkAddResponse(
+        results=results,
+        added_count=sum(1 for result in results if result.success)
+    )
+
+
+def delete_response(context, term_id, success):
+    """OperationResponse для DeleteTerm; NOT_FOUND, если термина не было"""
+    if success:
+        return glossary_pb2.OperationResponse(
+            success=True,
+            message="Term deleted successfully",
+            term_id=term_id
+        )
+    context.set_code(grpc.StatusCode.NOT_FOUND)
+    context.set_details(f"Term with id {term_id} not found")
+    return glossary_pb2.OperationResponse(
+        success=False,
+        message=f"Term with id {term_id} not found",
+        term_id=term_id
+    )
+
+
+def category_list(categories):
+    """CategoryList из словаря категория -> количество терминов"""
+    return glossary_pb2.CategoryList(categories=[
+        glossary_pb2.Category(name=name, term_count=count)
+        for name, count in categories.items()
+    ])
 
 
 class GlossaryServicer(glossary_pb2_grpc.GlossaryServiceServicer):
     def __init__(self):
-        self.storage = GlossaryStorage()
+        self.storage = GlossaryStorage(
+            host=os.getenv('REDIS_HOST', 'redis'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            batch_size=int(os.getenv('REDIS_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+            term_format=os.getenv('TERM_STORAGE_FORMAT', TERM_FORMAT_HASH),
+            socket_timeout=float(os.getenv('REDIS_SOCKET_TIMEOUT', DEFAULT_SOCKET_TIMEOUT))
+        )
+        self.cache = TermCache(
+            max_size=int(os.getenv('TERM_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('TERM_CACHE_TTL', 300))
+        )
+        # Записи других реплик сбрасывают кэш через Redis pub/sub
+        self.storage.subscribe_invalidations(self.cache.invalidate)
 
     def GetTerm(self, request, context):
         """Получить термин по ID"""
         term_id = request.id
-        term_data = self.storage.get_term(term_id)
+        term = self.cache.get(term_id)
+        if term is not None:
+            return term
 
-        if not term_data:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            context.set_details(f"Term with id {term_id} not found")
-            return glossary_pb2.Term()
+        version = self.cache.version
+        term = self.storage.get_term(term_id, as_proto=True)
+        if term is None:
+            return term_not_found(context, term_id)
 
-        return self._dict_to_term_proto(term_data)
+        self.cache.put(term_id, term, version)
+        return term
 
     def GetAllTerms(self, request, context):
-        """Получить все термины"""
-        terms_data = self.storage.get_all_terms()
-        terms = [self._dict_to_term_proto(term) for term in terms_data]
-
-        return glossary_pb2.TermList(
-            terms=terms,
-            total_count=len(terms)
-        )
+        """Получить все термины или одну страницу по курсору"""
+        if request.page_size <= 0:
+            return term_list(self.storage.get_all_terms(as_proto=True))
 
-    def SearchTerms(self, request, context):
-        """Поиск терминов"""
-        terms_data = self.storage.search_terms(
-            query=request.query,
-            category=request.category if request.category else None
-        )
+        try:
+            terms, next_page_token = self.storage.get_terms_page(
+                request.page_size, request.page_token, as_proto=True
+            )
+        except ValueError:
+            return invalid_page_token(context, request.page_token)
 
-        if request.limit > 0:
-            terms_data = terms_data[:request.limit]
+        return term_list(terms, self.storage.count_terms(), next_page_token)
 
-        terms = [self._dict_to_term_proto(term) for term in terms_data]
+    def SearchTerms(self, request, context):
+        """Поиск терминов, от самых релевантных; не больше limit, если он задан"""
+        return term_list(self.storage.search_terms(**search_params(request)))
 
-        return glossary_pb2.TermList(
-            terms=terms,
-            total_count=len(terms)
-        )
+    def BatchGetTerms(self, request, context):
+        """Получить несколько терминов по ID (в порядке запроса)"""
+        term_ids, found, missing = split_cached(self.cache, request.ids)
+        if missing:
+            version = self.cache.version
+            merge_loaded(self.cache, found, self.storage.get_terms(missing, as_proto=True), version)
+        return batch_term_list(term_ids, found)
 
     def AddTerm(self, request, context):
         """Добавить новый термин"""
-        term_data = {
-            'name': request.name,
-            'definition': request.definition,
-            'category': request.category,
-            'examples': list(request.examples),
-            'synonyms': list(request.synonyms)
-        }
+        try:
+            term_id = self.storage.add_term(request_to_dict(request))
+        except Exception as e:
+            return add_failed(context, e)
+        return add_result(self.cache, term_id)
+
+    def AddTerms(self, request_iterator, context):
+        """Пакетное добавление терминов из клиентского потока.
+
+        Термины записываются пакетами по batch_size хранилища по мере
+        чтения потока; результат возвращается для каждого термина.
+        """
+        results = []
+        batch = []
+        for request in request_iterator:
+            batch.append(request_to_dict(request))
+            if len(batch) >= self.storage.batch_size:
+                results.extend(self._add_batch(batch))
+                batch = []
+        if batch:
+            results.extend(self._add_batch(batch))
+        return bulk_add_response(results)
 
+    def _add_batch(self, batch):
+        """Записать пакет терминов и сформировать результаты"""
         try:
-            term_id = self.storage.add_term(term_data)
-            return glossary_pb2.OperationResponse(
-                success=True,
-                message="Term added successfully",
-                term_id=term_id
-            )
+            term_ids = self.storage.add_terms(batch)
         except Exception as e:
-            context.set_code(grpc.StatusCode.INTERNAL)
-            context.set_details(str(e))
-            return glossary_pb2.OperationResponse(
-                success=False,
-                message=f"Error adding term: {str(e)}",
-                term_id=""
-            )
+            term_ids = [e] * len(batch)
+        return [add_result(self.cache, term_id) for term_id in term_ids]
 
     def DeleteTerm(self, request, context):
         """Удалить термин"""
         success = self.storage.delete_term(request.id)
-
-        if success:
-            return glossary_pb2.OperationResponse(
-                success=True,
-                message="Term deleted successfully",
-                term_id=request.id
-            )
-        else:
-            context.set_code(grpc.StatusCode.NOT_FOUND)
-            return glossary_pb2.OperationResponse(
-                success=False,
-                message=f"Term with id {request.id} not found",
-                term_id=request.id
-            )
+        self.cache.invalidate(request.id)
+        return delete_response(context, request.id, success)
 
     def StreamTerms(self, request, context):
-        """Потоковая передача терминов"""
-        all_terms = self.storage.get_all_terms()
-
-        # Фильтрация по категории
-        if request.category:
-            all_terms = [
-                term for term in all_terms
-                if term.get('category') == request.category
-            ]
-
-        batch_size = request.batch_size or 1
-
-        for i in range(0, len(all_terms), batch_size):
-            batch = all_terms[i:i + batch_size]
-            for term_data in batch:
-                yield self._dict_to_term_proto(term_data)
-
-    def _dict_to_term_proto(self, term_dict):
-        """Конвертация словаря в protobuf сообщение"""
-        return glossary_pb2.Term(
-            id=term_dict.get('id', ''),
-            name=term_dict.get('name', ''),
-            definition=term_dict.get('definition', ''),
-            category=term_dict.get('category', ''),
-            examples=term_dict.get('examples', []),
-            synonyms=term_dict.get('synonyms', []),
-            created_at=term_dict.get('created_at', ''),
-            updated_at=term_dict.get('updated_at', '')
+        """Потоковая передача терминов.
+
+        Термины читаются из хранилища пакетами по batch_size по мере
+        отправки, без загрузки всего глоссария в память.
+        """
+        yield from self.storage.iter_terms(**stream_params(request))
+
+    def StreamTermBatches(self, request, context):
+        """Потоковая передача пакетами: одно сообщение TermList на пакет.
+
+        Следующий пакет читается из хранилища, только когда предыдущий
+        отправлен: отправка ждет окна управления потоком HTTP/2, поэтому
+        медленный клиент притормаживает чтение, а память сервиса
+        ограничена одним пакетом.
+        """
+        for terms in self.storage.iter_term_batches(**stream_params(request)):
+            yield term_list(terms)
+
+    def GetCacheStats(self, request, context):
+        """Счетчики кэша терминов"""
+        return glossary_pb2.CacheStats(**self.cache.stats())
+
+    def GetVersion(self, request, context):
+        """Поколение данных для условных запросов шлюза"""
+        return glossary_pb2.Version(**self.storage.get_version())
+
+    def ListCategories(self, request, context):
+        """Список категорий с количеством терминов"""
+        return category_list(self.storage.list_categories())
+
+
+class AsyncGlossaryServicer(GlossaryServicer):
+    """Сервис глоссария для grpc.aio.
+
+    Все RPC выполняются в одном event loop, ожидание Redis не занимает
+    поток. Инициализация хранилища, кэш и подписка на инвалидацию
+    общие с синхронной версией, проверка запросов и сборка ответов -
+    общие функции модуля; здесь только обращения к хранилищу.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.aio_storage = AsyncGlossaryStorage(
+            self.storage,
+            host=os.getenv('REDIS_HOST', 'redis'),
+            port=int(os.getenv('REDIS_PORT', 6379))
         )
 
+    async def GetTerm(self, request, context):
+        """Получить термин по ID"""
+        term_id = request.id
+        term = self.cache.get(term_id)
+        if term is not None:
+            return term
+
+        version = self.cache.version
+        term = await self.aio_storage.get_term(term_id, as_proto=True)
+        if term is None:
+            return term_not_found(context, term_id)
+
+        self.cache.put(term_id, term, version)
+        return term
+
+    async def GetAllTerms(self, request, context):
+        """Получить все термины или одну страницу по курсору"""
+        if request.page_size <= 0:
+            return term_list(await self.aio_storage.get_all_terms(as_proto=True))
+
+        try:
+            terms, next_page_token = await self.aio_storage.get_terms_page(
+                request.page_size, request.page_token, as_proto=True
+            )
+        except ValueError:
+            return invalid_page_token(context, request.page_token)
+
+        return term_list(terms, await self.aio_storage.count_terms(), next_page_token)
+
+    async def SearchTerms(self, request, context):
+        """Поиск терминов, от самых релевантных; не больше limit, если он задан"""
+        return term_list(await self.aio_storage.search_terms(**search_params(request)))
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    async def BatchGetTerms(self, request, context):
+        """Получить несколько терминов по ID (в порядке запроса)"""
+        term_ids, found, missing = split_cached(self.cache, request.ids)
+        if missing:
+            version = self.cache.version
+            merge_loaded(self.cache, found, await self.aio_storage.get_terms(missing, as_proto=True), version)
+        return batch_term_list(term_ids, found)
+
+    async def AddTerm(self, request, context):
+        """Добавить новый термин"""
+        try:
+            term_id = await self.aio_storage.add_term(request_to_dict(request))
+        except Exception as e:
+            return add_failed(context, e)
+        return add_result(self.cache, term_id)
+
+    async def AddTerms(self, request_iterator, context):
+        """Пакетное добавление терминов из клиентского потока"""
+        results = []
+        batch = []
+        async for request in request_iterator:
+            batch.append(request_to_dict(request))
+            if len(batch) >= self.storage.batch_size:
+                results.extend(await self._add_batch(batch))
+                batch = []
+        if batch:
+            results.extend(await self._add_batch(batch))
+        return bulk_add_response(results)
+
+    async def _add_batch(self, batch):
+        """Записать пакет терминов и сформировать результаты"""
+        try:
+            term_ids = await self.aio_storage.add_terms(batch)
+        except Exception as e:
+            term_ids = [e] * len(batch)
+        return [add_result(self.cache, term_id) for term_id in term_ids]
+
+    async def DeleteTerm(self, request, context):
+        """Удалить термин"""
+        success = await self.aio_storage.delete_term(request.id)
+        self.cache.invalidate(request.id)
+        return delete_response(context, request.id, success)
+
+    async def StreamTerms(self, request, context):
+        """Потоковая передача терминов пакетами из хранилища"""
+        async for term in self.aio_storage.iter_terms(**stream_params(request)):
+            yield term
+
+    async def StreamTermBatches(self, request, context):
+        """Потоковая передача пакетами, см. GlossaryServicer.StreamTermBatches"""
+        async for terms in self.aio_storage.iter_term_batches(**stream_params(request)):
+            yield term_list(terms)
+
+    async def GetCacheStats(self, request, context):
+        """Счетчики кэша терминов"""
+        return glossary_pb2.CacheStats(**self.cache.stats())
+
+    async def GetVersion(self, request, context):
+        """Поколение данных для условных запросов шлюза"""
+        return glossary_pb2.Version(**await self.aio_storage.get_version())
+
+    async def ListCategories(self, request, context):
+        """Список категорий с количеством терминов"""
+        return category_list(await self.aio_storage.list_categories())
+
+
+SERVER_MODES = ('threaded', 'aio')
+
+
+def server_options():
+    """Опции gRPC-сервера из переменных окружения"""
+    options = [
+        # Долгоживущие каналы шлюза шлют keepalive-пинги и без запросов
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.min_ping_interval_without_data_ms',
+         int(os.getenv('GRPC_MIN_PING_INTERVAL_MS', 10000))),
+    ]
+    # Лимит потоков на одно HTTP/2-соединение (0 - без лимита). Потоки
+    # сверх лимита сервер отклоняет (REFUSED_STREAM), а не ставит в очередь,
+    # поэтому шлюзу нужно GRPC_CHANNELS_PER_SERVER каналов на пиковую нагрузку
+    max_streams = int(os.getenv('GRPC_MAX_CONCURRENT_STREAMS', 0))
+    if max_streams > 0:
+        options.append(('grpc.max_concurrent_streams', max_streams))
+    return options
+
+
+def serve(port=50051):
+    """Синхронный сервер: по потоку из пула на каждый запрос"""
+    max_workers = int(os.getenv('GRPC_MAX_WORKERS', 10))
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        options=server_options(),
+        compression=compression_from_env(),
+        interceptors=[MetricsInterceptor(), DeadlineInterceptor()]
+    )
     glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(
         GlossaryServicer(), server
     )
-    server.add_insecure_port('[::]:50051')
+    server.add_insecure_port(f'[::]:{port}')
     server.start()
-    print("Glossary gRPC Server started on port 50051")
+    logger.info("Glossary gRPC Server started on port %s (threaded, %d workers)", port, max_workers)
     server.wait_for_termination()
 
 
+async def serve_aio(port=50051):
+    """Асинхронный сервер grpc.aio: все запросы в одном event loop"""
+    server = grpc.aio.server(
+        options=server_options(),
+        compression=compression_from_env(),
+        interceptors=[AioMetricsInterceptor(), AioDeadlineInterceptor()]
+    )
+    servicer = AsyncGlossaryServicer()
+    glossary_pb2_grpc.add_GlossaryServiceServicer_to_server(servicer, server)
+    server.add_insecure_port(f'[::]:{port}')
+    await server.start()
+    logger.info("Glossary gRPC Server started on port %s (aio)", port)
+    try:
+        await server.wait_for_termination()
+    finally:
+        await servicer.aio_storage.close()
+
+
 if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO)
-    serve()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Glossary gRPC Server')
+    parser.add_argument('--mode', choices=SERVER_MODES,
+                        default=os.getenv('GRPC_SERVER_MODE', 'threaded'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('GRPC_PORT', 50051)))
+    args = parser.parse_args()
+
+    configure_logging()
+    # Метрики gRPC и Redis для Prometheus: http://<host>:METRICS_PORT/metrics
+    start_metrics_server()
+    if args.mode == 'aio':
+        asyncio.run(serve_aio(args.port))
+    else:
+        serve(args.port)
\ No newline at end of file
@@ -0,0 +1,123 @@
+import os
+import time
+
+from prometheus_client import Counter, Histogram, start_http_server
+
+from metrics_common import LATENCY_BUCKETS, labelled
+
+
+GRPC_SECONDS = Histogram(
+    'glossary_grpc_server_handling_seconds',
+    'Время обработки RPC сервисом (для потоков - до последнего сообщения)',
+    ['method', 'code'], buckets=LATENCY_BUCKETS
+)
+REDIS_SECONDS = Histogram(
+    'glossary_redis_round_trip_seconds',
+    'Время одного обращения к Redis: команды или всего pipeline',
+    ['command'], buckets=LATENCY_BUCKETS
+)
+REDIS_COMMANDS = Counter(
+    'glossary_redis_commands_total',
+    'Команды Redis, отправленные отдельно или в составе pipeline',
+    ['command']
+)
+
+# Порт HTTP-сервера метрик Prometheus (/metrics); 0 - не запускать
+DEFAULT_METRICS_PORT = 9100
+
+
+def start_metrics_server() -> None:
+    """HTTP-сервер /metrics на METRICS_PORT в отдельном потоке"""
+    port = int(os.getenv('METRICS_PORT', DEFAULT_METRICS_PORT))
+    if port:
+        start_http_server(port)
+
+
+def _command_name(args) -> str:
+    return str(args[0]).lower() if args else 'unknown'
+
+
+def _count_pipeline(pipe) -> None:
+    for args, _ in pipe.command_stack:
+        labelled(REDIS_COMMANDS, _command_name(args)).inc()
+
+
+def instrument_redis(client):
+    """Учет времени и числа обращений к Redis для клиента redis-py.
+
+    Отдельная команда - один round trip с меткой своего имени,
+    pipeline - один round trip с меткой pipeline; команды внутри
+    pipeline считаются в glossary_redis_commands_total по именам.
+    Клиент изменяется на месте и возвращается; повторный вызов для
+    того же клиента (общего у нескольких хранилищ) ничего не меняет.
+    """
+    if getattr(client, '_metrics_instrumented', False):
+        return client
+    client._metrics_instrumented = True
+    execute_command = client.execute_command
+    make_pipeline = client.pipeline
+
+    def timed_command(*args, **options):
+        started = time.perf_counter()
+        try:
+            return execute_command(*args, **options)
+        finally:
+            name = _command_name(args)
+            labelled(REDIS_SECONDS, name).observe(time.perf_counter() - started)
+            labelled(REDIS_COMMANDS, name).inc()
+
+    def pipeline(*args, **kwargs):
+        pipe = make_pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def timed_execute(*args, **kwargs):
+            _count_pipeline(pipe)
+            started = time.perf_counter()
+            try:
+                return execute(*args, **kwargs)
+            finally:
+                labelled(REDIS_SECONDS, 'pipeline').observe(time.perf_counter() - started)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_command
+    client.pipeline = pipeline
+    return client
+
+
+def instrument_async_redis(client):
+    """instrument_redis для клиента redis.asyncio"""
+    if getattr(client, '_metrics_instrumented', False):
+        return client
+    client._metrics_instrumented = True
+    execute_command = client.execute_command
+    make_pipeline = client.pipeline
+
+    async def timed_command(*args, **options):
+        started = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            name = _command_name(args)
+            labelled(REDIS_SECONDS, name).observe(time.perf_counter() - started)
+            labelled(REDIS_COMMANDS, name).inc()
+
+    def pipeline(*args, **kwargs):
+        pipe = make_pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def timed_execute(*args, **kwargs):
+            _count_pipeline(pipe)
+            started = time.perf_counter()
+            try:
+                return await execute(*args, **kwargs)
+            finally:
+                labelled(REDIS_SECONDS, 'pipeline').observe(time.perf_counter() - started)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_command
+    client.pipeline = pipeline
+    return client
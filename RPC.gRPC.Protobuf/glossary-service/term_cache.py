@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TermCache:
+    """LRU кэш терминов с ограничением времени жизни записей.
+
+    Хранит готовые сообщения glossary_pb2.Term, поэтому попадание в кэш
+    не требует ни обращения к Redis, ни конвертации. Потокобезопасен:
+    gRPC-сервер вызывает методы из пула потоков.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Увеличивается при каждой инвалидации, см. put()
+        self.version = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, term_id: str):
+        """Получить термин из кэша или None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(term_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[term_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(term_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, term_id: str, term, version: Optional[int] = None) -> None:
+        """Положить термин в кэш.
+
+        version - значение self.version, прочитанное до запроса в Redis.
+        Если с тех пор была инвалидация, прочитанные данные могли
+        устареть, и запись пропускается.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[term_id] = (time.monotonic() + self.ttl, term)
+            self._entries.move_to_end(term_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, term_id: Optional[str] = None) -> None:
+        """Удалить термин из кэша (или очистить кэш, если term_id не задан)"""
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            if term_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(term_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики кэша"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }